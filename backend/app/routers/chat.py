@@ -1,16 +1,27 @@
 from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from fastapi.security import OAuth2PasswordBearer
 from pydantic import BaseModel
 from typing import Optional
+from datetime import datetime, timezone
+import json
 import os
 from loguru import logger
 
 from ...oauth2 import get_current_user
 from ...schemas import TokenData
-from ..services.rag_handler import load_vectorstore_for_user, get_user_query_response, get_general_llm_response, clear_user_cache, get_cache_info
+from ...database_connection import get_pool_stats, DB_ASYNC_POOL
+from ..services.rag_handler import load_vectorstore_for_user, aget_user_query_response, aget_general_llm_response, astream_user_query_response, astream_general_llm_response, clear_user_cache, get_cache_info, get_vectorstore_generation, get_vectorstore_language
 from ..services.chat_db_service import ChatDBService
-from ..services.rag_service import DocumentProcessor
+from ..services.chat_write_behind import ChatWriteBehind
 from ..services.chat_cache import ChatCache
+from ..services.semantic_cache import SemanticChatCache, SEMANTIC_CACHE_ENABLED
+from ..services.document_store import DocumentStore
+from ..utils.executors import run_cpu_bound, run_db
+from ..utils.pagination import (
+    clamp_page_size, InvalidCursorError,
+    CHAT_LIST_PAGE_SIZE, CHAT_LIST_MAX_PAGE_SIZE, CHAT_HISTORY_PAGE_SIZE, CHAT_HISTORY_MAX_PAGE_SIZE
+)
 
 router = APIRouter()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
@@ -23,22 +34,46 @@ class ChatRequest(BaseModel):
 class ChatTitleUpdate(BaseModel):
     title: str
 
+async def _semantic_lookup(user_id: int, query: str, vectorstore):
+    """Embed the query and look for a near-duplicate answer: (query_vector, cached answer or None)"""
+    if not SEMANTIC_CACHE_ENABLED:
+        return None, None
+    try:
+        use_pdf = vectorstore is not None
+        language = get_vectorstore_language(user_id) if use_pdf else "english"
+        query_vector = await run_cpu_bound(SemanticChatCache.embed_query, query, language)
+        hit = await run_db(SemanticChatCache.lookup, user_id, query_vector, use_pdf,
+                           get_vectorstore_generation(user_id) if use_pdf else None)
+        return query_vector, hit
+    except Exception as e:
+        logger.warning(f"Semantic cache unavailable: {e}")
+        return None, None
+
+async def _cache_answer(user_id: int, data: ChatRequest, vectorstore, query_vector, response: str, source: str, sources: list):
+    """Store an answer in the exact and semantic response caches"""
+    await ChatCache.acache_response(user_id, data.query, data.has_pdf, response, source, sources)
+    if query_vector is not None:
+        use_pdf = vectorstore is not None
+        await run_db(SemanticChatCache.store, user_id, data.query, query_vector, use_pdf, response, source, sources,
+                     get_vectorstore_generation(user_id) if use_pdf else None)
+
 @router.post("/chat")
 async def chat_with_rag(request: Request, data: ChatRequest, current_user: TokenData = Depends(get_current_user)):
     logger.info(f"Chat request from user {current_user.email}")
     logger.debug(f"Request data: {data}")
+    asked_at = datetime.now(timezone.utc)
     
     try:
         # Check cache first for identical queries
-        cached_response = ChatCache.get_cached_response(current_user.id, data.query, data.has_pdf)
+        cached_response = await ChatCache.aget_cached_response(current_user.id, data.query, data.has_pdf)
         if cached_response:
             logger.info("Returning cached response")
+            await SemanticChatCache.arecord("exact_hits")
             
             # Still save to chat history if chat_id provided
             if data.chat_id:
-                chat_info = ChatDBService.create_or_get_chat(current_user.id, data.chat_id, data.query)
-                ChatDBService.save_message(data.chat_id, "user", data.query)
-                ChatDBService.save_message(data.chat_id, "assistant", cached_response["response"], cached_response["source"])
+                await run_db(ChatWriteBehind.save_turn, current_user.id, data.chat_id, data.query,
+                             cached_response["response"], cached_response["source"], asked_at)
             
             # Prepare cached response
             response_data = {
@@ -53,44 +88,51 @@ async def chat_with_rag(request: Request, data: ChatRequest, current_user: Token
             
             return response_data
         
-        # Create or get chat record
-        if data.chat_id:
-            chat_info = ChatDBService.create_or_get_chat(current_user.id, data.chat_id, data.query)
+        vectorstore = None
+        if data.has_pdf:
+            logger.info("Attempting to use PDF context")
+            vectorstore = await run_cpu_bound(load_vectorstore_for_user, current_user.id)
+            if vectorstore is None:
+                logger.warning("No vector store found, falling back to general LLM")
         
-        # Save user message
-        if data.chat_id:
-            ChatDBService.save_message(data.chat_id, "user", data.query)
+        # Near-duplicate of an earlier question (scoped to the current vector store generation)
+        query_vector, semantic_hit = await _semantic_lookup(current_user.id, data.query, vectorstore)
+        if semantic_hit:
+            await SemanticChatCache.arecord("semantic_hits")
+            response, source, sources = semantic_hit["response"], semantic_hit["source"], semantic_hit.get("sources", [])
+            await ChatCache.acache_response(current_user.id, data.query, data.has_pdf, response, source, sources)
+            if data.chat_id:
+                await run_db(ChatWriteBehind.save_turn, current_user.id, data.chat_id, data.query, response, source, asked_at)
+            
+            response_data = {"response": response, "source": source, "cached": True, "cache_tier": "semantic"}
+            if sources:
+                response_data["sources"] = sources
+            return response_data
+        await SemanticChatCache.arecord("misses")
         
         # Get AI response
-        if not data.has_pdf:
+        sources = []
+        if vectorstore is None:
             logger.info("Using general LLM response")
-            response = get_general_llm_response(data.query)
+            response = await aget_general_llm_response(data.query)
             source = "general"
         else:
-            logger.info("Attempting to use PDF context")
-            vectorstore = load_vectorstore_for_user(current_user.id)
-            if vectorstore is None:
-                logger.warning("No vector store found, falling back to general LLM")
-                response = get_general_llm_response(data.query)
-                source = "general"
-            else:
-                logger.success("Using PDF context for response")
-                rag_response = get_user_query_response(vectorstore, data.query)
-                response = rag_response.get('result') if isinstance(rag_response, dict) else rag_response
-                sources = rag_response.get('sources', []) if isinstance(rag_response, dict) else []
-                source = "rag"
+            logger.success("Using PDF context for response")
+            rag_response = await aget_user_query_response(vectorstore, data.query, current_user.id)
+            response = rag_response.get('result') if isinstance(rag_response, dict) else rag_response
+            sources = rag_response.get('sources', []) if isinstance(rag_response, dict) else []
+            source = "rag"
         
         # Handle response format for backward compatibility
         if isinstance(response, dict):
             response = response.get("result") or next((v for v in response.values() if isinstance(v, str)), "[No response]")
         
-        # Cache the response for future identical queries
-        sources_for_cache = sources if 'sources' in locals() else []
-        ChatCache.cache_response(current_user.id, data.query, data.has_pdf, response, source, sources_for_cache)
+        # Cache the response for future identical and near-duplicate queries
+        await _cache_answer(current_user.id, data, vectorstore, query_vector, response, source, sources)
         
-        # Save assistant message
+        # Save the question and answer to chat history
         if data.chat_id:
-            ChatDBService.save_message(data.chat_id, "assistant", response, source)
+            await run_db(ChatWriteBehind.save_turn, current_user.id, data.chat_id, data.query, response, source, asked_at)
         
         logger.success(f"Chat response sent (source: {source})")
         
@@ -102,7 +144,7 @@ async def chat_with_rag(request: Request, data: ChatRequest, current_user: Token
         }
         
         # Add sources if this is a RAG response
-        if source == "rag" and 'sources' in locals() and sources:
+        if source == "rag" and sources:
             response_data["sources"] = sources
             logger.info(f"Including {len(sources)} source citations in response")
         
@@ -112,22 +154,124 @@ async def chat_with_rag(request: Request, data: ChatRequest, current_user: Token
         logger.error(f"Error in chat: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error processing query: {str(e)}")
 
+def _sse_event(event: str, data: dict) -> str:
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@router.post("/chat/stream")
+async def chat_with_rag_stream(request: Request, data: ChatRequest, current_user: TokenData = Depends(get_current_user)):
+    """
+    Streaming variant of /chat over Server-Sent Events
+    Events: "token" ({"token"}) while generating, then "sources" ({"source", "sources"}),
+    then "done" ({"cached"}); "error" ({"detail"}) if generation fails
+    """
+    logger.info(f"Streaming chat request from user {current_user.email}")
+    asked_at = datetime.now(timezone.utc)
+    
+    async def event_stream():
+        try:
+            cached_response = await ChatCache.aget_cached_response(current_user.id, data.query, data.has_pdf)
+            
+            if cached_response:
+                logger.info("Returning cached response")
+                await SemanticChatCache.arecord("exact_hits")
+                yield _sse_event("token", {"token": cached_response["response"]})
+                yield _sse_event("sources", {"source": cached_response["source"],
+                                             "sources": cached_response.get("sources", [])})
+                if data.chat_id:
+                    await run_db(ChatWriteBehind.save_turn, current_user.id, data.chat_id, data.query,
+                                 cached_response["response"], cached_response["source"], asked_at)
+                yield _sse_event("done", {"cached": True})
+                return
+            
+            tokens = []
+            sources = []
+            source = "general"
+            vectorstore = None
+            if data.has_pdf:
+                vectorstore = await run_cpu_bound(load_vectorstore_for_user, current_user.id)
+                if vectorstore is None:
+                    logger.warning("No vector store found, falling back to general LLM")
+            
+            query_vector, semantic_hit = await _semantic_lookup(current_user.id, data.query, vectorstore)
+            if semantic_hit:
+                await SemanticChatCache.arecord("semantic_hits")
+                yield _sse_event("token", {"token": semantic_hit["response"]})
+                yield _sse_event("sources", {"source": semantic_hit["source"],
+                                             "sources": semantic_hit.get("sources", [])})
+                await ChatCache.acache_response(current_user.id, data.query, data.has_pdf,
+                                                semantic_hit["response"], semantic_hit["source"], semantic_hit.get("sources", []))
+                if data.chat_id:
+                    await run_db(ChatWriteBehind.save_turn, current_user.id, data.chat_id, data.query,
+                                 semantic_hit["response"], semantic_hit["source"], asked_at)
+                yield _sse_event("done", {"cached": True, "cache_tier": "semantic"})
+                return
+            await SemanticChatCache.arecord("misses")
+            
+            if vectorstore is not None:
+                source = "rag"
+                async for event, payload in astream_user_query_response(vectorstore, data.query):
+                    if event == "token":
+                        tokens.append(payload)
+                        yield _sse_event("token", {"token": payload})
+                    else:
+                        sources = payload
+            else:
+                async for token in astream_general_llm_response(data.query):
+                    tokens.append(token)
+                    yield _sse_event("token", {"token": token})
+            
+            yield _sse_event("sources", {"source": source, "sources": sources})
+            
+            # Persist the complete answer once the stream has finished
+            response = "".join(tokens)
+            await _cache_answer(current_user.id, data, vectorstore, query_vector, response, source, sources)
+            if data.chat_id:
+                await run_db(ChatWriteBehind.save_turn, current_user.id, data.chat_id, data.query, response, source, asked_at)
+            
+            logger.success(f"Streamed chat response sent (source: {source}, {len(tokens)} chunks)")
+            yield _sse_event("done", {"cached": False})
+            
+        except Exception as e:
+            logger.error(f"Error in streaming chat: {str(e)}")
+            yield _sse_event("error", {"detail": f"Error processing query: {str(e)}"})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/list_chats")
-async def list_user_chats(current_user: TokenData = Depends(get_current_user)):
-    """Get all chats for the current user"""
+async def list_user_chats(limit: Optional[int] = None, cursor: Optional[str] = None,
+                          current_user: TokenData = Depends(get_current_user)):
+    """
+    Get the current user's chats, most recently updated first
+    With limit, pass next_cursor back as cursor for the next page; without limit or cursor all chats are returned
+    """
     try:
-        chats = ChatDBService.get_user_chats(current_user.id)
-        return {"chats": chats}
+        page_size = clamp_page_size(limit, CHAT_LIST_PAGE_SIZE, CHAT_LIST_MAX_PAGE_SIZE, cursor)
+        if DB_ASYNC_POOL:
+            return await ChatWriteBehind.aget_user_chats_page(current_user.id, page_size, cursor)
+        return await run_db(ChatWriteBehind.get_user_chats_page, current_user.id, page_size, cursor)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         print(f"Error fetching chats: {str(e)}")
         raise HTTPException(status_code=500, detail="Error fetching chat history")
 
 @router.get("/chat_history/{chat_id}")
-async def get_chat_history(chat_id: str, current_user: TokenData = Depends(get_current_user)):
-    """Get message history for a specific chat"""
+async def get_chat_history(chat_id: str, limit: Optional[int] = None, before: Optional[str] = None,
+                           current_user: TokenData = Depends(get_current_user)):
+    """
+    Get the latest messages of a chat in chronological order
+    With limit, pass next_cursor back as before to load older messages; without limit or before the whole history is returned
+    """
     try:
-        messages = ChatDBService.get_chat_messages(chat_id, current_user.id)
-        return {"messages": messages}
+        page_size = clamp_page_size(limit, CHAT_HISTORY_PAGE_SIZE, CHAT_HISTORY_MAX_PAGE_SIZE, before)
+        return await run_db(ChatWriteBehind.get_chat_messages_page, chat_id, current_user.id, page_size, before)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         print(f"Error fetching chat history: {str(e)}")
         raise HTTPException(status_code=500, detail="Error fetching chat history")
@@ -136,7 +280,7 @@ async def get_chat_history(chat_id: str, current_user: TokenData = Depends(get_c
 async def delete_chat(chat_id: str, current_user: TokenData = Depends(get_current_user)):
     """Delete a specific chat"""
     try:
-        ChatDBService.delete_chat(chat_id, current_user.id)
+        await run_db(ChatWriteBehind.delete_chat, chat_id, current_user.id)
         return {"message": "Chat deleted successfully"}
     except Exception as e:
         print(f"Error deleting chat: {str(e)}")
@@ -146,7 +290,7 @@ async def delete_chat(chat_id: str, current_user: TokenData = Depends(get_curren
 async def update_chat_title(chat_id: str, data: ChatTitleUpdate, current_user: TokenData = Depends(get_current_user)):
     """Update chat title"""
     try:
-        ChatDBService.update_chat_title(chat_id, current_user.id, data.title)
+        await run_db(ChatDBService.update_chat_title, chat_id, current_user.id, data.title)
         return {"message": "Chat title updated successfully"}
     except Exception as e:
         print(f"Error updating chat title: {str(e)}")
@@ -155,10 +299,10 @@ async def update_chat_title(chat_id: str, data: ChatTitleUpdate, current_user: T
 @router.post("/clear_cache")
 async def clear_cache(current_user: TokenData = Depends(get_current_user)):
     # Clear vector store cache
-    clear_user_cache(current_user.id)
+    await run_db(clear_user_cache, current_user.id)
     
     # Clear chat response cache
-    ChatCache.clear_user_chat_cache(current_user.id)
+    await run_db(ChatCache.clear_user_chat_cache, current_user.id)
     
     return {"message": "All caches cleared"}
 
@@ -166,10 +310,12 @@ async def clear_cache(current_user: TokenData = Depends(get_current_user)):
 @router.get("/cache_status")
 async def get_cache_status(current_user: TokenData = Depends(get_current_user)):
     """Get cache status for debugging"""
-    cache_info = get_cache_info()
+    cache_info = await run_db(get_cache_info)
     return {
         "user_id": current_user.id,
-        "cache_info": cache_info
+        "cache_info": cache_info,
+        "response_cache": await run_db(SemanticChatCache.get_stats),
+        "db_pool": get_pool_stats()
     }
 
 @router.get("/user_cache_data")
@@ -177,7 +323,7 @@ async def get_user_cache_data(current_user: TokenData = Depends(get_current_user
     """Get all cache keys for the current user (for debugging and privacy verification)"""
     from ...redis_cache import cache
     
-    user_keys = cache.get_user_keys(current_user.id)
+    user_keys = await run_db(cache.get_user_keys, current_user.id)
     
     return {
         "user_id": current_user.id,
@@ -191,15 +337,17 @@ async def clear_pdf(current_user: TokenData = Depends(get_current_user)):
     try:
         logger.info(f"Clearing PDF data for user {current_user.id}")
         
+        # Release shared documents (garbage-collected once no user references them)
+        await run_db(DocumentStore.release_user, current_user.id)
+        
         # Clear the in-memory cache
-        clear_user_cache(current_user.id)
+        await run_db(clear_user_cache, current_user.id)
         
-        # Clean up vector store files
-        processor = DocumentProcessor()
-        user_vector_dir = os.path.join(processor.vector_store_dir, f"user_{current_user.id}")
+        # Clean up legacy per-user vector store files
+        user_vector_dir = DocumentStore.get_legacy_vector_store_dir(current_user.id)
         if os.path.exists(user_vector_dir):
             import shutil
-            shutil.rmtree(user_vector_dir)
+            await run_db(shutil.rmtree, user_vector_dir)
             logger.info(f"Cleaned up vector store for user {current_user.id}")
         
         logger.success(f"PDF data cleared successfully for user {current_user.id}")
@@ -2,7 +2,10 @@ from fastapi import APIRouter, Depends, File, UploadFile, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from pydantic import BaseModel
 from ...oauth2 import get_current_user
-from ..utils.file_utils import save_pdf_file
+from ..utils.file_utils import (
+    save_pdf_file_streamed, read_upload_limited, cleanup_user_files, get_user_upload_dir, UploadTooLargeError
+)
+from fastapi.concurrency import run_in_threadpool
 from ..services.rag_service import DocumentProcessor
 from ..services.language_service import LanguageDetector
 from ..services.enhanced_pdf_extractor import EnhancedPDFExtractor
@@ -35,9 +38,11 @@ async def upload_pdf(file: UploadFile = File(...), token: str = Depends(oauth2_s
 
     try:
         cleanup_existing_vectorstore(user_id)
+        # Single-document flow: replace the user's previous upload
+        cleanup_user_files(get_user_upload_dir(user_id))
         
-        file_path = save_pdf_file(file, user_id)
-        logger.info(f"PDF saved to: {file_path}")
+        file_path, _, size = await save_pdf_file_streamed(file, user_id)
+        logger.info(f"PDF saved to: {file_path} ({size} bytes)")
 
         processor = DocumentProcessor()
         vector_store, language = processor.embed_pdf(file_path, file.filename)
@@ -59,6 +64,8 @@ async def upload_pdf(file: UploadFile = File(...), token: str = Depends(oauth2_s
 
         return {"message": "PDF uploaded and embedded successfully."}
 
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
     except Exception as e:
         logger.error(f"❌ Error in upload_pdf: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -115,49 +122,44 @@ async def test_pdf_text_extraction(file: UploadFile = File(...), token: str = De
         if not file.filename.endswith(".pdf"):
             raise HTTPException(status_code=400, detail="Only PDF files are allowed")
         
-        # Save temporary file
-        temp_path = f"/tmp/{file.filename}"
-        with open(temp_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
+        # Read into memory - PyMuPDF opens it from the buffer, nothing is written to disk
+        content = await read_upload_limited(file)
         
-        try:
-            # Extract text and detect language
-            extractor = EnhancedPDFExtractor()
-            detector = LanguageDetector()
-            
-            # Extract text
-            raw_text = extractor.extract_text(temp_path)
-            
-            # Detect language
-            language = detector.detect_language(raw_text)
-            
-            # Get statistics
-            stats = detector.get_text_stats(raw_text)
-            
-            # Validate quality
-            is_valid = detector.validate_text_quality(raw_text)
-            
-            # Get text preview
-            preview = extractor.get_text_preview(raw_text, 300)
-            
-            result = {
-                "filename": file.filename,
-                "detected_language": language,
-                "text_length": len(raw_text),
-                "text_stats": stats,
-                "is_valid_quality": is_valid,
-                "text_preview": preview
-            }
-            
-            logger.info(f"PDF text extraction test: {file.filename} -> {language}")
-            return result
-            
-        finally:
-            # Clean up temp file
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
+        # Extract text and detect language
+        extractor = EnhancedPDFExtractor()
+        detector = LanguageDetector()
+        
+        # Extract text
+        raw_text = await run_in_threadpool(extractor.extract_text_from_bytes, content)
+        
+        # Detect language
+        language = detector.detect_language(raw_text)
+        
+        # Get statistics
+        stats = detector.get_text_stats(raw_text)
+        
+        # Validate quality
+        is_valid = detector.validate_text_quality(raw_text)
+        
+        # Get text preview
+        preview = extractor.get_text_preview(raw_text, 300)
+        
+        result = {
+            "filename": file.filename,
+            "detected_language": language,
+            "text_length": len(raw_text),
+            "text_stats": stats,
+            "is_valid_quality": is_valid,
+            "text_preview": preview
+        }
+        
+        logger.info(f"PDF text extraction test: {file.filename} -> {language}")
+        return result
         
+    except HTTPException:
+        raise
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
     except Exception as e:
         logger.error(f"Error in PDF text extraction test: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,14 +1,18 @@
 from fastapi import APIRouter, Depends, File, UploadFile, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer
 from ...oauth2 import get_current_user
-from ..utils.file_utils import save_pdf_file
+from ..utils.file_utils import save_pdf_file_streamed, UploadTooLargeError
 from ...tasks import process_pdf_task
 from ..services.task_service import TaskService
 from ...schemas import UserTasksResponse
 from ..services.rag_handler import clear_user_cache
+from ..services.document_store import DocumentStore
+from ..services.user_vector_index import UserVectorIndex
 from loguru import logger
 import os
 import shutil
+import uuid
 
 router = APIRouter()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
@@ -22,16 +26,44 @@ async def upload_pdf(file: UploadFile = File(...), token: str = Depends(oauth2_s
         raise HTTPException(status_code=400, detail="Only PDF files are allowed.")
 
     try:
-        cleanup_existing_vectorstore(user_id)
-        
-        file_path = save_pdf_file(file, user_id)
-        logger.info(f"PDF saved to: {file_path}")
+        # Hashed while streaming to disk - identical documents are extracted and embedded only once
+        file_path, content_hash, size = await save_pdf_file_streamed(file, user_id)
+        logger.info(f"PDF saved to: {file_path} ({size} bytes)")
+
+        existing_document = await run_in_threadpool(DocumentStore.find_existing, content_hash)
+        if existing_document:
+            try:
+                index_info = await run_in_threadpool(
+                    UserVectorIndex.add_document, user_id, existing_document, file.filename
+                )
+                await run_in_threadpool(os.remove, file_path)
+                await run_in_threadpool(clear_user_cache, user_id, index_info['generation'])
+                
+                # Record a finished task so clients polling task status see it as completed
+                task_id = f"dedup-{uuid.uuid4()}"
+                message = f"{existing_document['language'].title()} PDF already processed, added to your documents"
+                await run_in_threadpool(TaskService.store_user_task, user_id, task_id, "pdf_processing",
+                                        file.filename, status="completed", progress_message=message)
+                logger.success(f"♻️ Deduplicated upload {content_hash[:12]} for user {user_id}")
+                
+                return {
+                    "message": message,
+                    "task_id": task_id,
+                    "status": "completed",
+                    "deduplicated": True,
+                    "document_id": index_info['document_id']
+                }
+            except (LookupError, FileNotFoundError) as e:
+                # Document was garbage-collected between lookup and append - process it again
+                logger.warning(f"⚠️ {e}")
+
+        file_path = await run_in_threadpool(DocumentStore.store_upload, file_path, content_hash)
 
         # Queue the task with Celery
-        task = process_pdf_task.delay(user_id, file_path, file.filename)
+        task = await run_in_threadpool(process_pdf_task.delay, user_id, file_path, file.filename, content_hash)
         
         # Store task in database for tracking
-        TaskService.store_user_task(user_id, task.id, "pdf_processing", file.filename)
+        await run_in_threadpool(TaskService.store_user_task, user_id, task.id, "pdf_processing", file.filename)
         
         return {
             "message": "PDF uploaded successfully and queued for processing",
@@ -39,6 +71,8 @@ async def upload_pdf(file: UploadFile = File(...), token: str = Depends(oauth2_s
             "status": "queued"
         }
 
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
     except Exception as e:
         logger.error(f"Error in upload_pdf: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -87,19 +121,32 @@ async def get_user_processing_status(token: str = Depends(oauth2_scheme)):
         logger.error(f"Error getting user processing status: {str(e)}")
         raise HTTPException(status_code=500, detail="Unable to fetch task status")
 
-def cleanup_existing_vectorstore(user_id: int):
+@router.get("/documents")
+async def list_documents(token: str = Depends(oauth2_scheme)):
+    """List the documents in the current user's vector stores"""
+    user_data = get_current_user(token)
+    
     try:
-        from ..services.rag_service import DocumentProcessor
-        processor = DocumentProcessor()
-        user_vector_dir = os.path.join(processor.vector_store_dir, f"user_{user_id}")
-        if os.path.exists(user_vector_dir):
-            shutil.rmtree(user_vector_dir)
-            logger.info(f"🗑️ Cleaned up existing vector store for user {user_id}")
+        documents = await run_in_threadpool(UserVectorIndex.list_documents, user_data.id)
+        return {"documents": documents, "total": len(documents)}
     except Exception as e:
-        logger.warning(f"⚠️ Could not clean up existing vector store: {e}")
+        logger.error(f"Error listing documents: {str(e)}")
+        raise HTTPException(status_code=500, detail="Unable to list documents")
+
+@router.delete("/documents/{document_id}")
+async def delete_document(document_id: int, token: str = Depends(oauth2_scheme)):
+    """Remove one document's vectors from the current user's vector store"""
+    user_data = get_current_user(token)
     
-    # Clear the in-memory cache for this user
-    clear_user_cache(user_id)
+    try:
+        result = await run_in_threadpool(UserVectorIndex.remove_document, user_data.id, document_id)
+        await run_in_threadpool(clear_user_cache, user_data.id, result['generation'])
+        return {"message": "Document removed successfully", **result}
+    except LookupError:
+        raise HTTPException(status_code=404, detail="Document not found")
+    except Exception as e:
+        logger.error(f"Error removing document {document_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail="Unable to remove document")
 
 @router.post("/cleanup_old_tasks")
 async def cleanup_old_tasks(token: str = Depends(oauth2_scheme)):
@@ -117,11 +164,15 @@ async def cleanup_old_tasks(token: str = Depends(oauth2_scheme)):
         raise HTTPException(status_code=500, detail="Unable to cleanup old tasks")
 
 def cleanup_user_data(user_id: int):
-    # Clean up vector store
+    # Release shared document references (files are removed once nobody references them)
+    try:
+        DocumentStore.release_user(user_id)
+    except Exception as e:
+        logger.warning(f"⚠️ Could not release shared documents: {e}")
+
+    # Clean up legacy per-user vector store
     try:
-        from ..services.rag_service import DocumentProcessor
-        processor = DocumentProcessor()
-        user_vector_dir = os.path.join(processor.vector_store_dir, f"user_{user_id}")
+        user_vector_dir = DocumentStore.get_legacy_vector_store_dir(user_id)
         if os.path.exists(user_vector_dir):
             shutil.rmtree(user_vector_dir)
             logger.info(f"🗑️ Cleaned up vector store for user {user_id}")
@@ -144,5 +195,5 @@ def cleanup_user_data(user_id: int):
 @router.post("/logout")
 async def logout(token: str = Depends(oauth2_scheme)):
     user_data = get_current_user(token)
-    cleanup_user_data(user_data.id)
+    await run_in_threadpool(cleanup_user_data, user_data.id)
     return {"message": "Logged out successfully, all user data cleaned up"} 
\ No newline at end of file
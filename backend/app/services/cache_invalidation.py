@@ -0,0 +1,112 @@
+import json
+import threading
+from typing import Callable, Dict, List
+
+from loguru import logger
+from ...near_cache import near_cache
+from ...redis_cache import cache, INVALIDATION_CHANNEL, PROCESS_ORIGIN
+
+CHANNEL = INVALIDATION_CHANNEL
+
+# Identifies this process so it can skip the messages it published itself
+_ORIGIN = PROCESS_ORIGIN
+
+
+class InvalidationBus:
+    """
+    Cross-process cache invalidation over Redis pub/sub
+
+    publish(kind, **payload) broadcasts a message to every process running the listener
+    (API workers start it on startup); handlers registered with subscribe(kind, fn) receive
+    the payload dict. Messages are fire-and-forget - a process that misses one still falls
+    back to TTLs, so handlers must only drop or refresh local state.
+    """
+
+    _handlers: Dict[str, List[Callable[[Dict], None]]] = {}
+    _thread = None
+    _stop = threading.Event()
+    _pubsub = None
+
+    @staticmethod
+    def subscribe(kind: str, handler: Callable[[Dict], None]) -> None:
+        """Register a handler for a message kind"""
+        InvalidationBus._handlers.setdefault(kind, []).append(handler)
+
+    @staticmethod
+    def publish(kind: str, **payload) -> int:
+        """Broadcast an invalidation, returns the number of listening processes"""
+        message = {"kind": kind, "origin": _ORIGIN, **payload}
+        receivers = cache.publish(CHANNEL, message)
+        logger.debug(f"📣 Published {kind} invalidation {payload} to {receivers} listeners")
+        return receivers
+
+    @staticmethod
+    def dispatch(message: Dict) -> None:
+        """Run the handlers for one decoded message"""
+        if message.get("origin") == _ORIGIN:
+            return
+        for handler in InvalidationBus._handlers.get(message.get("kind"), []):
+            try:
+                handler(message)
+            except Exception as e:
+                logger.warning(f"⚠️ Invalidation handler for {message.get('kind')} failed: {e}")
+
+    @staticmethod
+    def start() -> None:
+        """Start the background listener thread (idempotent)"""
+        if InvalidationBus._thread is not None and InvalidationBus._thread.is_alive():
+            return
+        InvalidationBus._stop.clear()
+        InvalidationBus._thread = threading.Thread(
+            target=InvalidationBus._listen, name="cache-invalidation", daemon=True
+        )
+        InvalidationBus._thread.start()
+
+    @staticmethod
+    def stop() -> None:
+        InvalidationBus._stop.set()
+        pubsub = InvalidationBus._pubsub
+        if pubsub is not None:
+            try:
+                pubsub.close()
+            except Exception:
+                pass
+        if InvalidationBus._thread is not None:
+            InvalidationBus._thread.join(timeout=2)
+            InvalidationBus._thread = None
+
+    @staticmethod
+    def _listen() -> None:
+        backoff = 1
+        while not InvalidationBus._stop.is_set():
+            try:
+                InvalidationBus._pubsub = cache.pubsub(CHANNEL)
+                logger.info(f"📡 Listening for cache invalidations ({_ORIGIN})")
+                near_cache.set_active(True)
+                backoff = 1
+                while not InvalidationBus._stop.is_set():
+                    message = InvalidationBus._pubsub.get_message(timeout=1.0)
+                    if message and message.get("type") == "message":
+                        InvalidationBus.dispatch(json.loads(message["data"]))
+            except Exception as e:
+                if InvalidationBus._stop.is_set():
+                    break
+                logger.warning(f"⚠️ Invalidation listener disconnected ({e}), retrying in {backoff}s")
+                InvalidationBus._stop.wait(backoff)
+                backoff = min(backoff * 2, 30)
+            finally:
+                # Invalidations may be missed until the next subscribe
+                near_cache.set_active(False)
+                if InvalidationBus._pubsub is not None:
+                    try:
+                        InvalidationBus._pubsub.close()
+                    except Exception:
+                        pass
+                    InvalidationBus._pubsub = None
+
+
+def _on_cache_keys_invalidated(message: Dict) -> None:
+    near_cache.invalidate(message.get("keys", []), message.get("patterns", []))
+
+
+InvalidationBus.subscribe("cache_keys", _on_cache_keys_invalidated)
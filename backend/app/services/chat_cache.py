@@ -1,4 +1,4 @@
-from ...redis_cache import cache
+from ...redis_cache import cache, async_cache
 from typing import Optional, Dict
 from loguru import logger
 import hashlib
@@ -31,25 +31,35 @@ class ChatCache:
             logger.error(f"Error getting cached response: {e}")
             return None
     
+    @staticmethod
+    async def aget_cached_response(user_id: int, query: str, has_pdf: bool) -> Optional[Dict]:
+        """Async get_cached_response for async routes (no executor hop)"""
+        cached = await async_cache.get_json(ChatCache._generate_cache_key(user_id, query, has_pdf))
+        if cached:
+            logger.info(f"💾 Cache hit for user {user_id} query")
+        return cached
+    
+    @staticmethod
+    def _cache_entry(query: str, has_pdf: bool, response: str, source: str, sources: list = None):
+        """Cached payload and its expiration: 30 minutes for general queries, 1 hour for PDF queries"""
+        cached_data = {
+            "response": response,
+            "source": source,
+            "query": query,
+            "has_pdf": has_pdf
+        }
+        
+        # Add sources if provided
+        if sources:
+            cached_data["sources"] = sources
+        return cached_data, (3600 if has_pdf else 1800)
+    
     @staticmethod
     def cache_response(user_id: int, query: str, has_pdf: bool, response: str, source: str, sources: list = None) -> bool:
         """Cache a response for a query with optional source citations"""
         try:
             cache_key = ChatCache._generate_cache_key(user_id, query, has_pdf)
-            
-            # Cache for 30 minutes for general queries, 1 hour for PDF queries
-            expire_time = 3600 if has_pdf else 1800
-            
-            cached_data = {
-                "response": response,
-                "source": source,
-                "query": query,
-                "has_pdf": has_pdf
-            }
-            
-            # Add sources if provided
-            if sources:
-                cached_data["sources"] = sources
+            cached_data, expire_time = ChatCache._cache_entry(query, has_pdf, response, source, sources)
             
             success = cache.set_json(cache_key, cached_data, expire=expire_time)
             
@@ -62,6 +72,12 @@ class ChatCache:
             logger.error(f"Error caching response: {e}")
             return False
     
+    @staticmethod
+    async def acache_response(user_id: int, query: str, has_pdf: bool, response: str, source: str, sources: list = None) -> bool:
+        """Async cache_response for async routes"""
+        cached_data, expire_time = ChatCache._cache_entry(query, has_pdf, response, source, sources)
+        return await async_cache.set_json(ChatCache._generate_cache_key(user_id, query, has_pdf), cached_data, expire=expire_time)
+    
     @staticmethod
     def clear_user_chat_cache(user_id: int):
         """Clear all chat cache for a user"""
@@ -72,9 +88,11 @@ class ChatCache:
             
             cleared_general = cache.clear_pattern(general_pattern)
             cleared_pdf = cache.clear_pattern(pdf_pattern)
+            cleared_semantic = cache.clear_pattern(f"chat_semantic:user:{user_id}:*")
             
-            logger.info(f"Cleared chat cache for user {user_id}: {cleared_general + cleared_pdf} entries")
-            return cleared_general + cleared_pdf
+            cleared = cleared_general + cleared_pdf + cleared_semantic
+            logger.info(f"Cleared chat cache for user {user_id}: {cleared} entries")
+            return cleared
             
         except Exception as e:
             logger.error(f"Error clearing user chat cache: {e}")
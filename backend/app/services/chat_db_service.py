@@ -1,6 +1,28 @@
-from ...database_connection import get_db_connection
+from ...database_connection import get_db_connection, get_async_db_connection
+from ..utils.pagination import decode_cursor, split_page
 from typing import List, Dict, Optional
-from datetime import datetime, timezone
+from datetime import datetime, timezone, timedelta
+
+# Insert both messages of a turn, then upsert the chat with the number of messages actually inserted.
+# A turn whose ids are already stored (redelivered write-behind turn, possibly flushed concurrently by
+# another consumer) inserts nothing and leaves the chat untouched; ids are NULL for synchronous writes.
+# The chats foreign key is checked at the end of the statement, after the chat row exists.
+_SAVE_TURN_SQL = """
+    WITH inserted AS (
+        INSERT INTO messages (chat_id, role, content, source, created_at, message_id)
+        VALUES
+            (%(chat_id)s, 'user', %(query)s, 'general', %(asked_at)s, %(question_id)s),
+            (%(chat_id)s, 'assistant', %(response)s, %(source)s, %(answered_at)s, %(answer_id)s)
+        ON CONFLICT DO NOTHING
+        RETURNING 1
+    )
+    INSERT INTO chats (chat_id, user_id, title, created_at, updated_at, message_count)
+    SELECT %(chat_id)s, %(user_id)s, %(title)s, %(now)s, %(now)s, COUNT(*)
+    FROM inserted
+    HAVING COUNT(*) > 0
+    ON CONFLICT (chat_id) DO UPDATE
+    SET updated_at = EXCLUDED.updated_at, message_count = chats.message_count + EXCLUDED.message_count
+"""
 
 class ChatDBService:
     
@@ -48,17 +70,64 @@ class ChatDBService:
                 VALUES (%s, %s, %s, %s, %s)
             """, (chat_id, role, content, source, now))
             
-            # Update chat's updated_at and message_count
+            # Update chat's updated_at and message_count (increment, not a recount of the history)
             cursor.execute("""
                 UPDATE chats 
                 SET updated_at = %s, 
-                    message_count = (SELECT COUNT(*) FROM messages WHERE chat_id = %s)
+                    message_count = message_count + 1
                 WHERE chat_id = %s
-            """, (now, chat_id, chat_id))
+            """, (now, chat_id))
             
             conn.commit()
             return True
     
+    @staticmethod
+    def _turn_params(user_id: int, chat_id: str, query: str, response: str, source: str = "general",
+                     asked_at: datetime = None, turn_id: str = None, answered_at: datetime = None) -> Dict:
+        now = datetime.now(timezone.utc)
+        asked_at = asked_at or now
+        answered_at = answered_at or now
+        title = query[:50] + "..." if query and len(query) > 50 else query or "New Chat"
+        return {
+            "chat_id": chat_id, "user_id": user_id, "title": title, "now": now,
+            "query": query, "response": response, "source": source,
+            # Keep the answer strictly after the question for created_at ordering
+            "asked_at": asked_at, "answered_at": max(answered_at, asked_at + timedelta(microseconds=1)),
+            "question_id": f"{turn_id}:user" if turn_id else None,
+            "answer_id": f"{turn_id}:assistant" if turn_id else None,
+        }
+    
+    @staticmethod
+    def save_turn(user_id: int, chat_id: str, query: str, response: str, source: str = "general",
+                  asked_at: datetime = None, turn_id: str = None, answered_at: datetime = None) -> bool:
+        """
+        Save a user question and the assistant answer in one statement
+        
+        Creates the chat on its first turn (titled from the question), otherwise bumps
+        message_count by 2 - no history scan, so the cost stays flat as chats grow.
+        With a turn_id the write is idempotent: a turn already stored is skipped.
+        """
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(_SAVE_TURN_SQL, ChatDBService._turn_params(
+                user_id, chat_id, query, response, source, asked_at, turn_id, answered_at))
+            conn.commit()
+            return cursor.rowcount == 1
+    
+    @staticmethod
+    def save_turns(turns: List[Dict]) -> int:
+        """Save a batch of turns (save_turn keyword dicts) in one transaction, returns how many were new"""
+        if not turns:
+            return 0
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            saved = 0
+            for turn in turns:
+                cursor.execute(_SAVE_TURN_SQL, ChatDBService._turn_params(**turn))
+                saved += cursor.rowcount == 1
+            conn.commit()
+            return saved
+    
     @staticmethod
     def get_user_chats(user_id: int) -> List[Dict]:
         """Get all chats for a user, ordered by most recent"""
@@ -74,6 +143,67 @@ class ChatDBService:
             chats = cursor.fetchall()
             return [dict(chat) for chat in chats]
     
+    @staticmethod
+    def _chats_page_query(user_id: int, limit: Optional[int], page_cursor: Optional[str]) -> tuple:
+        """SQL and parameters of one chat list page (limit + 1 rows to detect a next page)"""
+        fetch = None if limit is None else limit + 1
+        if page_cursor:
+            updated_at, last_chat_id = decode_cursor(page_cursor)
+            return """
+                SELECT chat_id, title, created_at, updated_at, message_count
+                FROM chats
+                WHERE user_id = %s AND (updated_at, chat_id) < (%s, %s)
+                ORDER BY updated_at DESC, chat_id DESC
+                LIMIT %s
+            """, (user_id, updated_at, last_chat_id, fetch)
+        return """
+            SELECT chat_id, title, created_at, updated_at, message_count
+            FROM chats
+            WHERE user_id = %s
+            ORDER BY updated_at DESC, chat_id DESC
+            LIMIT %s
+        """, (user_id, fetch)
+    
+    @staticmethod
+    def get_user_chats_page(user_id: int, limit: Optional[int], page_cursor: Optional[str] = None) -> Dict:
+        """Most recently updated chats first, keyset-paginated on (updated_at, chat_id); limit None = all chats"""
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(*ChatDBService._chats_page_query(user_id, limit, page_cursor))
+            chats, next_cursor = split_page([dict(chat) for chat in cursor.fetchall()], limit, ("updated_at", "chat_id"))
+            return {"chats": chats, "next_cursor": next_cursor}
+    
+    @staticmethod
+    async def aget_user_chats_page(user_id: int, limit: Optional[int], page_cursor: Optional[str] = None) -> Dict:
+        """get_user_chats_page on the async (psycopg 3) pool"""
+        async with get_async_db_connection() as conn:
+            cursor = await conn.execute(*ChatDBService._chats_page_query(user_id, limit, page_cursor))
+            chats, next_cursor = split_page(await cursor.fetchall(), limit, ("updated_at", "chat_id"))
+            return {"chats": chats, "next_cursor": next_cursor}
+    
+    @staticmethod
+    def _existing_chat_ids_query(user_id: int, chat_ids: List[str]) -> tuple:
+        return "SELECT chat_id FROM chats WHERE user_id = %s AND chat_id = ANY(%s)", (user_id, list(chat_ids))
+    
+    @staticmethod
+    def get_existing_chat_ids(user_id: int, chat_ids: List[str]) -> set:
+        """Which of the given chats are stored for the user"""
+        if not chat_ids:
+            return set()
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(*ChatDBService._existing_chat_ids_query(user_id, chat_ids))
+            return {row['chat_id'] for row in cursor.fetchall()}
+    
+    @staticmethod
+    async def aget_existing_chat_ids(user_id: int, chat_ids: List[str]) -> set:
+        """get_existing_chat_ids on the async (psycopg 3) pool"""
+        if not chat_ids:
+            return set()
+        async with get_async_db_connection() as conn:
+            cursor = await conn.execute(*ChatDBService._existing_chat_ids_query(user_id, chat_ids))
+            return {row['chat_id'] for row in await cursor.fetchall()}
+    
     @staticmethod
     def get_chat_messages(chat_id: str, user_id: int) -> List[Dict]:
         """Get all messages for a specific chat (with user verification)"""
@@ -90,7 +220,7 @@ class ChatDBService:
             
             # Get messages
             cursor.execute("""
-                SELECT role, content, source, created_at
+                SELECT role, content, source, created_at, message_id
                 FROM messages 
                 WHERE chat_id = %s 
                 ORDER BY created_at ASC
@@ -99,6 +229,45 @@ class ChatDBService:
             messages = cursor.fetchall()
             return [dict(message) for message in messages]
     
+    @staticmethod
+    def get_chat_messages_page(chat_id: str, user_id: int, limit: Optional[int], before: Optional[str] = None) -> Dict:
+        """
+        The latest limit messages of a chat (or those older than the before cursor), in
+        chronological order; next_cursor pages further back on (created_at, id). limit None = all messages
+        """
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            
+            # Verify chat belongs to user
+            cursor.execute("""
+                SELECT 1 FROM chats WHERE chat_id = %s AND user_id = %s
+            """, (chat_id, user_id))
+            
+            if not cursor.fetchone():
+                raise Exception("Chat not found or access denied")
+            
+            if before:
+                created_at, last_id = decode_cursor(before)
+                cursor.execute("""
+                    SELECT id, role, content, source, created_at, message_id
+                    FROM messages
+                    WHERE chat_id = %s AND (created_at, id) < (%s, %s)
+                    ORDER BY created_at DESC, id DESC
+                    LIMIT %s
+                """, (chat_id, created_at, last_id, None if limit is None else limit + 1))
+            else:
+                cursor.execute("""
+                    SELECT id, role, content, source, created_at, message_id
+                    FROM messages
+                    WHERE chat_id = %s
+                    ORDER BY created_at DESC, id DESC
+                    LIMIT %s
+                """, (chat_id, None if limit is None else limit + 1))
+            
+            messages, next_cursor = split_page([dict(message) for message in cursor.fetchall()], limit, ("created_at", "id"))
+            messages.reverse()
+            return {"messages": messages, "next_cursor": next_cursor}
+    
     @staticmethod
     def delete_chat(chat_id: str, user_id: int) -> bool:
         """Delete a chat and all its messages (with user verification)"""
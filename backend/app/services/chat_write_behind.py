@@ -0,0 +1,271 @@
+import os
+import threading
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from loguru import logger
+from ...redis_cache import cache, PROCESS_ORIGIN
+from .chat_db_service import ChatDBService
+from ..utils.executors import run_db
+
+# Persist chat turns through a Redis stream flushed in batches instead of on the request path
+CHAT_WRITE_BEHIND = os.getenv("CHAT_WRITE_BEHIND", "false").lower() in ("1", "true", "yes")
+CHAT_WRITE_BEHIND_BATCH = int(os.getenv("CHAT_WRITE_BEHIND_BATCH", "100"))
+CHAT_WRITE_BEHIND_BLOCK_MS = int(os.getenv("CHAT_WRITE_BEHIND_BLOCK_MS", "1000"))
+# Entries a consumer read but did not acknowledge for this long are redelivered to another
+CHAT_WRITE_BEHIND_CLAIM_IDLE_MS = int(os.getenv("CHAT_WRITE_BEHIND_CLAIM_IDLE_MS", "60000"))
+# Unflushed turns are kept for history reads at most this long (must exceed any flush backlog)
+CHAT_WRITE_BEHIND_PENDING_TTL = int(os.getenv("CHAT_WRITE_BEHIND_PENDING_TTL", str(24 * 3600)))
+
+STREAM = "chat_turns"
+GROUP = "chat-history-writers"
+
+
+def _pending_key(user_id: int) -> str:
+    return f"chat_pending:user:{user_id}"
+
+
+def _utc(value: Optional[datetime]) -> datetime:
+    """Comparable timestamp (naive values are UTC)"""
+    if value is None:
+        return datetime.min.replace(tzinfo=timezone.utc)
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def _parse_turn(turn: Dict) -> Dict:
+    """Queued turn with its timestamps (stored as text) parsed back to datetimes"""
+    return {**turn, **{key: datetime.fromisoformat(turn[key]) if turn.get(key) else None
+                       for key in ("asked_at", "answered_at")}}
+
+
+class ChatWriteBehind:
+    """
+    Write-behind persistence of chat turns
+
+    save_turn queues a turn on a Redis stream and records it in the user's pending hash;
+    a background consumer in each API process flushes batches to Postgres with
+    ChatDBService.save_turns and acknowledges them afterwards. Delivery is at-least-once:
+    unacknowledged entries are reclaimed from crashed consumers, and turn ids make the
+    database write idempotent. A turn leaves the pending hash once stored, so history
+    reads merge pending turns to read their own writes; deleting a chat discards its
+    pending turns so the consumer does not recreate it.
+    """
+
+    _thread = None
+    _stop = threading.Event()
+
+    @staticmethod
+    def save_turn(user_id: int, chat_id: str, query: str, response: str, source: str = "general",
+                  asked_at: datetime = None) -> bool:
+        """Persist a turn: queued when write-behind is enabled, otherwise (or if Redis fails) synchronously"""
+        if CHAT_WRITE_BEHIND:
+            answered_at = datetime.now(timezone.utc)
+            turn = {"turn_id": uuid.uuid4().hex, "user_id": user_id, "chat_id": chat_id, "query": query,
+                    "response": response, "source": source, "asked_at": asked_at or answered_at,
+                    "answered_at": answered_at}
+            if cache.hset_json(_pending_key(user_id), turn["turn_id"], turn, expire=CHAT_WRITE_BEHIND_PENDING_TTL):
+                try:
+                    cache.stream_add(STREAM, turn)
+                    return True
+                except Exception as e:
+                    cache.hdel(_pending_key(user_id), turn["turn_id"])
+                    logger.warning(f"⚠️ Write-behind queue unavailable ({e}), saving turn synchronously")
+        return ChatDBService.save_turn(user_id, chat_id, query, response, source, asked_at)
+
+    @staticmethod
+    def pending_turns(user_id: int, chat_id: Optional[str] = None) -> List[Dict]:
+        """Turns not yet flushed to Postgres, oldest first"""
+        if not CHAT_WRITE_BEHIND:
+            return []
+        turns = [_parse_turn(turn) for turn in cache.hget_json_all(_pending_key(user_id)).values()
+                 if chat_id is None or turn.get("chat_id") == chat_id]
+        return sorted(turns, key=lambda turn: turn["asked_at"])
+
+    @staticmethod
+    def merge_pending_messages(messages: List[Dict], pending: List[Dict]) -> List[Dict]:
+        """Stored messages plus pending turns that are not stored yet"""
+        stored_ids = {message.get("message_id") for message in messages}
+        merged = list(messages)
+        for turn in pending:
+            if f"{turn['turn_id']}:user" in stored_ids:
+                continue
+            merged.append({"role": "user", "content": turn["query"], "source": "general",
+                           "created_at": turn["asked_at"], "message_id": f"{turn['turn_id']}:user"})
+            merged.append({"role": "assistant", "content": turn["response"], "source": turn["source"],
+                           "created_at": turn.get("answered_at") or turn.get("asked_at"),
+                           "message_id": f"{turn['turn_id']}:assistant"})
+        return merged
+
+    @staticmethod
+    def merge_pending_chats(chats: List[Dict], pending: List[Dict], stored_chat_ids: set,
+                            limit: Optional[int] = None) -> List[Dict]:
+        """
+        A page of stored chats with pending turns applied
+
+        Chats on the page count their pending turns and move up to their latest turn; chats
+        not stored yet are added, as many as fit in limit. Stored chats outside the page keep
+        their place on a later page instead of showing up twice.
+        """
+        turns_by_chat = {}
+        for turn in pending:
+            turns_by_chat.setdefault(turn["chat_id"], []).append(turn)
+
+        merged = []
+        for chat in chats:
+            turns = turns_by_chat.get(chat["chat_id"])
+            if turns:
+                latest = turns[-1]["answered_at"] or turns[-1]["asked_at"]
+                chat = {**chat, "updated_at": max(_utc(chat["updated_at"]), _utc(latest)),
+                        "message_count": (chat["message_count"] or 0) + 2 * len(turns)}
+            merged.append(chat)
+
+        created = []
+        for chat_id, turns in turns_by_chat.items():
+            if chat_id in stored_chat_ids:
+                continue
+            query = turns[0]["query"]
+            created.append({
+                "chat_id": chat_id,
+                "title": query[:50] + "..." if len(query) > 50 else query or "New Chat",
+                "created_at": turns[0]["asked_at"],
+                "updated_at": turns[-1]["answered_at"] or turns[-1]["asked_at"],
+                "message_count": 2 * len(turns),
+            })
+        created.sort(key=lambda chat: _utc(chat["updated_at"]), reverse=True)
+        if limit is not None:
+            created = created[:max(limit - len(merged), 0)]
+        return sorted(created + merged, key=lambda chat: _utc(chat["updated_at"]), reverse=True)
+
+    @staticmethod
+    def get_chat_messages_page(chat_id: str, user_id: int, limit: Optional[int], before: Optional[str] = None) -> Dict:
+        """ChatDBService.get_chat_messages_page with this user's unflushed turns on the latest page"""
+        # Pending turns are newer than anything stored, so only the latest page shows them
+        pending = ChatWriteBehind.pending_turns(user_id, chat_id) if before is None else []
+        try:
+            page = ChatDBService.get_chat_messages_page(chat_id, user_id, limit, before)
+        except Exception:
+            # A chat created by turns still in the queue is not in Postgres yet
+            if not pending:
+                raise
+            page = {"messages": [], "next_cursor": None}
+        page["messages"] = ChatWriteBehind.merge_pending_messages(page["messages"], pending)
+        return page
+
+    @staticmethod
+    def _first_page_limit(limit: Optional[int], pending: List[Dict], stored_chat_ids: set) -> Optional[int]:
+        """Stored chats to fetch so the first page has room for chats that exist only as pending turns"""
+        new_chats = len({turn["chat_id"] for turn in pending} - stored_chat_ids)
+        return None if limit is None else max(limit - new_chats, 1)
+
+    @staticmethod
+    def get_user_chats_page(user_id: int, limit: Optional[int], page_cursor: Optional[str] = None) -> Dict:
+        """ChatDBService.get_user_chats_page with this user's unflushed turns applied to the first page"""
+        pending = ChatWriteBehind.pending_turns(user_id) if page_cursor is None else []
+        if not pending:
+            return ChatDBService.get_user_chats_page(user_id, limit, page_cursor)
+
+        stored_chat_ids = ChatDBService.get_existing_chat_ids(user_id, list({turn["chat_id"] for turn in pending}))
+        # next_cursor still follows stored chats
+        page = ChatDBService.get_user_chats_page(
+            user_id, ChatWriteBehind._first_page_limit(limit, pending, stored_chat_ids))
+        page["chats"] = ChatWriteBehind.merge_pending_chats(page["chats"], pending, stored_chat_ids, limit)
+        return page
+
+    @staticmethod
+    async def aget_user_chats_page(user_id: int, limit: Optional[int], page_cursor: Optional[str] = None) -> Dict:
+        """get_user_chats_page with Postgres reads on the async pool"""
+        pending = await run_db(ChatWriteBehind.pending_turns, user_id) if page_cursor is None else []
+        if not pending:
+            return await ChatDBService.aget_user_chats_page(user_id, limit, page_cursor)
+
+        stored_chat_ids = await ChatDBService.aget_existing_chat_ids(user_id, list({turn["chat_id"] for turn in pending}))
+        page = await ChatDBService.aget_user_chats_page(
+            user_id, ChatWriteBehind._first_page_limit(limit, pending, stored_chat_ids))
+        page["chats"] = ChatWriteBehind.merge_pending_chats(page["chats"], pending, stored_chat_ids, limit)
+        return page
+
+    @staticmethod
+    def delete_chat(chat_id: str, user_id: int) -> bool:
+        """Discard the chat's unflushed turns, then delete it from Postgres"""
+        discarded = ChatWriteBehind.discard_chat(user_id, chat_id)
+        try:
+            return ChatDBService.delete_chat(chat_id, user_id)
+        except Exception:
+            if not discarded:
+                raise
+            return True
+
+    @staticmethod
+    def discard_chat(user_id: int, chat_id: str) -> int:
+        """Drop a chat's pending turns (chat deleted before they were flushed)"""
+        turn_ids = [turn["turn_id"] for turn in ChatWriteBehind.pending_turns(user_id, chat_id)]
+        return cache.hdel(_pending_key(user_id), *turn_ids)
+
+    @staticmethod
+    def flush(entries: List[tuple]) -> int:
+        """Store a batch of stream entries, then acknowledge them; returns how many turns were new"""
+        turns = []
+        pending_by_user = {}
+        for _, turn in entries:
+            pending = pending_by_user.get(turn["user_id"])
+            if pending is None:
+                pending = pending_by_user[turn["user_id"]] = cache.hkeys(_pending_key(turn["user_id"]))
+            # Not pending any more: already stored by an earlier delivery, or its chat was deleted
+            if turn["turn_id"] in pending:
+                turns.append(turn)
+
+        saved = ChatDBService.save_turns([
+            {key: turn[key] for key in ("user_id", "chat_id", "query", "response", "source", "turn_id",
+                                        "asked_at", "answered_at")}
+            for turn in map(_parse_turn, turns)
+        ])
+        for user_id in pending_by_user:
+            cache.hdel(_pending_key(user_id), *[turn["turn_id"] for turn in turns if turn["user_id"] == user_id])
+        cache.stream_ack(STREAM, GROUP, [entry_id for entry_id, _ in entries])
+        return saved
+
+    @staticmethod
+    def start() -> None:
+        """Start the background flusher thread (idempotent, no-op unless CHAT_WRITE_BEHIND)"""
+        if not CHAT_WRITE_BEHIND:
+            return
+        if ChatWriteBehind._thread is not None and ChatWriteBehind._thread.is_alive():
+            return
+        ChatWriteBehind._stop.clear()
+        ChatWriteBehind._thread = threading.Thread(
+            target=ChatWriteBehind._run, name="chat-write-behind", daemon=True
+        )
+        ChatWriteBehind._thread.start()
+
+    @staticmethod
+    def stop() -> None:
+        """Stop the flusher; unflushed entries stay in the stream for the next consumer"""
+        ChatWriteBehind._stop.set()
+        if ChatWriteBehind._thread is not None:
+            ChatWriteBehind._thread.join(timeout=CHAT_WRITE_BEHIND_BLOCK_MS / 1000 + 5)
+            ChatWriteBehind._thread = None
+
+    @staticmethod
+    def _run() -> None:
+        backoff = 1
+        while not ChatWriteBehind._stop.is_set():
+            try:
+                cache.stream_create_group(STREAM, GROUP)
+                logger.info(f"📝 Flushing chat turns from the write-behind queue ({PROCESS_ORIGIN})")
+                backoff = 1
+                while not ChatWriteBehind._stop.is_set():
+                    entries = cache.stream_claim_stale(STREAM, GROUP, PROCESS_ORIGIN,
+                                                       CHAT_WRITE_BEHIND_CLAIM_IDLE_MS, CHAT_WRITE_BEHIND_BATCH)
+                    if not entries:
+                        entries = cache.stream_read_group(STREAM, GROUP, PROCESS_ORIGIN,
+                                                          CHAT_WRITE_BEHIND_BATCH, CHAT_WRITE_BEHIND_BLOCK_MS)
+                    if entries:
+                        saved = ChatWriteBehind.flush(entries)
+                        logger.debug(f"📝 Flushed {len(entries)} queued chat turns ({saved} new)")
+            except Exception as e:
+                if ChatWriteBehind._stop.is_set():
+                    break
+                logger.warning(f"⚠️ Chat write-behind flush failed ({e}), retrying in {backoff}s")
+                ChatWriteBehind._stop.wait(backoff)
+                backoff = min(backoff * 2, 30)
@@ -0,0 +1,129 @@
+import os
+import shutil
+import uuid
+from typing import Optional, Dict
+from loguru import logger
+from ...database_connection import get_db_connection
+from ...vector_store_db import (
+    find_shared_document,
+    release_user_vector_stores,
+    pop_unreferenced_documents,
+    is_content_hash_referenced,
+)
+from ..utils.file_utils import UPLOAD_DIR
+from .dual_embedding_manager import DualEmbeddingManager
+
+VECTOR_STORE_DIR = os.path.join(os.path.dirname(__file__), '../../vector_stores')
+
+
+class DocumentStore:
+    """
+    Content-addressed storage for uploaded PDFs and their vector stores
+
+    Uploads live at uploads/documents/<hash>.pdf and vector stores at
+    vector_stores/documents/<hash>/<embedding model>/, shared by every user who
+    uploads the same bytes. shared_documents.ref_count tracks how many user indexes
+    contain a document (see UserVectorIndex); unreferenced documents are garbage-collected.
+    Until its document is registered, a queued upload is a private staged copy owned by
+    its processing task, so garbage collection never removes a file a task still needs.
+    """
+
+    UPLOADS_DIR = os.path.join(UPLOAD_DIR, "documents")
+    STAGING_DIR = os.path.join(UPLOAD_DIR, "documents", "staging")
+    VECTOR_STORES_DIR = os.path.join(VECTOR_STORE_DIR, "documents")
+
+    @staticmethod
+    def get_upload_path(content_hash: str) -> str:
+        """Content-addressed path of an uploaded PDF"""
+        return os.path.join(DocumentStore.UPLOADS_DIR, f"{content_hash}.pdf")
+
+    @staticmethod
+    def get_vector_store_path(content_hash: str, embedding_model: str) -> str:
+        """Content-addressed path of a document's vector store for an embedding model"""
+        model_dir = embedding_model.replace("/", "__")
+        return os.path.join(DocumentStore.VECTOR_STORES_DIR, content_hash, model_dir)
+
+    @staticmethod
+    def get_legacy_vector_store_dir(user_id: int) -> str:
+        """Per-user vector store directory of the single-document flow (before content addressing)"""
+        return os.path.join(VECTOR_STORE_DIR, f"user_{user_id}")
+
+    @staticmethod
+    def store_upload(file_path: str, content_hash: str) -> str:
+        """Move a freshly saved upload to a staging path owned by its processing task"""
+        os.makedirs(DocumentStore.STAGING_DIR, exist_ok=True)
+        staged_path = os.path.join(DocumentStore.STAGING_DIR, f"{content_hash}-{uuid.uuid4().hex}.pdf")
+        os.replace(file_path, staged_path)
+        return staged_path
+
+    @staticmethod
+    def adopt_upload(file_path: str, content_hash: str) -> str:
+        """Move a staged upload to its content-addressed location once its document is registered"""
+        target_path = DocumentStore.get_upload_path(content_hash)
+        if os.path.abspath(file_path) == os.path.abspath(target_path):
+            return target_path
+
+        if os.path.exists(target_path):
+            # Same bytes are already stored (e.g. another user's upload was processed first)
+            os.remove(file_path)
+        else:
+            os.replace(file_path, target_path)
+        return target_path
+
+    @staticmethod
+    def find_existing(content_hash: str) -> Optional[Dict]:
+        """Find a processed document for the hash built with one of the configured embedding models"""
+        with get_db_connection() as conn:
+            document = find_shared_document(conn, content_hash, list(DualEmbeddingManager.MODELS.values()))
+
+        if document and not os.path.exists(os.path.join(document['vector_store_path'], "index.faiss")):
+            logger.warning(f"⚠️ Shared vector store missing on disk for {content_hash[:12]}, reprocessing")
+            return None
+        return document
+
+    @staticmethod
+    def release_user(user_id: int) -> None:
+        """Drop all of a user's document references (clear PDF / logout)"""
+        with get_db_connection() as conn:
+            release_user_vector_stores(conn, user_id)
+        DocumentStore.collect_garbage()
+
+    @staticmethod
+    def discard_upload(file_path: str) -> None:
+        """Remove a staged upload that never made it into a shared document (failed processing)"""
+        # Content-addressed files may be used by other users and are only removed by collect_garbage
+        if os.path.dirname(os.path.abspath(file_path)) != os.path.abspath(DocumentStore.STAGING_DIR):
+            return
+        if os.path.exists(file_path):
+            os.remove(file_path)
+            logger.info(f"🗑️ Discarded unprocessed upload {os.path.basename(file_path)}")
+
+    @staticmethod
+    def collect_garbage() -> int:
+        """Delete files of shared documents that no user references any more"""
+        try:
+            with get_db_connection() as conn:
+                documents = pop_unreferenced_documents(conn)
+                orphaned_hashes = {
+                    doc['content_hash'] for doc in documents
+                    if not is_content_hash_referenced(conn, doc['content_hash'])
+                }
+
+            for document in documents:
+                shutil.rmtree(document['vector_store_path'], ignore_errors=True)
+
+            for content_hash in orphaned_hashes:
+                upload_path = DocumentStore.get_upload_path(content_hash)
+                if os.path.exists(upload_path):
+                    os.remove(upload_path)
+                hash_dir = os.path.join(DocumentStore.VECTOR_STORES_DIR, content_hash)
+                if os.path.isdir(hash_dir) and not os.listdir(hash_dir):
+                    os.rmdir(hash_dir)
+
+            if documents:
+                logger.info(f"🗑️ Garbage-collected {len(documents)} unreferenced shared documents")
+            return len(documents)
+
+        except Exception as e:
+            logger.warning(f"⚠️ Shared document garbage collection failed: {e}")
+            return 0
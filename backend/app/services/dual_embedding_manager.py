@@ -1,11 +1,43 @@
+from langchain_core.embeddings import Embeddings
 from langchain_huggingface import HuggingFaceEmbeddings
-from typing import Literal
+from typing import List, Literal, Optional
 import logging
+import os
+import time
+from .embedding_cache import get_embedding_cache
 
 logger = logging.getLogger(__name__)
 
+# Chunks per forward pass when encoding (tune per worker CPU)
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+
+# "torch" (full precision) or "onnx" (int8 quantized ONNX export, see onnx_embedding_backend)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+
+# Unix socket of the shared embedding server (see embedding_server); unset = load models in-process
+_EMBEDDING_SERVER_SOCKET = os.getenv("EMBEDDING_SERVER_SOCKET") or None
+
 # Global cache for embedding models - shared across ALL instances
 _GLOBAL_EMBEDDING_CACHE = {}
+# Embedding server clients per language, used instead of local models when a server is configured
+_EMBEDDING_SERVER_CLIENTS = {}
+# Backend each cached model actually runs on (onnx falls back to torch when unavailable)
+_GLOBAL_EMBEDDING_BACKENDS = {}
+
+_PARITY_SAMPLE_TEXTS = {
+    'english': [
+        "The quarterly report shows revenue growth across all regions.",
+        "Photosynthesis converts light energy into chemical energy in plants.",
+        "Section 4.2 describes the termination clauses of the agreement.",
+        "How do I reset my password?",
+    ],
+    'tamil': [
+        "தமிழ் உலகின் மிகப் பழமையான மொழிகளில் ஒன்றாகும்.",
+        "இந்த அறிக்கை அனைத்து பகுதிகளிலும் வருவாய் வளர்ச்சியைக் காட்டுகிறது.",
+        "ஒப்பந்தத்தின் முடிவு விதிகள் பிரிவு 4.2 இல் விவரிக்கப்பட்டுள்ளன.",
+        "என் கடவுச்சொல்லை எப்படி மாற்றுவது?",
+    ],
+}
 
 class DualEmbeddingManager:
     """
@@ -24,37 +56,48 @@ class DualEmbeddingManager:
         logger.info("Initialized Dual Embedding Manager")
     
     @classmethod
-    def _check_redis_cache(cls, language: str) -> bool:
-        """Check if model exists in Redis cache"""
-        try:
-            from ...redis_cache import cache
-            key = f"embedding_model_loaded:{language}"
-            cached = cache.get(key)
-            if cached:
-                logger.info(f"🔄 {language} model was previously loaded in another process")
-                return True
-            return False
-        except Exception as e:
-            logger.debug(f"Redis cache check failed: {e}")
-            return False
+    def set_embedding_server(cls, socket_path: Optional[str]):
+        """Route encodes through the embedding server at socket_path (None = load models in-process)"""
+        global _EMBEDDING_SERVER_SOCKET
+        if socket_path != _EMBEDDING_SERVER_SOCKET:
+            _EMBEDDING_SERVER_SOCKET = socket_path
+            cls.clear_cache()
     
     @classmethod
-    def _mark_redis_cache(cls, language: str):
-        """Mark model as loaded in Redis cache"""
-        try:
-            from ...redis_cache import cache
-            key = f"embedding_model_loaded:{language}"
-            cache.set(key, True, expire=3600 * 24)  # 24 hours
-            logger.info(f"✅ Marked {language} model as loaded in Redis")
-        except Exception as e:
-            logger.debug(f"Redis cache marking failed: {e}")
-
+    def _connect_embedding_server(cls, language: str):
+        """Client for the embedding server, or None when it is not reachable"""
+        from .embedding_server import EmbeddingServerClient
+        client = EmbeddingServerClient(language, _EMBEDDING_SERVER_SOCKET)
+        if client.ping():
+            return client
+        logger.warning(f"Embedding server not reachable at {_EMBEDDING_SERVER_SOCKET}, "
+                       f"loading {language} model in this process")
+        return None
+    
     @classmethod
-    def get_embeddings_static(cls, language: Literal['english', 'tamil']) -> HuggingFaceEmbeddings:
+    def get_embeddings_static(cls, language: Literal['english', 'tamil']) -> Embeddings:
         """
-        Class method to get appropriate embedding model for the language with Redis awareness
-        Models are cached globally after first load for maximum performance
+        Class method to get appropriate embedding model for the language
+        Models are cached globally after first load for maximum performance; with
+        EMBEDDING_SERVER_SOCKET set, a client of the shared embedding server is returned instead
         """
+        if language not in cls.MODELS:
+            raise ValueError(f"Unsupported language: {language}. Supported: {list(cls.MODELS.keys())}")
+        
+        if _EMBEDDING_SERVER_SOCKET and language not in _GLOBAL_EMBEDDING_CACHE:
+            if language in _EMBEDDING_SERVER_CLIENTS:
+                return _EMBEDDING_SERVER_CLIENTS[language]
+            client = cls._connect_embedding_server(language)
+            if client is not None:
+                logger.info(f"🔌 Using embedding server at {_EMBEDDING_SERVER_SOCKET} for {language}")
+                _EMBEDDING_SERVER_CLIENTS[language] = client
+                return client
+        
+        return cls.get_local_embeddings(language)
+    
+    @classmethod
+    def get_local_embeddings(cls, language: Literal['english', 'tamil']) -> HuggingFaceEmbeddings:
+        """Model loaded in this process (what the embedding server itself encodes with)"""
         global _GLOBAL_EMBEDDING_CACHE
         
         if language not in cls.MODELS:
@@ -65,27 +108,17 @@ class DualEmbeddingManager:
             logger.info(f"⚡ Using globally cached {language} embedding model")
             return _GLOBAL_EMBEDDING_CACHE[language]
         
-        # Check if model was loaded in another process (REDIS AWARENESS)
         model_name = cls.MODELS[language]
-        if cls._check_redis_cache(language):
-            logger.info(f"🔄 {language} model exists in another process, loading to this process...")
-        else:
-            logger.info(f"🤖 Loading {language} embedding model: {model_name} (first time across all processes)")
+        logger.info(f"🤖 Loading {language} embedding model: {model_name}")
         
         try:
-            embedding_model = HuggingFaceEmbeddings(
-                model_name=model_name,
-                model_kwargs={"device": "cpu"},
-                encode_kwargs={"normalize_embeddings": True}
-            )
+            embedding_model, backend = cls._load_model(model_name, EMBEDDING_BACKEND)
             
             # Cache the model GLOBALLY
             _GLOBAL_EMBEDDING_CACHE[language] = embedding_model
+            _GLOBAL_EMBEDDING_BACKENDS[language] = backend
             
-            # Mark as loaded in Redis for other processes
-            cls._mark_redis_cache(language)
-            
-            logger.info(f"✅ {language.title()} embedding model loaded and cached globally")
+            logger.info(f"✅ {language.title()} embedding model loaded ({backend}) and cached globally")
             logger.info(f"📊 Global cache now contains: {list(_GLOBAL_EMBEDDING_CACHE.keys())}")
             
             return embedding_model
@@ -94,10 +127,167 @@ class DualEmbeddingManager:
             logger.error(f"❌ Failed to load {language} embedding model {model_name}: {e}")
             raise e
     
-    def get_embeddings(self, language: Literal['english', 'tamil']) -> HuggingFaceEmbeddings:
+    @staticmethod
+    def _load_model(model_name: str, backend: str):
+        """Load a model on the requested backend, returns (embeddings, backend actually used)"""
+        encode_kwargs = {"normalize_embeddings": True}
+        if backend == "onnx":
+            try:
+                from .onnx_embedding_backend import load_onnx_embeddings
+                return load_onnx_embeddings(model_name, encode_kwargs), "onnx"
+            except Exception as e:
+                logger.warning(f"ONNX backend unavailable for {model_name}, falling back to PyTorch: {e}")
+        
+        embeddings = HuggingFaceEmbeddings(
+            model_name=model_name,
+            model_kwargs={"device": "cpu"},
+            encode_kwargs=encode_kwargs
+        )
+        return embeddings, "torch"
+    
+    @classmethod
+    def get_cache_model_name(cls, language: Literal['english', 'tamil'], local: bool = False) -> str:
+        """
+        Key for the persistent embedding cache: quantized vectors are cached apart from
+        full-precision ones so the two never mix within a document
+        """
+        embeddings = cls.get_local_embeddings(language) if local else cls.get_embeddings_static(language)
+        model_name = cls.MODELS[language]
+        if hasattr(embeddings, "cache_model_name"):
+            return embeddings.cache_model_name
+        if _GLOBAL_EMBEDDING_BACKENDS.get(language) == "onnx":
+            from .onnx_embedding_backend import ONNX_QUANTIZATION
+            return f"{model_name}@onnx-qint8-{ONNX_QUANTIZATION}"
+        return model_name
+    
+    @classmethod
+    def check_onnx_parity(cls, language: Literal['english', 'tamil'],
+                          texts: Optional[List[str]] = None) -> dict:
+        """
+        Compare the quantized ONNX model against the PyTorch model on sample texts
+        Returns cosine similarity stats ('mean_cosine', 'min_cosine', 'max_drift')
+        """
+        from .onnx_embedding_backend import cosine_drift, load_onnx_embeddings
+        
+        model_name = cls.MODELS[language]
+        texts = texts or _PARITY_SAMPLE_TEXTS[language]
+        encode_kwargs = {"normalize_embeddings": True}
+        
+        reference, _ = cls._load_model(model_name, "torch")
+        quantized = load_onnx_embeddings(model_name, encode_kwargs)
+        
+        report = cosine_drift(reference.embed_documents(texts), quantized.embed_documents(texts))
+        report.update({'language': language, 'model_name': model_name})
+        logger.info(f"ONNX parity for {model_name}: mean cosine {report['mean_cosine']:.4f}, "
+                    f"max drift {report['max_drift']:.4f} over {report['texts']} texts")
+        return report
+    
+    def get_embeddings(self, language: Literal['english', 'tamil']) -> Embeddings:
         """Instance method that calls the class method for backward compatibility"""
         return self.__class__.get_embeddings_static(language)
     
+    @classmethod
+    def embed_documents_cached(cls, language: Literal['english', 'tamil'], texts: List[str],
+                               stats: Optional[dict] = None) -> List[List[float]]:
+        """
+        Embed chunks, encoding only the ones missing from the persistent embedding cache
+        Hit/miss counts are accumulated into `stats` ('cache_hits' / 'cache_misses') when given
+        """
+        embedding_cache = get_embedding_cache()
+        if embedding_cache is None:
+            if stats is not None:
+                stats['cache_misses'] = stats.get('cache_misses', 0) + len(texts)
+            return cls.encode_batched(language, texts, stats=stats)
+        
+        model_name = cls.get_cache_model_name(language)
+        text_hashes = [embedding_cache.text_hash(text) for text in texts]
+        try:
+            cached = embedding_cache.get_many(model_name, text_hashes)
+        except Exception as e:
+            logger.warning(f"Embedding cache lookup failed: {e}")
+            cached = {}
+        
+        # Encode each unseen chunk once, even if it repeats within the batch
+        missing = {}
+        for text_hash, text in zip(text_hashes, texts):
+            if text_hash not in cached and text_hash not in missing:
+                missing[text_hash] = text
+        
+        if missing:
+            new_vectors = cls.encode_batched(language, list(missing.values()), stats=stats)
+            encoded = dict(zip(missing.keys(), new_vectors))
+            try:
+                embedding_cache.put_many(model_name, encoded.items())
+            except Exception as e:
+                logger.warning(f"Embedding cache write failed: {e}")
+            cached.update(encoded)
+        
+        if stats is not None:
+            misses = len(missing)
+            stats['cache_hits'] = stats.get('cache_hits', 0) + len(texts) - misses
+            stats['cache_misses'] = stats.get('cache_misses', 0) + misses
+        
+        logger.debug(f"Embedded {len(texts)} {language} chunks ({len(texts) - len(missing)} from cache)")
+        return [cached[text_hash] for text_hash in text_hashes]
+    
+    @classmethod
+    def encode_batched(cls, language: Literal['english', 'tamil'], texts: List[str],
+                       batch_size: Optional[int] = None, stats: Optional[dict] = None,
+                       local: bool = False) -> List[List[float]]:
+        """
+        Encode texts in token-length buckets to minimise padding, returning vectors in input order
+        
+        Texts are sorted by token length and cut into batches of `batch_size`, so each
+        forward pass only pads up to its own longest chunk. Encoding time and chunk counts
+        are accumulated into `stats` ('encode_seconds' / 'encoded_chunks') when given.
+        local=True always encodes in this process, bypassing the embedding server.
+        """
+        if not texts:
+            return []
+        
+        batch_size = batch_size or EMBEDDING_BATCH_SIZE
+        embeddings = cls.get_local_embeddings(language) if local else cls.get_embeddings_static(language)
+        client = getattr(embeddings, "_client", None)
+        started = time.perf_counter()
+        
+        if client is None:
+            # Embedding server client (buckets on its side) or not a sentence-transformers model
+            vectors = embeddings.embed_documents(texts)
+        else:
+            lengths = cls._token_lengths(client, texts)
+            order = sorted(range(len(texts)), key=lambda i: lengths[i])
+            encode_kwargs = {**embeddings.encode_kwargs, "batch_size": batch_size, "show_progress_bar": False}
+            
+            vectors = [None] * len(texts)
+            for bucket_start in range(0, len(order), batch_size):
+                bucket = order[bucket_start:bucket_start + batch_size]
+                bucket_vectors = client.encode([texts[i] for i in bucket], **encode_kwargs)
+                for i, vector in zip(bucket, bucket_vectors):
+                    vectors[i] = vector.tolist()
+        
+        elapsed = time.perf_counter() - started
+        if stats is not None:
+            stats['encode_seconds'] = stats.get('encode_seconds', 0.0) + elapsed
+            stats['encoded_chunks'] = stats.get('encoded_chunks', 0) + len(texts)
+        
+        logger.info(f"Encoded {len(texts)} {language} chunks in {elapsed:.2f}s "
+                    f"({len(texts) / elapsed if elapsed > 0 else 0:.1f} chunks/s, batch size {batch_size})")
+        return vectors
+    
+    @staticmethod
+    def _token_lengths(client, texts: List[str]) -> List[int]:
+        """Token count per text (falls back to character length without a tokenizer)"""
+        tokenizer = getattr(client, "tokenizer", None)
+        if tokenizer is None:
+            return [len(text) for text in texts]
+        try:
+            encoded = tokenizer(texts, add_special_tokens=True, truncation=True,
+                                max_length=getattr(client, "max_seq_length", None))
+            return [len(ids) for ids in encoded["input_ids"]]
+        except Exception as e:
+            logger.debug(f"Tokenizer length lookup failed, using character length: {e}")
+            return [len(text) for text in texts]
+    
     @classmethod
     def get_model_info(cls, language: Literal['english', 'tamil']) -> dict:
         """
@@ -107,6 +297,7 @@ class DualEmbeddingManager:
         return {
             'language': language,
             'model_name': cls.MODELS.get(language),
+            'backend': "server" if language in _EMBEDDING_SERVER_CLIENTS else _GLOBAL_EMBEDDING_BACKENDS.get(language, EMBEDDING_BACKEND),
             'is_cached': language in _GLOBAL_EMBEDDING_CACHE,
             'global_cache_size': len(_GLOBAL_EMBEDDING_CACHE)
         }
@@ -119,6 +310,8 @@ class DualEmbeddingManager:
         global _GLOBAL_EMBEDDING_CACHE
         cache_size = len(_GLOBAL_EMBEDDING_CACHE)
         _GLOBAL_EMBEDDING_CACHE.clear()
+        _GLOBAL_EMBEDDING_BACKENDS.clear()
+        _EMBEDDING_SERVER_CLIENTS.clear()
         logger.info(f"Cleared global embedding model cache ({cache_size} models removed)")
     
     @classmethod
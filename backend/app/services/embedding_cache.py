@@ -0,0 +1,123 @@
+"""
+Persistent chunk embedding cache backed by SQLite
+"""
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(__file__), '../../vector_stores/embedding_cache.sqlite3')
+
+# SQLite limits the number of bound parameters per statement
+_LOOKUP_BATCH_SIZE = 500
+
+
+class EmbeddingCache:
+    """
+    On-disk cache of chunk embeddings keyed by (model_name, sha256(chunk_text))
+    Vectors are stored as float32 blobs; the database is shared by all processes on a node
+    """
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or os.getenv("EMBEDDING_CACHE_PATH", DEFAULT_CACHE_PATH)
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        self._local = threading.local()
+        self._create_schema()
+        logger.info(f"Initialized embedding cache at {self.db_path}")
+
+    def _connect(self) -> sqlite3.Connection:
+        """Get this thread's connection (sqlite3 connections must not be shared between threads)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")  # concurrent readers while a worker writes
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _create_schema(self):
+        conn = self._connect()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS chunk_embeddings (
+                model_name TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                dim INTEGER NOT NULL,
+                vector BLOB NOT NULL,
+                PRIMARY KEY (model_name, text_hash)
+            ) WITHOUT ROWID
+        """)
+        conn.commit()
+
+    @staticmethod
+    def text_hash(text: str) -> str:
+        """Cache key for a chunk"""
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get_many(self, model_name: str, text_hashes: Iterable[str]) -> Dict[str, List[float]]:
+        """Look up cached vectors, returns {text_hash: vector} for the hashes that were found"""
+        text_hashes = list(dict.fromkeys(text_hashes))
+        found = {}
+        conn = self._connect()
+
+        for start in range(0, len(text_hashes), _LOOKUP_BATCH_SIZE):
+            batch = text_hashes[start:start + _LOOKUP_BATCH_SIZE]
+            placeholders = ",".join("?" * len(batch))
+            rows = conn.execute(
+                f"SELECT text_hash, vector FROM chunk_embeddings WHERE model_name = ? AND text_hash IN ({placeholders})",
+                [model_name, *batch]
+            ).fetchall()
+            for text_hash, blob in rows:
+                found[text_hash] = np.frombuffer(blob, dtype=np.float32).tolist()
+
+        return found
+
+    def put_many(self, model_name: str, items: Iterable[Tuple[str, List[float]]]) -> int:
+        """Store (text_hash, vector) pairs, returns the number of rows written"""
+        rows = []
+        for text_hash, vector in items:
+            array = np.asarray(vector, dtype=np.float32)
+            rows.append((model_name, text_hash, int(array.shape[0]), array.tobytes()))
+
+        if rows:
+            conn = self._connect()
+            conn.executemany(
+                "INSERT OR IGNORE INTO chunk_embeddings (model_name, text_hash, dim, vector) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            conn.commit()
+        return len(rows)
+
+    def get_stats(self) -> dict:
+        """Number of cached vectors per model"""
+        rows = self._connect().execute(
+            "SELECT model_name, COUNT(*) FROM chunk_embeddings GROUP BY model_name"
+        ).fetchall()
+        return {model_name: count for model_name, count in rows}
+
+
+_embedding_cache = None
+_embedding_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """Process-wide cache instance, or None when disabled via EMBEDDING_CACHE_ENABLED=false"""
+    global _embedding_cache
+    if os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() not in ("1", "true", "yes"):
+        return None
+
+    if _embedding_cache is None:
+        with _embedding_cache_lock:
+            if _embedding_cache is None:
+                try:
+                    _embedding_cache = EmbeddingCache()
+                except Exception as e:
+                    logger.warning(f"Embedding cache not available: {e}")
+                    return None
+    return _embedding_cache
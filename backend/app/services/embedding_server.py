@@ -0,0 +1,227 @@
+"""
+Local embedding server: one process per node holds the embedding models and serves
+batched encode requests to API and Celery processes over a Unix socket
+
+Run with: python -m backend.app.services.embedding_server
+Clients use it when EMBEDDING_SERVER_SOCKET is set (see DualEmbeddingManager.get_embeddings_static)
+
+Wire format (both directions): 4-byte big-endian header length, JSON header, then
+`payload_bytes` of raw payload. Responses to "embed" carry float32 vectors row by row.
+"""
+
+import json
+import logging
+import os
+import socket
+import socketserver
+import struct
+import threading
+from typing import List, Optional, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOCKET_PATH = "/tmp/ai_document_assistant_embeddings.sock"
+
+# Seconds a client waits for a response (large batches on a busy server take a while)
+EMBEDDING_SERVER_TIMEOUT = float(os.getenv("EMBEDDING_SERVER_TIMEOUT", "300"))
+
+_HEADER_LENGTH = struct.Struct(">I")
+
+
+def _recv_exactly(sock: socket.socket, size: int) -> bytes:
+    buffer = bytearray()
+    while len(buffer) < size:
+        chunk = sock.recv(min(size - len(buffer), 1 << 20))
+        if not chunk:
+            raise ConnectionError("Embedding server connection closed")
+        buffer.extend(chunk)
+    return bytes(buffer)
+
+
+def send_message(sock: socket.socket, header: dict, payload: bytes = b"") -> None:
+    """Send one framed message"""
+    header = dict(header, payload_bytes=len(payload))
+    encoded = json.dumps(header).encode("utf-8")
+    sock.sendall(_HEADER_LENGTH.pack(len(encoded)) + encoded + payload)
+
+
+def recv_message(sock: socket.socket) -> Tuple[dict, bytes]:
+    """Receive one framed message, returns (header, payload)"""
+    (header_length,) = _HEADER_LENGTH.unpack(_recv_exactly(sock, _HEADER_LENGTH.size))
+    header = json.loads(_recv_exactly(sock, header_length).decode("utf-8"))
+    payload = _recv_exactly(sock, header.get("payload_bytes", 0)) if header.get("payload_bytes") else b""
+    return header, payload
+
+
+class _EmbeddingRequestHandler(socketserver.BaseRequestHandler):
+    """Serves requests on one client connection until the client disconnects"""
+
+    def handle(self):
+        while True:
+            try:
+                header, _ = recv_message(self.request)
+            except ConnectionError:
+                return
+
+            try:
+                response, payload = self.server.dispatch(header)
+            except Exception as e:
+                logger.exception(f"Embedding request failed: {e}")
+                response, payload = {"error": str(e)}, b""
+            send_message(self.request, response, payload)
+
+
+class EmbeddingServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Unix socket server encoding with the models loaded in this process"""
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str):
+        from .dual_embedding_manager import DualEmbeddingManager
+
+        self.manager = DualEmbeddingManager
+        # One forward pass per model at a time; torch already uses every core for a batch
+        self._model_locks = {language: threading.Lock() for language in DualEmbeddingManager.MODELS}
+
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        super().__init__(socket_path, _EmbeddingRequestHandler)
+        os.chmod(socket_path, 0o660)
+
+    def dispatch(self, header: dict) -> Tuple[dict, bytes]:
+        op = header.get("op")
+        if op == "ping":
+            return {"ok": True, "languages": list(self._model_locks)}, b""
+
+        language = header.get("language")
+        if language not in self._model_locks:
+            raise ValueError(f"Unsupported language: {language}")
+
+        if op == "info":
+            return {"cache_model_name": self.manager.get_cache_model_name(language, local=True)}, b""
+
+        if op == "embed":
+            texts = header.get("texts") or []
+            with self._model_locks[language]:
+                if header.get("query"):
+                    vectors = [self.manager.get_local_embeddings(language).embed_query(texts[0])] if texts else []
+                else:
+                    vectors = self.manager.encode_batched(language, texts, batch_size=header.get("batch_size"),
+                                                          local=True)
+            array = np.asarray(vectors, dtype=np.float32)
+            dim = int(array.shape[1]) if array.ndim == 2 else 0
+            return {"count": len(vectors), "dim": dim}, array.tobytes()
+
+        raise ValueError(f"Unknown operation: {op}")
+
+
+def run_server(socket_path: Optional[str] = None, preload: bool = True) -> None:
+    """Load the models and serve until interrupted"""
+    from .dual_embedding_manager import DualEmbeddingManager
+
+    socket_path = socket_path or os.getenv("EMBEDDING_SERVER_SOCKET", DEFAULT_SOCKET_PATH)
+    if preload:
+        for language in DualEmbeddingManager.MODELS:
+            DualEmbeddingManager.get_local_embeddings(language)
+
+    server = EmbeddingServer(socket_path)
+    logger.info(f"Embedding server listening on {socket_path}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+class EmbeddingServerClient(Embeddings):
+    """LangChain Embeddings that encode through the local embedding server"""
+
+    def __init__(self, language: str, socket_path: str, timeout: float = None):
+        self.language = language
+        self.socket_path = socket_path
+        self.timeout = timeout or EMBEDDING_SERVER_TIMEOUT
+        self._local = threading.local()
+        self._cache_model_name = None
+
+    def __getstate__(self):
+        # Sockets are per thread and per process - never pickle them
+        state = self.__dict__.copy()
+        state.pop("_local", None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._local = threading.local()
+
+    def _connection(self) -> socket.socket:
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            self._local.sock = sock
+        return sock
+
+    def _close(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            try:
+                sock.close()
+            finally:
+                self._local.sock = None
+
+    def _request(self, header: dict) -> Tuple[dict, bytes]:
+        # Retry once on a fresh connection (server restarted, idle connection dropped)
+        for attempt in range(2):
+            try:
+                sock = self._connection()
+                send_message(sock, header)
+                response, payload = recv_message(sock)
+                break
+            except (ConnectionError, OSError):
+                self._close()
+                if attempt:
+                    raise
+        if "error" in response:
+            raise RuntimeError(f"Embedding server error: {response['error']}")
+        return response, payload
+
+    def _embed(self, texts: List[str], query: bool = False) -> List[List[float]]:
+        if not texts:
+            return []
+        response, payload = self._request({
+            "op": "embed", "language": self.language, "texts": list(texts), "query": query
+        })
+        vectors = np.frombuffer(payload, dtype=np.float32).reshape(response["count"], response["dim"])
+        return vectors.tolist()
+
+    def ping(self) -> bool:
+        """Whether the server is reachable"""
+        try:
+            self._request({"op": "ping"})
+            return True
+        except Exception:
+            return False
+
+    @property
+    def cache_model_name(self) -> str:
+        """Embedding cache key of the model the server runs (includes its backend)"""
+        if self._cache_model_name is None:
+            response, _ = self._request({"op": "info", "language": self.language})
+            self._cache_model_name = response["cache_model_name"]
+        return self._cache_model_name
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text], query=True)[0]
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(name)s | %(message)s")
+    run_server()
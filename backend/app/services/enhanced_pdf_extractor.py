@@ -1,13 +1,59 @@
 import fitz  # PyMuPDF
 import logging
-from typing import Optional
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
+# Parallel extraction settings (overridable per extractor instance)
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+PDF_PARALLEL_PAGE_THRESHOLD = int(os.getenv("PDF_PARALLEL_PAGE_THRESHOLD", "200"))
+PDF_PAGES_PER_RANGE = int(os.getenv("PDF_PAGES_PER_RANGE", "50"))
+
+
+def _build_page_info(page_text: str, filename: str, page_num: int, page_count: int) -> Optional[dict]:
+    """Build the page dict used for source tracking, or None for pages without content"""
+    if not page_text or not page_text.strip():
+        return None
+    return {
+        'text': page_text.strip(),
+        'metadata': {
+            'source': filename,
+            'page': page_num + 1,  # 1-indexed page numbers
+            'total_pages': page_count
+        }
+    }
+
+
+def _extract_page_range(pdf_path: str, filename: str, start: int, end: int, page_count: int) -> List[dict]:
+    """
+    Process pool worker: extract pages [start, end) with its own fitz handle
+    (fitz documents cannot be shared between processes)
+    """
+    doc = fitz.open(pdf_path)
+    try:
+        page_texts = []
+        for page_num in range(start, end):
+            page_info = _build_page_info(doc.load_page(page_num).get_text(), filename, page_num, page_count)
+            if page_info:
+                page_texts.append(page_info)
+        return page_texts
+    finally:
+        doc.close()
+
+
 class EnhancedPDFExtractor:
     """Enhanced PDF text extractor using PyMuPDF for better Tamil support"""
     
-    def __init__(self):
+    def __init__(self, parallel_workers: Optional[int] = None, parallel_page_threshold: Optional[int] = None):
+        # Documents with at least `parallel_page_threshold` pages are split into page
+        # ranges and extracted across a process pool of `parallel_workers` processes
+        self.parallel_workers = parallel_workers if parallel_workers is not None else PDF_EXTRACT_WORKERS
+        self.parallel_page_threshold = (
+            parallel_page_threshold if parallel_page_threshold is not None else PDF_PARALLEL_PAGE_THRESHOLD
+        )
         logger.info("Initialized Enhanced PDF Extractor with PyMuPDF")
     
     def extract_text(self, pdf_path: str) -> str:
@@ -19,9 +65,28 @@ class EnhancedPDFExtractor:
             
             # Open PDF with PyMuPDF
             doc = fitz.open(pdf_path)
-            text = ""
-            page_count = len(doc)  # Get page count before processing
+            return self._extract_document_text(doc)
             
+        except Exception as e:
+            logger.error(f"Error extracting text from PDF {pdf_path}: {e}")
+            raise e
+    
+    def extract_text_from_bytes(self, data: bytes) -> str:
+        """
+        Extract text from an in-memory PDF (no temporary file)
+        """
+        try:
+            doc = fitz.open(stream=data, filetype="pdf")
+            return self._extract_document_text(doc)
+        except Exception as e:
+            logger.error(f"Error extracting text from in-memory PDF: {e}")
+            raise e
+    
+    def _extract_document_text(self, doc) -> str:
+        text = ""
+        page_count = len(doc)  # Get page count before processing
+        
+        try:
             # Extract text from each page
             for page_num in range(page_count):
                 page = doc.load_page(page_num)
@@ -30,47 +95,22 @@ class EnhancedPDFExtractor:
                 if page_text:
                     text += page_text + "\n"
                     logger.debug(f"Extracted {len(page_text)} characters from page {page_num + 1}")
-            
+        finally:
             doc.close()
-            
-            logger.info(f"Successfully extracted {len(text)} characters from {page_count} pages")
-            return text.strip()
-            
-        except Exception as e:
-            logger.error(f"Error extracting text from PDF {pdf_path}: {e}")
-            raise e
+        
+        logger.info(f"Successfully extracted {len(text)} characters from {page_count} pages")
+        return text.strip()
 
     def extract_text_with_page_info(self, pdf_path: str, filename: str) -> list:
         """
         Extract text page by page with metadata for source tracking
         Returns a list of dicts with page text and metadata
+        Large documents are extracted in parallel (see parallel_page_threshold)
         """
         try:
             logger.info(f"Extracting text with page info from PDF: {pdf_path}")
             
-            # Open PDF with PyMuPDF
-            doc = fitz.open(pdf_path)
-            page_texts = []
-            page_count = len(doc)
-            
-            # Extract text from each page with metadata
-            for page_num in range(page_count):
-                page = doc.load_page(page_num)
-                page_text = page.get_text()
-                
-                if page_text and page_text.strip():  # Only include pages with actual content
-                    page_info = {
-                        'text': page_text.strip(),
-                        'metadata': {
-                            'source': filename,
-                            'page': page_num + 1,  # 1-indexed page numbers
-                            'total_pages': page_count
-                        }
-                    }
-                    page_texts.append(page_info)
-                    logger.debug(f"Extracted {len(page_text)} characters from page {page_num + 1}")
-            
-            doc.close()
+            page_texts = list(self.iter_pages(pdf_path, filename))
             
             total_chars = sum(len(page['text']) for page in page_texts)
             logger.info(f"Successfully extracted {total_chars} characters from {len(page_texts)} pages with content")
@@ -80,6 +120,69 @@ class EnhancedPDFExtractor:
             logger.error(f"Error extracting text with page info from PDF {pdf_path}: {e}")
             raise e
     
+    def iter_pages(self, pdf_path: str, filename: str) -> Iterator[dict]:
+        """
+        Yield page dicts ({'text', 'metadata'}) in page order, skipping empty pages
+        Switches to parallel extraction when the page count reaches the threshold
+        """
+        doc = fitz.open(pdf_path)
+        page_count = len(doc)
+        
+        if self.parallel_workers > 1 and page_count >= self.parallel_page_threshold:
+            doc.close()
+            yield from self._iter_pages_parallel(pdf_path, filename, page_count)
+            return
+        
+        try:
+            for page_num in range(page_count):
+                page_info = _build_page_info(doc.load_page(page_num).get_text(), filename, page_num, page_count)
+                if page_info:  # Only include pages with actual content
+                    logger.debug(f"Extracted {len(page_info['text'])} characters from page {page_num + 1}")
+                    yield page_info
+        finally:
+            doc.close()
+    
+    def _split_page_ranges(self, page_count: int) -> List[Tuple[int, int]]:
+        """Split [0, page_count) into contiguous ranges, several per worker for load balancing"""
+        range_size = max(1, min(PDF_PAGES_PER_RANGE, -(-page_count // self.parallel_workers)))
+        return [(start, min(start + range_size, page_count)) for start in range(0, page_count, range_size)]
+    
+    def _iter_pages_parallel(self, pdf_path: str, filename: str, page_count: int) -> Iterator[dict]:
+        """
+        Extract page ranges across a process pool and yield pages in page order
+        Only a bounded window of ranges is in flight so results never pile up in memory
+        """
+        page_ranges = self._split_page_ranges(page_count)
+        max_in_flight = self.parallel_workers * 2
+        logger.info(f"Extracting {page_count} pages in parallel: {len(page_ranges)} ranges across {self.parallel_workers} workers")
+        
+        executor = ProcessPoolExecutor(max_workers=self.parallel_workers)
+        pending = deque()
+        try:
+            for start, end in page_ranges[:max_in_flight]:
+                pending.append(executor.submit(_extract_page_range, pdf_path, filename, start, end, page_count))
+        except Exception as e:
+            # e.g. daemonic Celery prefork children are not allowed to spawn processes
+            logger.warning(f"Parallel extraction unavailable ({e}), falling back to sequential extraction")
+            executor.shutdown(wait=False, cancel_futures=True)
+            yield from EnhancedPDFExtractor(parallel_workers=1).iter_pages(pdf_path, filename)
+            return
+        
+        try:
+            next_range = len(pending)
+            while pending:
+                # Futures are consumed in submission order, which keeps pages ordered
+                for page_info in pending.popleft().result():
+                    yield page_info
+                if next_range < len(page_ranges):
+                    start, end = page_ranges[next_range]
+                    pending.append(executor.submit(_extract_page_range, pdf_path, filename, start, end, page_count))
+                    next_range += 1
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+    
     def normalize_tamil_text(self, text: str) -> str:
         """
         Basic Tamil text normalization
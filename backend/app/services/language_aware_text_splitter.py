@@ -1,5 +1,5 @@
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from typing import List, Literal
+from typing import Iterable, Iterator, List, Literal
 import logging
 
 logger = logging.getLogger(__name__)
@@ -86,47 +86,28 @@ class LanguageAwareTextSplitter:
             previews.append(f"Chunk {i+1}: {preview}")
         return previews
     
+    def _get_separators(self, language: Literal['english', 'tamil']) -> List[str]:
+        """Get the separator list for a language"""
+        return self.tamil_separators if language == 'tamil' else self.english_separators
+    
+    def _create_splitter(self, language: Literal['english', 'tamil']) -> RecursiveCharacterTextSplitter:
+        """Create the chunking splitter used for page-level splitting"""
+        return RecursiveCharacterTextSplitter(
+            separators=self._get_separators(language),
+            chunk_size=1000,
+            chunk_overlap=200,
+            length_function=len,
+            keep_separator=False
+        )
+    
     def split_text_with_metadata(self, page_texts: List[dict], language: Literal['english', 'tamil']) -> List[dict]:
         """
         Split text from pages into chunks while preserving metadata
         page_texts: List of dicts with 'text' and 'metadata' keys
         Returns: List of dicts with 'text' and 'metadata' keys for each chunk
         """
-        if language == 'tamil':
-            separators = self.tamil_separators
-            logger.info("Using Tamil text splitting patterns with metadata")
-        else:
-            separators = self.english_separators
-            logger.info("Using English text splitting patterns with metadata")
-        
         try:
-            splitter = RecursiveCharacterTextSplitter(
-                separators=separators,
-                chunk_size=1000,
-                chunk_overlap=200,
-                length_function=len,
-                keep_separator=False
-            )
-            
-            all_chunks_with_metadata = []
-            
-            for page_info in page_texts:
-                page_text = page_info['text']
-                page_metadata = page_info['metadata']
-                
-                # Split the page text into chunks
-                page_chunks = splitter.split_text(page_text)
-                
-                # Add metadata to each chunk from this page
-                for chunk_idx, chunk in enumerate(page_chunks):
-                    chunk_metadata = page_metadata.copy()
-                    chunk_metadata['chunk_index'] = chunk_idx + 1
-                    chunk_metadata['chunks_on_page'] = len(page_chunks)
-                    
-                    all_chunks_with_metadata.append({
-                        'text': chunk,
-                        'metadata': chunk_metadata
-                    })
+            all_chunks_with_metadata = list(self.iter_split_with_metadata(page_texts, language))
             
             logger.info(f"Split {language} text from {len(page_texts)} pages into {len(all_chunks_with_metadata)} chunks with metadata")
             
@@ -145,6 +126,33 @@ class LanguageAwareTextSplitter:
             logger.error(f"Error splitting {language} text with metadata: {e}")
             raise e
     
+    def iter_split_with_metadata(self, pages: Iterable[dict], language: Literal['english', 'tamil']) -> Iterator[dict]:
+        """
+        Lazily split pages into chunks while preserving metadata
+        pages: any iterable of dicts with 'text' and 'metadata' keys (e.g. a page generator)
+        Yields one {'text', 'metadata'} dict per chunk, one page at a time
+        """
+        logger.info(f"Using {language.title()} text splitting patterns with metadata")
+        splitter = self._create_splitter(language)
+        
+        for page_info in pages:
+            page_text = page_info['text']
+            page_metadata = page_info['metadata']
+            
+            # Split the page text into chunks
+            page_chunks = splitter.split_text(page_text)
+            
+            # Add metadata to each chunk from this page
+            for chunk_idx, chunk in enumerate(page_chunks):
+                chunk_metadata = page_metadata.copy()
+                chunk_metadata['chunk_index'] = chunk_idx + 1
+                chunk_metadata['chunks_on_page'] = len(page_chunks)
+                
+                yield {
+                    'text': chunk,
+                    'metadata': chunk_metadata
+                }
+    
     def validate_chunks(self, chunks: List[str], language: Literal['english', 'tamil']) -> dict:
         """
         Validate chunk quality and provide statistics
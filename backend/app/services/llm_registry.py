@@ -0,0 +1,125 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import httpx
+from langchain.chains import RetrievalQA
+from langchain_groq import ChatGroq
+from loguru import logger
+
+LLM_MODEL = os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile")
+LLM_TEMPERATURE = float(os.getenv("GROQ_TEMPERATURE", "0.1"))
+
+# Keep-alive pool shared by every ChatGroq client in the process
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "50"))
+LLM_MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "20"))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "60"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+
+# Most RetrievalQA chains kept per process (one per user index generation)
+QA_CHAIN_CACHE_SIZE = int(os.getenv("QA_CHAIN_CACHE_SIZE", "256"))
+RETRIEVER_K = 4
+
+
+class LLMRegistry:
+    """
+    Per-process ChatGroq clients on pooled keep-alive HTTP connections, and RetrievalQA
+    chains cached per (user_id, vector store generation)
+
+    A chain is only reused while it still wraps the vector store object it was built
+    for; clear_user_chains drops a user's chains when their index changes.
+    """
+
+    _lock = threading.Lock()
+    _http_client: Optional[httpx.Client] = None
+    _http_async_client: Optional[httpx.AsyncClient] = None
+    _llms = {}
+    _chains: "OrderedDict[Tuple[int, int], RetrievalQA]" = OrderedDict()
+
+    @staticmethod
+    def _limits() -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_MAX_KEEPALIVE,
+            keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+        )
+
+    @staticmethod
+    def get_llm(model_name: str = LLM_MODEL, temperature: float = LLM_TEMPERATURE) -> ChatGroq:
+        """Shared ChatGroq client for a model/temperature"""
+        key = (model_name, temperature)
+        llm = LLMRegistry._llms.get(key)
+        if llm is not None:
+            return llm
+
+        with LLMRegistry._lock:
+            if key not in LLMRegistry._llms:
+                if LLMRegistry._http_client is None:
+                    LLMRegistry._http_client = httpx.Client(limits=LLMRegistry._limits(), timeout=LLM_TIMEOUT)
+                    LLMRegistry._http_async_client = httpx.AsyncClient(limits=LLMRegistry._limits(), timeout=LLM_TIMEOUT)
+                LLMRegistry._llms[key] = ChatGroq(
+                    model_name=model_name,
+                    temperature=temperature,
+                    http_client=LLMRegistry._http_client,
+                    http_async_client=LLMRegistry._http_async_client,
+                )
+                logger.info(f"🔌 Created pooled LLM client for {model_name}")
+            return LLMRegistry._llms[key]
+
+    @staticmethod
+    def get_qa_chain(vectorstore, user_id: Optional[int] = None, generation: Optional[int] = None) -> RetrievalQA:
+        """RetrievalQA chain over the vector store, reused while the user's index generation is unchanged"""
+        key = (user_id, generation)
+        cacheable = user_id is not None and generation is not None
+
+        if cacheable:
+            with LLMRegistry._lock:
+                chain = LLMRegistry._chains.get(key)
+                if chain is not None and chain.retriever.vectorstore is vectorstore:
+                    LLMRegistry._chains.move_to_end(key)
+                    return chain
+
+        chain = RetrievalQA.from_chain_type(
+            llm=LLMRegistry.get_llm(),
+            retriever=vectorstore.as_retriever(search_kwargs={"k": RETRIEVER_K}),
+            return_source_documents=True  # Enable source documents return
+        )
+
+        if cacheable:
+            with LLMRegistry._lock:
+                LLMRegistry._chains[key] = chain
+                LLMRegistry._chains.move_to_end(key)
+                while len(LLMRegistry._chains) > QA_CHAIN_CACHE_SIZE:
+                    LLMRegistry._chains.popitem(last=False)
+        return chain
+
+    @staticmethod
+    def clear_user_chains(user_id: int) -> int:
+        """Drop cached chains for a user (their index changed or was cleared)"""
+        with LLMRegistry._lock:
+            keys = [key for key in LLMRegistry._chains if key[0] == user_id]
+            for key in keys:
+                del LLMRegistry._chains[key]
+        return len(keys)
+
+    @staticmethod
+    def get_stats() -> dict:
+        return {
+            'llm_clients': len(LLMRegistry._llms),
+            'cached_chains': len(LLMRegistry._chains),
+            'chain_cache_size': QA_CHAIN_CACHE_SIZE,
+        }
+
+    @staticmethod
+    async def aclose():
+        """Close the pooled HTTP connections (application shutdown)"""
+        with LLMRegistry._lock:
+            http_client, http_async_client = LLMRegistry._http_client, LLMRegistry._http_async_client
+            LLMRegistry._http_client = LLMRegistry._http_async_client = None
+            LLMRegistry._llms.clear()
+            LLMRegistry._chains.clear()
+        if http_client is not None:
+            http_client.close()
+        if http_async_client is not None:
+            await http_async_client.aclose()
@@ -0,0 +1,88 @@
+"""
+Quantized ONNX (int8) CPU backend for the sentence-transformers embedding models
+"""
+
+import logging
+import os
+import shutil
+from typing import List
+
+import numpy as np
+from langchain_huggingface import HuggingFaceEmbeddings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ONNX_CACHE_DIR = os.path.join(os.path.dirname(__file__), '../../model_cache/onnx')
+
+# Target instruction set for dynamic quantization: arm64, avx2, avx512 or avx512_vnni
+ONNX_QUANTIZATION = os.getenv("EMBEDDING_ONNX_QUANTIZATION", "avx2")
+
+
+def get_quantized_file_name(quantization: str = None) -> str:
+    """File name sentence-transformers gives the quantized model inside the export directory"""
+    return f"onnx/model_qint8_{quantization or ONNX_QUANTIZATION}.onnx"
+
+
+def get_onnx_model_dir(model_name: str, quantization: str = None) -> str:
+    """On-disk location of a model's quantized ONNX export"""
+    cache_dir = os.getenv("EMBEDDING_ONNX_CACHE_DIR", DEFAULT_ONNX_CACHE_DIR)
+    return os.path.join(cache_dir, f"{model_name.replace('/', '__')}-qint8-{quantization or ONNX_QUANTIZATION}")
+
+
+def export_quantized_model(model_name: str, quantization: str = None) -> str:
+    """
+    Export a model to ONNX with int8 dynamic quantization, once per node
+    Returns the export directory; an existing export is reused as is
+    """
+    quantization = quantization or ONNX_QUANTIZATION
+    model_dir = get_onnx_model_dir(model_name, quantization)
+    if os.path.exists(os.path.join(model_dir, get_quantized_file_name(quantization))):
+        return model_dir
+
+    # Optional dependencies: sentence-transformers>=3.2 with the onnx extra (optimum + onnxruntime)
+    from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+    logger.info(f"Exporting {model_name} to ONNX with int8 quantization ({quantization})...")
+    tmp_dir = f"{model_dir}.tmp-{os.getpid()}"
+    model = SentenceTransformer(model_name, device="cpu", backend="onnx")
+    model.save(tmp_dir)
+    export_dynamic_quantized_onnx_model(model, quantization, tmp_dir)
+
+    # Another worker may have finished the same export in the meantime
+    if os.path.exists(model_dir):
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    else:
+        os.replace(tmp_dir, model_dir)
+    logger.info(f"Cached quantized ONNX model at {model_dir}")
+    return model_dir
+
+
+def load_onnx_embeddings(model_name: str, encode_kwargs: dict) -> HuggingFaceEmbeddings:
+    """HuggingFaceEmbeddings running the quantized ONNX export of a model on CPU"""
+    model_dir = export_quantized_model(model_name)
+    return HuggingFaceEmbeddings(
+        model_name=model_dir,
+        model_kwargs={
+            "device": "cpu",
+            "backend": "onnx",
+            "model_kwargs": {"file_name": get_quantized_file_name()},
+        },
+        encode_kwargs=encode_kwargs
+    )
+
+
+def cosine_drift(reference: List[List[float]], candidate: List[List[float]]) -> dict:
+    """Per-text cosine similarity between two sets of vectors for the same texts"""
+    reference = np.asarray(reference, dtype=np.float32)
+    candidate = np.asarray(candidate, dtype=np.float32)
+    if reference.shape != candidate.shape:
+        raise ValueError(f"Vector shapes differ: {reference.shape} vs {candidate.shape}")
+
+    norms = np.linalg.norm(reference, axis=1) * np.linalg.norm(candidate, axis=1)
+    similarity = np.sum(reference * candidate, axis=1) / np.maximum(norms, 1e-12)
+    return {
+        'texts': int(reference.shape[0]),
+        'mean_cosine': float(similarity.mean()),
+        'min_cosine': float(similarity.min()),
+        'max_drift': float(1.0 - similarity.min()),
+    }
@@ -1,37 +1,91 @@
 import os
-from langchain.chains import RetrievalQA
+import time
+from langchain.chains.question_answering.stuff_prompt import PROMPT_SELECTOR
 from langchain_community.vectorstores import FAISS
-from langchain_groq import ChatGroq
 from langchain_huggingface import HuggingFaceEmbeddings
 from loguru import logger
 from ...redis_cache import cache
 from ...vector_store_db import get_user_vector_store_info
 from .dual_embedding_manager import DualEmbeddingManager
+from ..utils.executors import run_cpu_bound, submit_cpu_bound
+from .cache_invalidation import InvalidationBus
+from .llm_registry import LLMRegistry, RETRIEVER_K
+from .vector_store_lru import VectorStoreLRU
+
+
+def _on_vector_store_evicted(user_id, vectorstore, reason):
+    # Cached QA chains reference the store - drop them so its memory is actually freed
+    LLMRegistry.clear_user_chains(user_id)
+
+
+# In-process vector stores keyed by user id, bounded by VECTOR_STORE_CACHE_MAX_BYTES / _IDLE_TTL;
+# each entry also records its index generation (keys QA chains)
+_vector_store_cache = VectorStoreLRU(on_evict=_on_vector_store_evicted)
+
+# Memory-map FAISS indexes read-only so every worker on the node shares the OS page cache
+VECTOR_STORE_MMAP = os.getenv("VECTOR_STORE_MMAP", "true").lower() in ("1", "true", "yes")
+# Reload a user's store in the background when another process publishes a new generation
+VECTOR_STORE_PREFETCH = os.getenv("VECTOR_STORE_PREFETCH", "true").lower() in ("1", "true", "yes")
+# How long the small vector store metadata record (path, language, generation) lives in Redis
+VECTOR_STORE_META_TTL = int(os.getenv("VECTOR_STORE_META_TTL", "3600"))
+
+
+def _meta_key(user_id: int) -> str:
+    return f"vectorstore_meta:user:{user_id}"
+
+
+def load_faiss_index(vector_store_path: str, embeddings, mmap: bool = None) -> FAISS:
+    """
+    Load a saved LangChain FAISS store, memory-mapping the index when enabled
+    Memory-mapped indexes are read-only - load with mmap=False to add or delete vectors
+    """
+    mmap = VECTOR_STORE_MMAP if mmap is None else mmap
+    if not mmap:
+        return FAISS.load_local(vector_store_path, embeddings, index_name="index", allow_dangerous_deserialization=True)
+    
+    import faiss
+    import pickle
+    # IO_FLAG_MMAP_IFC maps flat (IndexFlat*) codes; older builds only support IO_FLAG_MMAP
+    mmap_flag = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+    index = faiss.read_index(os.path.join(vector_store_path, "index.faiss"), mmap_flag | faiss.IO_FLAG_READ_ONLY)
+    with open(os.path.join(vector_store_path, "index.pkl"), "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+    return FAISS(embeddings, index, docstore, index_to_docstore_id)
+
+
+def _get_store_info(user_id: int):
+    """Vector store metadata from Redis, falling back to Postgres (and caching it)"""
+    store_info = cache.get_json(_meta_key(user_id))
+    if store_info and os.path.exists(os.path.join(store_info['path'], "index.faiss")):
+        return store_info
+    
+    from ...database_connection import get_db_connection
+    with get_db_connection() as conn:
+        row = get_user_vector_store_info(conn, user_id)
+    if not row:
+        return None
+    
+    store_info = {
+        'path': row['path'],
+        'language': row['language'],
+        'embedding_model': row['embedding_model'],
+        'generation': row.get('generation'),
+    }
+    cache.set_json(_meta_key(user_id), store_info, expire=VECTOR_STORE_META_TTL)
+    return store_info
 
-_vector_store_cache = {}  # Keep in-memory cache as fallback
 
 def load_vectorstore_for_user(user_id: int):
     """Load vector store with appropriate embedding model based on language"""
     try:
         # Check in-memory cache first (fastest)
-        cache_key = f"vectorstore_user_{user_id}"
-        if cache_key in _vector_store_cache:
+        vectorstore = _vector_store_cache.get(user_id)
+        if vectorstore is not None:
             logger.info(f"Using in-memory cached vector store for user {user_id}")
-            return _vector_store_cache[cache_key]
-        
-        # Check Redis cache second (persistent across restarts)
-        redis_key = f"vectorstore:user:{user_id}"
-        cached_vectorstore = cache.get(redis_key)
-        if cached_vectorstore:
-            logger.info(f"Using Redis cached vector store for user {user_id}")
-            _vector_store_cache[cache_key] = cached_vectorstore  # Also cache in memory
-            return cached_vectorstore
-        
-        # Load from disk if not in cache
-        from ...database_connection import get_db_connection
-        with get_db_connection() as conn:
-            store_info = get_user_vector_store_info(conn, user_id)
+            return vectorstore
         
+        # Redis only holds small metadata; the index itself is mapped from disk
+        store_info = _get_store_info(user_id)
         if not store_info:
             logger.warning(f"No vector store found for user {user_id}")
             return None
@@ -55,52 +109,84 @@ def load_vectorstore_for_user(user_id: int):
         embeddings = DualEmbeddingManager.get_embeddings_static(language)  # Use class method
 
         # Load the vector store
-        vectorstore = FAISS.load_local(
-            vector_store_path, 
-            embeddings, 
-            index_name="index", 
-            allow_dangerous_deserialization=True
-        )
+        vectorstore = load_faiss_index(vector_store_path, embeddings)
         
-        # Cache in both Redis and memory
-        _vector_store_cache[cache_key] = vectorstore
-        cache.set(redis_key, vectorstore, expire=3600)  # Cache for 1 hour
+        _vector_store_cache.put(user_id, vectorstore, generation=store_info.get('generation'), language=language)
         
-        logger.info(f"Loaded and cached {language} vector store for user {user_id} with {vectorstore.index.ntotal} vectors")
+        logger.info(f"Loaded and cached {language} vector store for user {user_id} with {vectorstore.index.ntotal} vectors"
+                    f"{' (memory-mapped)' if VECTOR_STORE_MMAP else ''}")
         return vectorstore
         
     except Exception as e:
         logger.error(f"Error loading vector store for user {user_id}: {e}")
         # Clear the cache entries if loading fails
-        cache_key = f"vectorstore_user_{user_id}"
-        if cache_key in _vector_store_cache:
-            del _vector_store_cache[cache_key]
-        cache.delete(f"vectorstore:user:{user_id}")
+        _vector_store_cache.pop(user_id)
+        cache.delete(_meta_key(user_id))
         return None
 
 
-def clear_user_cache(user_id: int):
-    """Clear the vector store cache for a specific user"""
+def get_vectorstore_generation(user_id: int):
+    """Index generation of the user's cached vector store (None if unknown)"""
+    return _vector_store_cache.get_metadata(user_id).get('generation')
+
+
+def get_vectorstore_language(user_id: int) -> str:
+    """Document language of the user's cached vector store"""
+    return _vector_store_cache.get_metadata(user_id).get('language', 'english')
+
+
+def _evict_local(user_id: int) -> bool:
+    """Drop this process's copy of a user's vector store and QA chains"""
+    evicted = _vector_store_cache.pop(user_id) is not None
+    LLMRegistry.clear_user_chains(user_id)
+    return evicted
+
+
+def clear_user_cache(user_id: int, generation=None):
+    """
+    Clear the vector store cache for a specific user, in every process
+    generation: the user's new index generation, if the index was rebuilt (None = removed)
+    """
     # Clear in-memory cache
-    cache_key = f"vectorstore_user_{user_id}"
-    if cache_key in _vector_store_cache:
-        del _vector_store_cache[cache_key]
+    if _evict_local(user_id):
         logger.info(f"Cleared in-memory cache for user {user_id}")
     
-    # Clear Redis cache
-    redis_key = f"vectorstore:user:{user_id}"
-    cache.delete(redis_key)
+    # Clear Redis metadata (and any pickled store left by older versions)
+    cache.delete(_meta_key(user_id))
+    cache.delete(f"vectorstore:user:{user_id}")
+    # Exact-match PDF answers are not keyed by generation, so they were produced from the previous documents
+    cache.clear_pattern(f"chat_pdf:user:{user_id}:*")
     logger.info(f"Cleared Redis cache for user {user_id}")
+    
+    # Tell the other API processes
+    InvalidationBus.publish("vectorstore", user_id=user_id, generation=generation)
+
+
+def _on_vectorstore_invalidated(message: dict):
+    """Another process changed a user's index: evict our copy, optionally reloading it in the background"""
+    user_id = message['user_id']
+    generation = message.get('generation')
+    if user_id not in _vector_store_cache:
+        return
+    if generation is not None and get_vectorstore_generation(user_id) == generation:
+        return  # Already serving this generation
+    
+    _evict_local(user_id)
+    logger.info(f"📡 Evicted vector store for user {user_id} (new generation {generation})")
+    if VECTOR_STORE_PREFETCH and generation is not None:
+        submit_cpu_bound(load_vectorstore_for_user, user_id)
+
+
+InvalidationBus.subscribe("vectorstore", _on_vectorstore_invalidated)
 
 
 def clear_all_cache():
     """Clear all vector store cache - useful for maintenance"""
-    global _vector_store_cache
-    cache_size = len(_vector_store_cache)
-    _vector_store_cache = {}
+    cache_size = _vector_store_cache.clear()
     
     # Clear all vectorstore keys from Redis
-    cleared_count = cache.clear_pattern("vectorstore:user:*")
+    cleared_count = cache.clear_pattern("vectorstore_meta:user:*")
+    cleared_count += cache.clear_pattern("vectorstore:user:*")
     
     logger.info(f"Cleared all cache - {cache_size} in-memory entries and {cleared_count} Redis entries removed")
 
@@ -108,48 +194,49 @@ def clear_all_cache():
 def get_cache_info():
     """Get information about current cache state"""
     redis_info = cache.get_cache_info()
-    in_memory_users = [key.replace("vectorstore_user_", "") for key in _vector_store_cache.keys()]
+    lru_stats = _vector_store_cache.stats()
     
     return {
         "in_memory": {
-            "cached_users": in_memory_users,
-            "cache_size": len(_vector_store_cache)
+            "cached_users": [str(user_id) for user_id in _vector_store_cache.keys()],
+            "cache_size": lru_stats['entries'],
+            "memory_bytes": lru_stats['bytes'],
+            "memory_mb": round(lru_stats['bytes'] / 1024 ** 2, 2),
+            **lru_stats
         },
+        "llm": LLMRegistry.get_stats(),
         "redis": redis_info
     }
 
 
-def get_user_query_response(vectorstore, query):
+def _extract_sources(source_documents):
+    """Unique (document, page) citations from the retrieved chunks"""
+    sources = []
+    seen_sources = set()  # To avoid duplicate sources
+    for doc in source_documents or []:
+        if hasattr(doc, 'metadata') and doc.metadata:
+            source_info = {
+                'document': doc.metadata.get('source', 'Unknown Document'),
+                'page': doc.metadata.get('page', 'Unknown Page'),
+                'chunk_index': doc.metadata.get('chunk_index', 1)
+            }
+            # Create a unique identifier for the source
+            source_key = f"{source_info['document']}-{source_info['page']}"
+            if source_key not in seen_sources:
+                sources.append(source_info)
+                seen_sources.add(source_key)
+    return sources
+
+
+def get_user_query_response(vectorstore, query, user_id=None):
     try:
-        llm = ChatGroq(model_name="llama-3.3-70b-versatile", temperature=0.1)
-        qa_chain = RetrievalQA.from_chain_type(
-            llm=llm, 
-            retriever=vectorstore.as_retriever(search_kwargs={"k": 4}),
-            return_source_documents=True  # Enable source documents return
-        )
+        qa_chain = LLMRegistry.get_qa_chain(vectorstore, user_id, get_vectorstore_generation(user_id))
         result = qa_chain.invoke(query)
         
-        # Extract sources from the result
-        sources = []
-        if 'source_documents' in result and result['source_documents']:
-            seen_sources = set()  # To avoid duplicate sources
-            for doc in result['source_documents']:
-                if hasattr(doc, 'metadata') and doc.metadata:
-                    source_info = {
-                        'document': doc.metadata.get('source', 'Unknown Document'),
-                        'page': doc.metadata.get('page', 'Unknown Page'),
-                        'chunk_index': doc.metadata.get('chunk_index', 1)
-                    }
-                    # Create a unique identifier for the source
-                    source_key = f"{source_info['document']}-{source_info['page']}"
-                    if source_key not in seen_sources:
-                        sources.append(source_info)
-                        seen_sources.add(source_key)
-        
         # Return both the answer and sources
         return {
             'result': result.get('result', 'No answer found'),
-            'sources': sources
+            'sources': _extract_sources(result.get('source_documents'))
         }
         
     except Exception as e:
@@ -157,10 +244,88 @@ def get_user_query_response(vectorstore, query):
         raise e
 
 
+async def aget_user_query_response(vectorstore, query, user_id=None):
+    """
+    Async RAG query: retrieval on the bounded CPU executor, LLM call via ainvoke
+    'timings' holds the latency breakdown in ms (chain setup, retrieval, llm)
+    """
+    try:
+        started = time.perf_counter()
+        qa_chain = LLMRegistry.get_qa_chain(vectorstore, user_id, get_vectorstore_generation(user_id))
+        chain_ready = time.perf_counter()
+        
+        # Query embedding + FAISS search are CPU work - keep them off the event loop
+        source_documents = await run_cpu_bound(qa_chain.retriever.invoke, query)
+        retrieved = time.perf_counter()
+        answer = await qa_chain.combine_documents_chain.ainvoke(
+            {"input_documents": source_documents, "question": query}
+        )
+        finished = time.perf_counter()
+        
+        timings = {
+            'chain_setup_ms': round((chain_ready - started) * 1000, 2),
+            'retrieval_ms': round((retrieved - chain_ready) * 1000, 2),
+            'llm_ms': round((finished - retrieved) * 1000, 2),
+        }
+        logger.info(f"⏱️ RAG latency for user {user_id}: {timings}")
+        
+        return {
+            'result': answer.get('output_text') or 'No answer found',
+            'sources': _extract_sources(source_documents),
+            'timings': timings
+        }
+        
+    except Exception as e:
+        logger.error(f"Error in RAG query: {e}")
+        raise e
+
+
+async def astream_user_query_response(vectorstore, query):
+    """
+    Stream a RAG answer: yields ("token", text) as the LLM produces them, then ("sources", list)
+    Uses the same prompt and context formatting as the RetrievalQA "stuff" chain
+    """
+    try:
+        llm = LLMRegistry.get_llm()
+        retriever = vectorstore.as_retriever(search_kwargs={"k": RETRIEVER_K})
+        source_documents = await run_cpu_bound(retriever.invoke, query)
+        
+        context = "\n\n".join(doc.page_content for doc in source_documents)
+        messages = PROMPT_SELECTOR.get_prompt(llm).format_messages(context=context, question=query)
+        async for chunk in llm.astream(messages):
+            if chunk.content:
+                yield "token", chunk.content
+        
+        yield "sources", _extract_sources(source_documents)
+        
+    except Exception as e:
+        logger.error(f"Error in streaming RAG query: {e}")
+        raise e
+
+
 def get_general_llm_response(query):
     try:
-        llm = ChatGroq(model_name="llama-3.3-70b-versatile", temperature=0.1)
-        return llm.invoke(query).content
+        return LLMRegistry.get_llm().invoke(query).content
     except Exception as e:
         logger.error(f"Error in general LLM: {e}")
-        raise e
\ No newline at end of file
+        raise e
+
+
+async def aget_general_llm_response(query):
+    """Async general LLM response (non-blocking HTTP call to Groq)"""
+    try:
+        return (await LLMRegistry.get_llm().ainvoke(query)).content
+    except Exception as e:
+        logger.error(f"Error in general LLM: {e}")
+        raise e
+
+
+async def astream_general_llm_response(query):
+    """Stream a general LLM answer token by token"""
+    try:
+        async for chunk in LLMRegistry.get_llm().astream(query):
+            if chunk.content:
+                yield chunk.content
+    except Exception as e:
+        logger.error(f"Error in streaming general LLM: {e}")
+        raise e
@@ -1,5 +1,8 @@
 import os
 import hashlib
+import queue
+import threading
+from itertools import chain
 from PyPDF2 import PdfReader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import FAISS
@@ -16,6 +19,11 @@ from .language_aware_text_splitter import LanguageAwareTextSplitter
 # Global cache for embeddings model (legacy - will be replaced by DualEmbeddingManager)
 _embeddings_model = None
 
+# Streaming ingest settings
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "256"))  # chunks embedded per batch
+INGEST_PAGE_PREFETCH = int(os.getenv("INGEST_PAGE_PREFETCH", "32"))  # pages buffered ahead of the splitter
+LANGUAGE_SAMPLE_CHARS = int(os.getenv("LANGUAGE_SAMPLE_CHARS", "20000"))  # text used for language detection
+
 class DocumentProcessor:
     def __init__(self, groq_api_key=None):
         self.api_key = groq_api_key or os.environ.get("GROQ_API_KEY")
@@ -58,12 +66,14 @@ class DocumentProcessor:
             temperature=0.1
         )
 
-    def get_document_hash(self, file_path):
-        hash_md5 = hashlib.md5()
+    @staticmethod
+    def get_document_hash(file_path):
+        """SHA-256 of the file contents, used as the content address of an upload"""
+        hash_sha256 = hashlib.sha256()
         with open(file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                hash_md5.update(chunk)
-        return hash_md5.hexdigest()
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                hash_sha256.update(chunk)
+        return hash_sha256.hexdigest()
 
     def process_pdf(self, pdf_path, filename):
         """Enhanced PDF processing with language detection and metadata tracking"""
@@ -125,22 +135,159 @@ class DocumentProcessor:
     def embed_pdf(self, pdf_path, filename):
         """Process PDF with language detection, metadata tracking, and appropriate embeddings"""
         try:
-            # Enhanced PDF processing with language detection and metadata
-            page_texts, language = self.process_pdf(pdf_path, filename)
-            logger.info(f"📄 Processing {language} PDF: {filename}")
+            vector_store, language, stats = self.stream_vector_store(pdf_path, filename)
+            logger.info(f"📄 Processed {language} PDF: {filename} ({stats['chunks']} chunks)")
+            return vector_store, language
             
-            # Language-aware text splitting with metadata preservation
-            chunks_with_metadata = self.split_text_with_metadata(page_texts, language)
-            logger.info(f"✂️ Split into {len(chunks_with_metadata)} chunks for {language} processing")
+        except Exception as e:
+            logger.error(f"❌ Error embedding PDF {filename}: {e}")
+            raise e
+
+    def stream_vector_store(self, pdf_path, filename, batch_size=None, progress_callback=None):
+        """
+        Streaming ingest: extract -> split -> embed in bounded batches
+        
+        Pages are extracted on a background thread into a bounded queue, so extraction of
+        later pages overlaps with embedding of earlier chunks. Only one batch of chunks
+        is held in memory at a time; each batch is embedded and appended to the index.
+        
+        Returns (vector_store, language, stats)
+        """
+        batch_size = batch_size or INGEST_BATCH_SIZE
+        pages = self._iter_pages_prefetched(pdf_path, filename)
+        
+        try:
+            # Language is detected from the leading pages instead of the whole document
+            sample_pages = []
+            sample_chars = 0
+            for page_info in pages:
+                sample_pages.append(page_info)
+                sample_chars += len(page_info['text'])
+                if sample_chars >= LANGUAGE_SAMPLE_CHARS:
+                    break
             
-            # Create vector store with metadata
-            vector_store = self.create_vector_store_with_metadata(chunks_with_metadata, language)
+            if not sample_pages:
+                raise ValueError("No text content found in PDF")
             
-            return vector_store, language
+            language = self._detect_document_language(' '.join(page['text'] for page in sample_pages))
+            if progress_callback:
+                progress_callback(f'Extracting and embedding {language} text...')
+            
+            embeddings = DualEmbeddingManager.get_embeddings_static(language)
+            stats = {'pages': 0, 'chunks': 0, 'valid_chunks': 0, 'batches': 0, 'cache_hits': 0, 'cache_misses': 0,
+                     'encoded_chunks': 0, 'encode_seconds': 0.0}
+            vector_store = None
+            
+            def normalized_pages():
+                for page_info in chain(sample_pages, pages):
+                    if language == 'tamil':
+                        page_info['text'] = self.pdf_extractor.normalize_tamil_text(page_info['text'])
+                    stats['pages'] += 1
+                    yield page_info
+            
+            batch = []
+            for chunk in self.text_splitter.iter_split_with_metadata(normalized_pages(), language):
+                batch.append(chunk)
+                if len(batch) >= batch_size:
+                    vector_store = self._add_chunk_batch(vector_store, batch, language, embeddings, stats)
+                    batch = []
+                    if progress_callback:
+                        progress_callback(f"Embedded {stats['chunks']} {language} chunks from {stats['pages']} pages...")
+            if batch:
+                vector_store = self._add_chunk_batch(vector_store, batch, language, embeddings, stats)
+            
+            # Same thresholds as LanguageAwareTextSplitter.validate_chunks
+            if stats['valid_chunks'] == 0:
+                raise ValueError("Text splitting validation failed: No chunks with sufficient content (>50 chars)")
+            if stats['valid_chunks'] < stats['chunks'] * 0.8:
+                logger.warning(f"⚠️ Text splitting warning: Only {stats['valid_chunks']}/{stats['chunks']} chunks have sufficient content")
+            
+            logger.info(f"✅ Streamed {stats['pages']} pages into {stats['chunks']} chunks "
+                       f"({stats['batches']} batches) for {language} vector store")
+            logger.info(f"💾 Embedding cache: {stats['cache_hits']} hits, {stats['cache_misses']} misses")
+            stats['chunks_per_second'] = (
+                round(stats['encoded_chunks'] / stats['encode_seconds'], 1) if stats['encode_seconds'] > 0 else None
+            )
+            return vector_store, language, stats
             
         except Exception as e:
-            logger.error(f"❌ Error embedding PDF {filename}: {e}")
+            logger.error(f"❌ Error streaming PDF {filename} into vector store: {e}")
             raise e
+        finally:
+            pages.close()
+
+    def _detect_document_language(self, sample_text):
+        """Validate text quality and detect language from a text sample"""
+        if not self.language_detector.validate_text_quality(sample_text):
+            raise ValueError("Extracted text quality is insufficient for processing")
+        
+        language = self.language_detector.detect_language(sample_text)
+        logger.info(f"📝 Detected language: {language}")
+        
+        stats = self.language_detector.get_text_stats(sample_text)
+        logger.info(f"📊 Sample text stats: {stats['total_chars']} chars, "
+                   f"Tamil: {stats['tamil_ratio']:.1%}, English: {stats['english_ratio']:.1%}")
+        return language
+
+    def _add_chunk_batch(self, vector_store, batch, language, embeddings, stats):
+        """Embed one batch of chunks and append it to the (possibly not yet created) vector store"""
+        texts = [chunk['text'] for chunk in batch]
+        metadatas = [chunk['metadata'] for chunk in batch]
+        vectors = DualEmbeddingManager.embed_documents_cached(language, texts, stats)
+        
+        if vector_store is None:
+            vector_store = FAISS.from_embeddings(list(zip(texts, vectors)), embeddings, metadatas=metadatas)
+        else:
+            vector_store.add_embeddings(list(zip(texts, vectors)), metadatas=metadatas)
+        
+        stats['chunks'] += len(texts)
+        stats['valid_chunks'] += sum(1 for text in texts if len(text.strip()) > 50)
+        stats['batches'] += 1
+        logger.debug(f"Embedded batch {stats['batches']} ({len(texts)} chunks)")
+        return vector_store
+
+    def _iter_pages_prefetched(self, pdf_path, filename):
+        """
+        Yield pages extracted on a background thread through a bounded queue
+        Closing the generator stops the producer thread
+        """
+        page_queue = queue.Queue(maxsize=INGEST_PAGE_PREFETCH)
+        stop = threading.Event()
+        done = object()
+        errors = []
+        
+        def put(item):
+            while not stop.is_set():
+                try:
+                    page_queue.put(item, timeout=0.5)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        
+        def produce():
+            try:
+                for page_info in self.pdf_extractor.iter_pages(pdf_path, filename):
+                    if not put(page_info):
+                        return
+            except Exception as e:
+                errors.append(e)
+            finally:
+                put(done)
+        
+        producer = threading.Thread(target=produce, name="pdf-page-producer", daemon=True)
+        producer.start()
+        try:
+            while True:
+                item = page_queue.get()
+                if item is done:
+                    break
+                yield item
+            if errors:
+                raise errors[0]
+        finally:
+            stop.set()
+            producer.join()
 
     def create_vector_store_with_metadata(self, chunks_with_metadata, language='english'):
         """Create vector store with appropriate embeddings and metadata for the language"""
@@ -152,8 +299,13 @@ class DocumentProcessor:
             texts = [chunk['text'] for chunk in chunks_with_metadata]
             metadatas = [chunk['metadata'] for chunk in chunks_with_metadata]
             
+            # Only chunks missing from the embedding cache are encoded
+            cache_stats = {}
+            vectors = DualEmbeddingManager.embed_documents_cached(language, texts, cache_stats)
+            logger.info(f"💾 Embedding cache: {cache_stats.get('cache_hits', 0)} hits, {cache_stats.get('cache_misses', 0)} misses")
+            
             # Create vector store with metadata
-            vector_store = FAISS.from_texts(texts, embeddings, metadatas=metadatas)
+            vector_store = FAISS.from_embeddings(list(zip(texts, vectors)), embeddings, metadatas=metadatas)
             
             logger.info(f"✅ Created {language} vector store with {vector_store.index.ntotal} vectors and metadata")
             return vector_store
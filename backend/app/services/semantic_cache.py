@@ -0,0 +1,114 @@
+from ...redis_cache import cache, async_cache
+from typing import Optional, Dict, List
+from loguru import logger
+import base64
+import os
+import numpy as np
+
+from .dual_embedding_manager import DualEmbeddingManager
+
+# Minimum cosine similarity between query embeddings to reuse an answer
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+# Answers remembered per user and scope, and for how long
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "50"))
+SEMANTIC_CACHE_TTL = int(os.getenv("SEMANTIC_CACHE_TTL", "3600"))
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+
+_STATS_KEY = "chat_cache_stats"
+
+
+class SemanticChatCache:
+    """
+    Second response cache tier for near-duplicate questions ("What is the refund policy?"
+    vs "what's the refund policy")
+
+    Each user has a small vector index per scope in Redis - the newest
+    SEMANTIC_CACHE_MAX_ENTRIES query embeddings with their answers. PDF answers are
+    scoped to the vector store generation they were produced from, so a new upload
+    never serves answers about the previous documents. Queries are embedded with the
+    model of the user's documents (English model for general chat).
+    """
+
+    @staticmethod
+    def _scope_key(user_id: int, has_pdf: bool, generation: Optional[int]) -> str:
+        scope = f"gen:{generation}" if has_pdf else "general"
+        return f"chat_semantic:user:{user_id}:{scope}"
+
+    @staticmethod
+    def embed_query(query: str, language: str = "english") -> np.ndarray:
+        """Normalised query embedding with the language's document model"""
+        vector = np.asarray(DualEmbeddingManager.get_embeddings_static(language).embed_query(query), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    @staticmethod
+    def lookup(user_id: int, query_vector: np.ndarray, has_pdf: bool, generation: Optional[int] = None) -> Optional[Dict]:
+        """Cached answer to the most similar previous query above the threshold, or None"""
+        if not SEMANTIC_CACHE_ENABLED or (has_pdf and generation is None):
+            return None
+        try:
+            entries = cache.get_json_list(SemanticChatCache._scope_key(user_id, has_pdf, generation))
+            vectors = [np.frombuffer(base64.b64decode(entry["vector"]), dtype=np.float32) for entry in entries]
+            vectors = [(i, vector) for i, vector in enumerate(vectors) if vector.shape == query_vector.shape]
+            if not vectors:
+                return None
+
+            matrix = np.stack([vector for _, vector in vectors])
+            similarities = matrix @ query_vector
+            best = int(np.argmax(similarities))
+            similarity = float(similarities[best])
+            if similarity < SEMANTIC_CACHE_THRESHOLD:
+                return None
+
+            entry = entries[vectors[best][0]]
+            logger.info(f"🧠 Semantic cache hit for user {user_id} (similarity {similarity:.3f})")
+            result = {key: value for key, value in entry.items() if key != "vector"}
+            result["similarity"] = similarity
+            return result
+        except Exception as e:
+            logger.error(f"Error in semantic cache lookup: {e}")
+            return None
+
+    @staticmethod
+    def store(user_id: int, query: str, query_vector: np.ndarray, has_pdf: bool, response: str, source: str,
+              sources: List = None, generation: Optional[int] = None) -> bool:
+        """Remember an answer under its query embedding"""
+        if not SEMANTIC_CACHE_ENABLED or (has_pdf and generation is None):
+            return False
+        entry = {
+            "vector": base64.b64encode(np.asarray(query_vector, dtype=np.float32).tobytes()).decode("ascii"),
+            "query": query,
+            "response": response,
+            "source": source,
+            "sources": sources or [],
+        }
+        return cache.push_json_capped(
+            SemanticChatCache._scope_key(user_id, has_pdf, generation), entry,
+            SEMANTIC_CACHE_MAX_ENTRIES, expire=SEMANTIC_CACHE_TTL
+        )
+
+    @staticmethod
+    def record(outcome: str) -> None:
+        """Count a response cache outcome: 'exact_hits', 'semantic_hits' or 'misses'"""
+        cache.incr_counter(_STATS_KEY, outcome)
+
+    @staticmethod
+    async def arecord(outcome: str) -> None:
+        await async_cache.incr_counter(_STATS_KEY, outcome)
+
+    @staticmethod
+    def get_stats() -> Dict:
+        """Exact and semantic hit rates across all processes"""
+        counters = cache.get_counters(_STATS_KEY)
+        exact = counters.get("exact_hits", 0)
+        semantic = counters.get("semantic_hits", 0)
+        misses = counters.get("misses", 0)
+        total = exact + semantic + misses
+        return {
+            "exact_hits": exact,
+            "semantic_hits": semantic,
+            "misses": misses,
+            "exact_hit_rate": round(exact / total, 4) if total else 0.0,
+            "semantic_hit_rate": round(semantic / total, 4) if total else 0.0,
+            "threshold": SEMANTIC_CACHE_THRESHOLD,
+        }
@@ -9,16 +9,17 @@ class TaskService:
     """Service for managing user task tracking"""
     
     @staticmethod
-    def store_user_task(user_id: int, task_id: str, task_type: str, filename: str = None) -> bool:
+    def store_user_task(user_id: int, task_id: str, task_type: str, filename: str = None,
+                        status: str = 'queued', progress_message: str = None) -> bool:
         """Store a new task for a user"""
         with get_db_connection() as conn:
             cursor = conn.cursor()
             now = datetime.now(timezone.utc)
             
             cursor.execute("""
-                INSERT INTO user_tasks (user_id, task_id, task_type, filename, status, created_at, updated_at)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-            """, (user_id, task_id, task_type, filename, 'queued', now, now))
+                INSERT INTO user_tasks (user_id, task_id, task_type, filename, status, progress_message, created_at, updated_at)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+            """, (user_id, task_id, task_type, filename, status, progress_message, now, now))
             
             conn.commit()
             return True
@@ -76,24 +77,22 @@ class TaskService:
             cursor = conn.cursor()
             now = datetime.now(timezone.utc)
             
+            # RETURNING gives the owner for cache invalidation without a second query
             cursor.execute("""
                 UPDATE user_tasks
                 SET status = %s, updated_at = %s, progress_message = %s
                 WHERE task_id = %s
+                RETURNING user_id
             """, (status, now, progress_message, task_id))
+            updated = cursor.fetchall()
             
             conn.commit()
             
-            # Invalidate related caches
-            if cursor.rowcount > 0:
-                # Get user_id to clear user-specific cache
-                cursor.execute("SELECT user_id FROM user_tasks WHERE task_id = %s", (task_id,))
-                result = cursor.fetchone()
-                if result:
-                    user_id = result['user_id']  # Use dictionary key instead of index
-                    cache.delete(f"active_tasks:user:{user_id}")
+            # Invalidate related caches in one round trip
+            if updated:
+                cache.delete_many([f"active_tasks:user:{row['user_id']}" for row in updated])
             
-            return cursor.rowcount > 0
+            return bool(updated)
     
     @staticmethod
     def get_task_with_celery_status(task_id: str) -> Optional[Dict]:
@@ -113,6 +112,10 @@ class TaskService:
             
             task_dict = dict(task)
             
+            # Finished tasks are final (and deduplicated uploads never had a Celery task)
+            if task_dict['status'] in ('completed', 'failed', 'cancelled'):
+                return task_dict
+            
             # Get live status from Celery
             try:
                 celery_task = celery_app.AsyncResult(task_id)
@@ -0,0 +1,221 @@
+import os
+import shutil
+import time
+import uuid
+from typing import Dict, List, Optional
+from langchain_community.vectorstores import FAISS
+from loguru import logger
+from ...database_connection import get_db_connection
+from ...redis_cache import cache
+from ...vector_store_db import (
+    register_shared_document,
+    get_user_index,
+    get_user_document,
+    list_user_documents,
+    activate_user_index,
+    save_user_index_document,
+    remove_user_index_document,
+)
+from .document_store import DocumentStore, VECTOR_STORE_DIR
+from .dual_embedding_manager import DualEmbeddingManager
+
+# How long one user's index may stay locked while a document is appended or removed
+USER_INDEX_LOCK_TIMEOUT = int(os.getenv("USER_INDEX_LOCK_TIMEOUT", "600"))
+# How long a superseded generation stays on disk for readers that resolved its path before the switch
+USER_INDEX_GENERATION_GRACE_SECONDS = int(os.getenv("USER_INDEX_GENERATION_GRACE_SECONDS", "300"))
+
+
+class UserVectorIndex:
+    """
+    Per-user FAISS indexes (one per embedding model) that documents are appended to and
+    deleted from individually, so uploading document N only costs the work for document N
+
+    Every change is written to a new generation directory
+    (vector_stores/user_<id>/<model>/gen_<n>/) before Postgres is switched over, so
+    readers never see a half-written index. Superseded generations are only deleted once
+    they have been retired for USER_INDEX_GENERATION_GRACE_SECONDS, since other processes
+    may still be loading them. user_documents maps each document to the docstore ids of its vectors.
+    """
+
+    @staticmethod
+    def get_index_dir(user_id: int, embedding_model: str) -> str:
+        """Directory holding the generations of a user's index for an embedding model"""
+        return os.path.join(VECTOR_STORE_DIR, f"user_{user_id}", embedding_model.replace("/", "__"))
+
+    @staticmethod
+    def _generation_path(user_id: int, embedding_model: str, generation: int) -> str:
+        return os.path.join(UserVectorIndex.get_index_dir(user_id, embedding_model), f"gen_{generation}")
+
+    @staticmethod
+    def _retire_generation(vector_store_path: str) -> None:
+        """Stamp a superseded generation with the time it was switched away from"""
+        try:
+            os.utime(vector_store_path)
+        except OSError:
+            pass
+
+    @staticmethod
+    def collect_old_generations(user_id: int, embedding_model: str, current_path: Optional[str]) -> int:
+        """Delete generations other than current_path that were retired more than the grace period ago"""
+        index_dir = UserVectorIndex.get_index_dir(user_id, embedding_model)
+        if not os.path.isdir(index_dir):
+            return 0
+        current = os.path.abspath(current_path) if current_path else None
+        cutoff = time.time() - USER_INDEX_GENERATION_GRACE_SECONDS
+        removed = 0
+        for name in os.listdir(index_dir):
+            path = os.path.join(index_dir, name)
+            if not name.startswith("gen_") or os.path.abspath(path) == current:
+                continue
+            try:
+                if os.path.getmtime(path) >= cutoff:
+                    continue
+            except OSError:
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+            removed += 1
+        if removed:
+            logger.info(f"🗑️ Removed {removed} superseded index generations of user {user_id}")
+        return removed
+
+    @staticmethod
+    def _load(vector_store_path: str, language: str) -> FAISS:
+        embeddings = DualEmbeddingManager.get_embeddings_static(language)
+        return FAISS.load_local(vector_store_path, embeddings, index_name="index", allow_dangerous_deserialization=True)
+
+    @staticmethod
+    def _export_vectors(vector_store: FAISS):
+        """Read (text, vector) pairs and metadatas back out of a vector store, in index order"""
+        vectors = vector_store.index.reconstruct_n(0, vector_store.index.ntotal)
+        text_embeddings = []
+        metadatas = []
+        for position, vector in enumerate(vectors):
+            doc = vector_store.docstore.search(vector_store.index_to_docstore_id[position])
+            text_embeddings.append((doc.page_content, vector.tolist()))
+            metadatas.append(dict(doc.metadata))
+        return text_embeddings, metadatas
+
+    @staticmethod
+    def add_document(user_id: int, document: Dict, filename: str, source_store: Optional[FAISS] = None,
+                     register: bool = False) -> Dict:
+        """
+        Append a shared document's vectors to the user's index for its embedding model
+
+        document: shared document dict (content_hash, embedding_model, language, file_path,
+                  vector_store_path and id unless register=True)
+        source_store: the document's already loaded vector store, to avoid reading it back from disk
+        register: register the shared document in the same transaction (freshly processed upload)
+        """
+        content_hash = document['content_hash']
+        embedding_model = document['embedding_model']
+        language = document['language']
+
+        with cache.lock(f"user_index:{user_id}", timeout=USER_INDEX_LOCK_TIMEOUT):
+            with get_db_connection() as conn:
+                existing = get_user_document(conn, user_id, content_hash, embedding_model)
+                if existing:
+                    # The user already has this document - just switch chat to its index
+                    activate_user_index(conn, user_id, embedding_model)
+                index_row = get_user_index(conn, user_id, embedding_model)
+
+            if existing:
+                logger.info(f"📚 User {user_id} already has document {content_hash[:12]}, index reactivated")
+                return {
+                    'document_id': existing['id'],
+                    'generation': index_row['generation'],
+                    'vector_store_path': index_row['vector_store_path'],
+                    'vector_count': None,
+                }
+
+            if source_store is None:
+                source_store = UserVectorIndex._load(document['vector_store_path'], language)
+            text_embeddings, metadatas = UserVectorIndex._export_vectors(source_store)
+            vector_ids = [str(uuid.uuid4()) for _ in text_embeddings]
+
+            if index_row:
+                user_store = UserVectorIndex._load(index_row['vector_store_path'], language)
+                user_store.add_embeddings(text_embeddings, metadatas=metadatas, ids=vector_ids)
+                generation = index_row['generation'] + 1
+            else:
+                embeddings = DualEmbeddingManager.get_embeddings_static(language)
+                user_store = FAISS.from_embeddings(text_embeddings, embeddings, metadatas=metadatas, ids=vector_ids)
+                generation = 1
+
+            vector_store_path = UserVectorIndex._generation_path(user_id, embedding_model, generation)
+            user_store.save_local(vector_store_path, index_name="index")
+
+            try:
+                with get_db_connection() as conn:
+                    if register:
+                        document = register_shared_document(
+                            conn, content_hash, embedding_model, language,
+                            document['file_path'], document['vector_store_path']
+                        )
+                    document_id = save_user_index_document(
+                        conn, user_id, document, filename, vector_store_path, generation, vector_ids
+                    )
+            except Exception:
+                shutil.rmtree(vector_store_path, ignore_errors=True)
+                raise
+
+            if index_row:
+                UserVectorIndex._retire_generation(index_row['vector_store_path'])
+            UserVectorIndex.collect_old_generations(user_id, embedding_model, vector_store_path)
+
+        logger.info(f"➕ Appended {len(vector_ids)} vectors of {content_hash[:12]} to user {user_id} "
+                    f"{language} index (generation {generation}, {user_store.index.ntotal} vectors)")
+        DocumentStore.collect_garbage()
+        return {
+            'document_id': document_id,
+            'generation': generation,
+            'vector_store_path': vector_store_path,
+            'vector_count': user_store.index.ntotal,
+        }
+
+    @staticmethod
+    def remove_document(user_id: int, document_id: int) -> Dict:
+        """Delete one document's vectors from the user's index"""
+        with cache.lock(f"user_index:{user_id}", timeout=USER_INDEX_LOCK_TIMEOUT):
+            with get_db_connection() as conn:
+                document = get_user_document(conn, user_id, document_id=document_id)
+                if not document:
+                    raise LookupError(f"Document {document_id} not found")
+                index_row = get_user_index(conn, user_id, document['embedding_model'])
+
+            generation = index_row['generation'] + 1 if index_row else 0
+            vector_store_path = None
+            remaining = 0
+
+            if index_row:
+                user_store = UserVectorIndex._load(index_row['vector_store_path'], document['language'])
+                user_store.delete(list(document['vector_ids']))
+                remaining = user_store.index.ntotal
+                if remaining > 0:
+                    vector_store_path = UserVectorIndex._generation_path(user_id, document['embedding_model'], generation)
+                    user_store.save_local(vector_store_path, index_name="index")
+
+            try:
+                with get_db_connection() as conn:
+                    remove_user_index_document(conn, user_id, document, vector_store_path, generation)
+            except Exception:
+                if vector_store_path:
+                    shutil.rmtree(vector_store_path, ignore_errors=True)
+                raise
+
+            if index_row:
+                UserVectorIndex._retire_generation(index_row['vector_store_path'])
+            UserVectorIndex.collect_old_generations(user_id, document['embedding_model'], vector_store_path)
+
+        logger.info(f"➖ Removed document {document_id} from user {user_id} index ({remaining} vectors left)")
+        DocumentStore.collect_garbage()
+        return {
+            'document_id': document_id,
+            'generation': generation if vector_store_path else None,
+            'vector_count': remaining,
+        }
+
+    @staticmethod
+    def list_documents(user_id: int) -> List[Dict]:
+        """Documents currently in the user's indexes"""
+        with get_db_connection() as conn:
+            return list_user_documents(conn, user_id)
@@ -0,0 +1,179 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from loguru import logger
+
+# Total memory the in-process vector store cache may hold, and how long an unused entry stays
+VECTOR_STORE_CACHE_MAX_BYTES = int(os.getenv("VECTOR_STORE_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+VECTOR_STORE_CACHE_IDLE_TTL = float(os.getenv("VECTOR_STORE_CACHE_IDLE_TTL", "3600"))
+
+# Rough per-document overhead of the docstore (Document object, dict entry, id mapping)
+_DOCUMENT_OVERHEAD_BYTES = 400
+
+
+def estimate_vector_store_bytes(vectorstore) -> int:
+    """Approximate resident size of a LangChain FAISS store: float32 vectors plus the docstore"""
+    index = vectorstore.index
+    size = int(index.ntotal) * int(index.d) * 4
+
+    documents = getattr(getattr(vectorstore, "docstore", None), "_dict", {}) or {}
+    for doc in documents.values():
+        size += len(doc.page_content.encode("utf-8")) + len(repr(doc.metadata)) + _DOCUMENT_OVERHEAD_BYTES
+    return size
+
+
+class _Entry:
+    __slots__ = ("value", "size", "metadata", "last_access")
+
+    def __init__(self, value, size: int, metadata: dict, last_access: float):
+        self.value = value
+        self.size = size
+        self.metadata = metadata
+        self.last_access = last_access
+
+
+class VectorStoreLRU:
+    """
+    Thread-safe LRU of loaded vector stores bounded by a byte budget, with idle TTL expiry
+
+    Sizes come from estimate_vector_store_bytes unless given. Least recently used entries
+    are evicted once the budget is exceeded; entries idle for longer than idle_ttl are
+    dropped on the next access. on_evict(key, value, reason) runs for every removal
+    except explicit pop/clear.
+    """
+
+    def __init__(self, max_bytes: int = None, idle_ttl: float = None,
+                 on_evict: Optional[Callable[[Hashable, Any, str], None]] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_bytes = max_bytes if max_bytes is not None else VECTOR_STORE_CACHE_MAX_BYTES
+        self.idle_ttl = idle_ttl if idle_ttl is not None else VECTOR_STORE_CACHE_IDLE_TTL
+        self.on_evict = on_evict
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._bytes = 0
+        self._stats = {"hits": 0, "misses": 0, "evictions_size": 0, "evictions_ttl": 0,
+                       "rejected_too_large": 0, "peak_bytes": 0}
+
+    def __contains__(self, key) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def keys(self):
+        with self._lock:
+            return list(self._entries.keys())
+
+    def get(self, key, default=None):
+        """Cached value (marks it most recently used), or default"""
+        evicted = []
+        with self._lock:
+            self._expire_idle(evicted)
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+            else:
+                entry.last_access = self._clock()
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+        self._notify(evicted)
+        return entry.value if entry is not None else default
+
+    def get_metadata(self, key) -> Dict:
+        """Metadata stored with an entry, without touching its recency"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return dict(entry.metadata) if entry else {}
+
+    def put(self, key, value, size: Optional[int] = None, **metadata) -> bool:
+        """Cache a value, evicting LRU entries to stay within budget; False if it can never fit"""
+        size = size if size is not None else estimate_vector_store_bytes(value)
+        evicted = []
+        with self._lock:
+            self._remove(key)
+            if size > self.max_bytes:
+                self._stats["rejected_too_large"] += 1
+                logger.warning(f"⚠️ Vector store {key} ({size / 1024 ** 2:.1f} MB) exceeds the cache budget, not cached")
+                return False
+
+            self._expire_idle(evicted)
+            while self._entries and self._bytes + size > self.max_bytes:
+                old_key, old_entry = self._entries.popitem(last=False)
+                self._bytes -= old_entry.size
+                self._stats["evictions_size"] += 1
+                evicted.append((old_key, old_entry.value, "size"))
+
+            self._entries[key] = _Entry(value, size, metadata, self._clock())
+            self._bytes += size
+            self._stats["peak_bytes"] = max(self._stats["peak_bytes"], self._bytes)
+
+        self._notify(evicted)
+        return True
+
+    def pop(self, key, default=None):
+        """Remove an entry (explicit invalidation)"""
+        with self._lock:
+            entry = self._remove(key)
+        return entry.value if entry else default
+
+    def clear(self) -> int:
+        with self._lock:
+            count = len(self._entries)
+            self._entries.clear()
+            self._bytes = 0
+        return count
+
+    def expire_idle(self) -> int:
+        """Drop entries idle for longer than idle_ttl, returns how many were dropped"""
+        evicted = []
+        with self._lock:
+            self._expire_idle(evicted)
+        self._notify(evicted)
+        return len(evicted)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "idle_ttl_seconds": self.idle_ttl,
+                "hit_rate": round(self._stats["hits"] / lookups, 4) if lookups else 0.0,
+                "entry_bytes": {str(key): entry.size for key, entry in self._entries.items()},
+            }
+
+    def _remove(self, key) -> Optional[_Entry]:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+        return entry
+
+    def _expire_idle(self, evicted: list):
+        if self.idle_ttl <= 0:
+            return
+        deadline = self._clock() - self.idle_ttl
+        # Entries are in access order, so expired ones are at the front
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if entry.last_access > deadline:
+                break
+            self._entries.popitem(last=False)
+            self._bytes -= entry.size
+            self._stats["evictions_ttl"] += 1
+            evicted.append((key, entry.value, "ttl"))
+
+    def _notify(self, evicted: list):
+        for key, value, reason in evicted:
+            logger.info(f"♻️ Evicted vector store {key} from memory ({reason})")
+            if self.on_evict:
+                try:
+                    self.on_evict(key, value, reason)
+                except Exception as e:
+                    logger.warning(f"⚠️ Vector store eviction callback failed for {key}: {e}")
@@ -0,0 +1,37 @@
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# Bounded pools for blocking work called from async handlers, so a burst of requests
+# queues here instead of piling threads onto the default executor.
+# CPU: query embedding, FAISS search, vector store loads. DB: psycopg2 and Redis calls
+# (keep CHAT_DB_WORKERS at or below the Postgres pool's maxconn).
+CPU_WORKERS = int(os.getenv("CHAT_CPU_WORKERS", str(os.cpu_count() or 4)))
+DB_WORKERS = int(os.getenv("CHAT_DB_WORKERS", "16"))
+
+_cpu_executor = ThreadPoolExecutor(max_workers=CPU_WORKERS, thread_name_prefix="chat-cpu")
+_db_executor = ThreadPoolExecutor(max_workers=DB_WORKERS, thread_name_prefix="chat-db")
+
+
+async def run_cpu_bound(func, *args, **kwargs):
+    """Run CPU-heavy blocking work on the bounded CPU executor"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_cpu_executor, functools.partial(func, *args, **kwargs))
+
+
+async def run_db(func, *args, **kwargs):
+    """Run blocking database / cache I/O on the bounded DB executor"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_db_executor, functools.partial(func, *args, **kwargs))
+
+
+def submit_cpu_bound(func, *args, **kwargs):
+    """Fire-and-forget CPU work from a non-async context (e.g. background prefetch)"""
+    return _cpu_executor.submit(func, *args, **kwargs)
+
+
+def shutdown_executors():
+    """Stop the executors (application shutdown)"""
+    _cpu_executor.shutdown(wait=False, cancel_futures=True)
+    _db_executor.shutdown(wait=False, cancel_futures=True)
@@ -1,11 +1,27 @@
 import os
 from fastapi import UploadFile
+import asyncio
+import hashlib
 import shutil
+import uuid
 from datetime import datetime
+from typing import Optional, Tuple
 
 UPLOAD_DIR = os.path.join(os.path.dirname(__file__), '../../uploads')
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
+# Largest accepted upload (bytes) and the size of each chunk read from the request
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(50 * 1024 * 1024)))
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+
+
+class UploadTooLargeError(Exception):
+    """Upload exceeds MAX_UPLOAD_BYTES"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        super().__init__(f"File exceeds the maximum upload size of {max_bytes} bytes")
+
 def get_user_upload_dir(user_id: str) -> str:
     """Get the upload directory for a specific user"""
     return os.path.join(UPLOAD_DIR, f"user_{user_id}")
@@ -25,6 +41,59 @@ def save_pdf_file(uploaded_file: UploadFile, user_id: str) -> str:
 
     return file_path
 
+def _check_declared_size(uploaded_file: UploadFile, max_bytes: int):
+    # Reject early when the client declared the size; the streamed count is still enforced
+    if uploaded_file.size is not None and uploaded_file.size > max_bytes:
+        raise UploadTooLargeError(max_bytes)
+
+async def save_pdf_file_streamed(uploaded_file: UploadFile, user_id: str,
+                                 max_bytes: Optional[int] = None) -> Tuple[str, str, int]:
+    """
+    Stream an upload to disk in chunks without blocking the event loop
+    Returns (file_path, sha256 of the contents, size in bytes); raises UploadTooLargeError
+    (and removes the partial file) once more than max_bytes have been read.
+    Each upload gets its own file, so concurrent uploads of the same user never touch each other.
+    """
+    max_bytes = max_bytes or MAX_UPLOAD_BYTES
+    _check_declared_size(uploaded_file, max_bytes)
+
+    user_dir = get_user_upload_dir(user_id)
+    await asyncio.to_thread(os.makedirs, user_dir, exist_ok=True)
+
+    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+    filename = f"{timestamp}_{uuid.uuid4().hex}_{os.path.basename(uploaded_file.filename)}"
+    file_path = os.path.join(user_dir, filename)
+
+    hash_sha256 = hashlib.sha256()
+    size = 0
+    buffer = await asyncio.to_thread(open, file_path, "xb")
+    try:
+        while chunk := await uploaded_file.read(UPLOAD_CHUNK_SIZE):
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLargeError(max_bytes)
+            hash_sha256.update(chunk)
+            await asyncio.to_thread(buffer.write, chunk)
+    except BaseException:
+        await asyncio.to_thread(buffer.close)
+        await asyncio.to_thread(os.remove, file_path)
+        raise
+    await asyncio.to_thread(buffer.close)
+
+    return file_path, hash_sha256.hexdigest(), size
+
+async def read_upload_limited(uploaded_file: UploadFile, max_bytes: Optional[int] = None) -> bytes:
+    """Read an upload into memory in chunks, enforcing max_bytes"""
+    max_bytes = max_bytes or MAX_UPLOAD_BYTES
+    _check_declared_size(uploaded_file, max_bytes)
+
+    data = bytearray()
+    while chunk := await uploaded_file.read(UPLOAD_CHUNK_SIZE):
+        data.extend(chunk)
+        if len(data) > max_bytes:
+            raise UploadTooLargeError(max_bytes)
+    return bytes(data)
+
 def cleanup_user_files(user_dir: str):
     """Clean up all files in a user's directory"""
     try:
@@ -0,0 +1,46 @@
+import base64
+import json
+import os
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+# Default and maximum page sizes for the chat list and chat history endpoints
+CHAT_LIST_PAGE_SIZE = int(os.getenv("CHAT_LIST_PAGE_SIZE", "50"))
+CHAT_LIST_MAX_PAGE_SIZE = int(os.getenv("CHAT_LIST_MAX_PAGE_SIZE", "200"))
+CHAT_HISTORY_PAGE_SIZE = int(os.getenv("CHAT_HISTORY_PAGE_SIZE", "100"))
+CHAT_HISTORY_MAX_PAGE_SIZE = int(os.getenv("CHAT_HISTORY_MAX_PAGE_SIZE", "500"))
+
+
+class InvalidCursorError(ValueError):
+    """Cursor was not produced by encode_cursor (or was tampered with)"""
+
+
+def encode_cursor(sort_value: datetime, tiebreaker) -> str:
+    """Opaque keyset cursor for the last row of a page: (timestamp, unique id)"""
+    payload = json.dumps([sort_value.isoformat(), tiebreaker], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, object]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, tiebreaker = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(sort_value), tiebreaker
+    except Exception as e:
+        raise InvalidCursorError(f"Invalid pagination cursor: {cursor!r}") from e
+
+
+def clamp_page_size(limit: Optional[int], default: int, maximum: int, cursor: Optional[str] = None) -> Optional[int]:
+    """Requested page size within bounds; None (unpaginated) when neither limit nor cursor is given"""
+    if limit is None:
+        return default if cursor else None
+    return max(1, min(int(limit), maximum))
+
+
+def split_page(rows: List[dict], limit: int, cursor_fields: Tuple[str, str]) -> Tuple[List[dict], Optional[str]]:
+    """Rows fetched with LIMIT limit + 1 -> (page, cursor of the next page or None); limit None = all rows"""
+    if limit is None or len(rows) <= limit:
+        return rows, None
+    page = rows[:limit]
+    last = page[-1]
+    return page, encode_cursor(last[cursor_fields[0]], last[cursor_fields[1]])
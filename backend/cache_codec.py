@@ -0,0 +1,113 @@
+"""
+Versioned value codec for RedisCache
+
+Encoded values are a 3-byte header (format version, serializer, compression) followed by
+the payload. Values written before the codec existed have no header (raw JSON or pickle)
+and are decoded through the legacy path, so old entries stay readable until they expire.
+"""
+
+import json
+import os
+import pickle
+import zlib
+from typing import Any, Tuple
+
+try:
+    import orjson
+except ImportError:  # optional: faster, compact JSON
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:  # optional: better ratio than zlib at similar speed
+    zstandard = None
+
+FORMAT_VERSION = 1
+
+SERIALIZER_JSON = 1
+
+COMPRESSION_NONE = 0
+COMPRESSION_ZLIB = 1
+COMPRESSION_ZSTD = 2
+
+# Values at least this large are compressed (kept only if compression actually helps)
+COMPRESS_MIN_BYTES = int(os.getenv("REDIS_COMPRESS_MIN_BYTES", "1024"))
+# zstd | zlib | none (zstd falls back to zlib when zstandard is not installed)
+COMPRESSION = os.getenv("REDIS_CACHE_COMPRESSION", "zstd").lower()
+ZSTD_LEVEL = int(os.getenv("REDIS_ZSTD_LEVEL", "3"))
+ZLIB_LEVEL = int(os.getenv("REDIS_ZLIB_LEVEL", "6"))
+
+
+class CacheCodecError(ValueError):
+    """Stored value cannot be decoded (unknown version or missing compression library)"""
+
+
+def _compression_id() -> int:
+    if COMPRESSION == "none":
+        return COMPRESSION_NONE
+    if COMPRESSION == "zstd" and zstandard is not None:
+        return COMPRESSION_ZSTD
+    return COMPRESSION_ZLIB
+
+
+def serialize(value: Any) -> bytes:
+    """JSON bytes of a value (orjson when available)"""
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS, default=str)
+    return json.dumps(value, separators=(",", ":"), default=str).encode("utf-8")
+
+
+def deserialize(payload: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(payload)
+    return json.loads(payload.decode("utf-8"))
+
+
+def _compress(payload: bytes, compression: int) -> bytes:
+    if compression == COMPRESSION_ZSTD:
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(payload)
+    return zlib.compress(payload, ZLIB_LEVEL)
+
+
+def _decompress(payload: bytes, compression: int) -> bytes:
+    if compression == COMPRESSION_NONE:
+        return payload
+    if compression == COMPRESSION_ZLIB:
+        return zlib.decompress(payload)
+    if compression == COMPRESSION_ZSTD:
+        if zstandard is None:
+            raise CacheCodecError("value is zstd-compressed but zstandard is not installed")
+        return zstandard.ZstdDecompressor().decompress(payload)
+    raise CacheCodecError(f"unknown compression id {compression}")
+
+
+def encode(value: Any) -> Tuple[bytes, int]:
+    """Encoded bytes of a value and its uncompressed payload size"""
+    payload = serialize(value)
+    raw_size = len(payload)
+    compression = COMPRESSION_NONE
+    if raw_size >= COMPRESS_MIN_BYTES:
+        compression = _compression_id()
+        if compression != COMPRESSION_NONE:
+            compressed = _compress(payload, compression)
+            if len(compressed) < raw_size:
+                payload = compressed
+            else:
+                compression = COMPRESSION_NONE
+    return bytes((FORMAT_VERSION, SERIALIZER_JSON, compression)) + payload, raw_size
+
+
+def decode(data: bytes, legacy: str = "json") -> Any:
+    """
+    Decode a stored value
+
+    Headerless values are legacy entries: legacy="json" parses them as JSON text,
+    legacy="pickle" unpickles them (only for entries written by the old RedisCache.set).
+    """
+    if data[:1] == bytes((FORMAT_VERSION,)) and len(data) >= 3:
+        if data[1] != SERIALIZER_JSON:
+            raise CacheCodecError(f"unknown serializer id {data[1]}")
+        return deserialize(_decompress(data[3:], data[2]))
+    if legacy == "pickle":
+        return pickle.loads(data)
+    return json.loads(data.decode("utf-8"))
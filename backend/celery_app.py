@@ -1,5 +1,5 @@
 from celery import Celery
-from celery.signals import setup_logging
+from celery.signals import setup_logging, worker_init, worker_process_init
 import os
 import sys
 from loguru import logger
@@ -45,6 +45,13 @@ celery_app = Celery(
     include=["backend.tasks"]
 )
 
+# Warm workers keep the embedding models loaded across tasks and are only recycled
+# once their resident memory passes CELERY_MAX_MEMORY_PER_CHILD_MB (prefork pool).
+# CELERY_WARM_WORKERS=false restores one fresh child process per task.
+WARM_WORKERS = os.getenv("CELERY_WARM_WORKERS", "true").lower() in ("1", "true", "yes")
+MAX_MEMORY_PER_CHILD_MB = int(os.getenv("CELERY_MAX_MEMORY_PER_CHILD_MB", "3072"))
+MAX_TASKS_PER_CHILD = int(os.getenv("CELERY_MAX_TASKS_PER_CHILD", "0")) or None
+
 # Configure Celery settings
 celery_app.conf.update(
     task_serializer="json",
@@ -54,7 +61,10 @@ celery_app.conf.update(
     enable_utc=True,
     result_expires=3600, 
     broker_connection_retry_on_startup=True,  
-    worker_max_tasks_per_child=1,
+    worker_max_tasks_per_child=MAX_TASKS_PER_CHILD if WARM_WORKERS else 1,
+    worker_max_memory_per_child=MAX_MEMORY_PER_CHILD_MB * 1024 if WARM_WORKERS else None,  # KiB
+    # Long PDF tasks: take one message at a time so a busy child doesn't hold queued uploads
+    worker_prefetch_multiplier=1,
     task_routes={
         "backend.tasks.process_pdf_task": {"queue": "pdf_processing"},
     },
@@ -65,5 +75,41 @@ celery_app.conf.update(
     worker_log_color=False,
 )
 
+def _preload_embedding_models():
+    """Load the embedding models before the first task instead of inside it"""
+    try:
+        from backend.app.services.dual_embedding_manager import DualEmbeddingManager
+        DualEmbeddingManager.preload_models()
+        logger.info(f"🔥 Embedding models preloaded in worker process {os.getpid()}")
+    except Exception as e:
+        logger.warning(f"⚠️ Embedding model preload failed, models will load on first task: {e}")
+
+
+@worker_process_init.connect
+def warm_worker_process(**kwargs):
+    """Prefork pool: preload in every child (after fork - torch must not be forked mid-use)"""
+    if WARM_WORKERS:
+        _preload_embedding_models()
+
+
+def _runs_tasks_in_main_process(pool_cls) -> bool:
+    """Whether a worker pool (name or class - Celery resolves --pool to a class) is solo or threads"""
+    from celery.concurrency import get_implementation
+    from celery.concurrency.solo import TaskPool as SoloPool
+    from celery.concurrency.thread import TaskPool as ThreadPool
+    try:
+        pool_cls = get_implementation(pool_cls)
+    except Exception:
+        return False
+    return isinstance(pool_cls, type) and issubclass(pool_cls, (SoloPool, ThreadPool))
+
+
+@worker_init.connect
+def warm_worker(sender=None, **kwargs):
+    """solo/threads pools run tasks in the main process, so preload there"""
+    if WARM_WORKERS and _runs_tasks_in_main_process(getattr(sender, "pool_cls", None)):
+        _preload_embedding_models()
+
+
 if __name__ == "__main__":
     celery_app.start() 
\ No newline at end of file
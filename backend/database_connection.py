@@ -1,38 +1,124 @@
-from psycopg2 import connect
+from psycopg2 import connect, OperationalError, InterfaceError
 from psycopg2.extras import RealDictCursor
-from psycopg2.pool import SimpleConnectionPool
+from psycopg2.pool import ThreadedConnectionPool
 from dotenv import load_dotenv
 import os
-from contextlib import contextmanager
+import threading
+import time
+from contextlib import contextmanager, asynccontextmanager
 
 load_dotenv()
 
 database = os.getenv("database", "fastapi")
 user = os.getenv("user")
 password = os.getenv("password_db")
+host = os.getenv("DB_HOST", "localhost")
+port = int(os.getenv("DB_PORT", "5432"))
+
+# Pool sizing: keep DB_POOL_MAX at or above CHAT_DB_WORKERS (plus Celery concurrency per process)
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "20"))
+# Seconds a checkout waits for a free connection before failing
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+# Connections idle for longer than this are pinged before being handed out
+DB_POOL_HEALTH_CHECK_INTERVAL = float(os.getenv("DB_POOL_HEALTH_CHECK_INTERVAL", "30"))
+# Optional psycopg 3 pool for async routes (requires psycopg[pool])
+DB_ASYNC_POOL = os.getenv("DB_ASYNC_POOL", "false").lower() in ("1", "true", "yes")
+
+
+class PoolTimeoutError(Exception):
+    """No database connection became available within DB_POOL_TIMEOUT"""
+
 
 # Create a connection pool
 _pool = None
+_pool_lock = threading.Lock()
+# Bounds checkouts to maxconn so callers queue instead of hitting PoolError
+_slots = None
+_last_used = {}
+_stats = {"checkouts": 0, "in_use": 0, "waits": 0, "wait_seconds_total": 0.0, "wait_seconds_max": 0.0,
+          "timeouts": 0, "health_checks": 0, "broken_connections": 0}
+_stats_lock = threading.Lock()
 
 def get_connection_pool():
-    global _pool
+    global _pool, _slots
     if _pool is None:
-        try:
-            _pool = SimpleConnectionPool(
-                minconn=1,
-                maxconn=20,  # Adjust based on your needs
-                host="localhost",
-                database=database,
-                user=user,
-                password=password,
-                cursor_factory=RealDictCursor
-            )
-            print("Connection pool created successfully")
-        except Exception as e:
-            print(f"Failed to create connection pool: {e}")
-            return None
+        with _pool_lock:
+            if _pool is not None:
+                return _pool
+            try:
+                # Threaded pool: request handlers and Celery threads share it
+                _pool = ThreadedConnectionPool(
+                    minconn=DB_POOL_MIN,
+                    maxconn=DB_POOL_MAX,
+                    host=host,
+                    port=port,
+                    database=database,
+                    user=user,
+                    password=password,
+                    cursor_factory=RealDictCursor
+                )
+                _slots = threading.BoundedSemaphore(DB_POOL_MAX)
+                print(f"Connection pool created successfully ({DB_POOL_MIN}-{DB_POOL_MAX} connections to {host}:{port})")
+            except Exception as e:
+                print(f"Failed to create connection pool: {e}")
+                return None
     return _pool
 
+def _record(**increments):
+    with _stats_lock:
+        for name, value in increments.items():
+            if name == "wait_seconds_max":
+                _stats[name] = max(_stats[name], value)
+            else:
+                _stats[name] += value
+
+def _is_healthy(conn) -> bool:
+    """Cheap liveness check for connections that sat idle in the pool"""
+    if conn.closed:
+        return False
+    if time.monotonic() - _last_used.get(id(conn), 0.0) < DB_POOL_HEALTH_CHECK_INTERVAL:
+        return True
+    _record(health_checks=1)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        conn.rollback()
+        return True
+    except (OperationalError, InterfaceError):
+        return False
+
+def _checkout(pool):
+    """Connection from the pool, waiting up to DB_POOL_TIMEOUT and replacing dead connections"""
+    started = time.monotonic()
+    if not _slots.acquire(blocking=False):
+        _record(waits=1)
+        if not _slots.acquire(timeout=DB_POOL_TIMEOUT):
+            _record(timeouts=1)
+            raise PoolTimeoutError(f"No database connection available within {DB_POOL_TIMEOUT}s (pool max {DB_POOL_MAX})")
+        waited = time.monotonic() - started
+        _record(wait_seconds_total=waited, wait_seconds_max=waited)
+    try:
+        conn = pool.getconn()
+        while not _is_healthy(conn):
+            _record(broken_connections=1)
+            _last_used.pop(id(conn), None)
+            pool.putconn(conn, close=True)
+            conn = pool.getconn()
+    except Exception:
+        _slots.release()
+        raise
+    _record(checkouts=1, in_use=1)
+    return conn
+
+def _checkin(pool, conn):
+    _last_used[id(conn)] = time.monotonic()
+    try:
+        pool.putconn(conn, close=bool(conn.closed))
+    finally:
+        _record(in_use=-1)
+        _slots.release()
+
 @contextmanager
 def get_db_connection():
     """Context manager for database connections from the pool"""
@@ -40,17 +126,27 @@ def get_db_connection():
     if pool is None:
         raise Exception("Database connection pool not available")
     
-    conn = None
+    conn = _checkout(pool)
     try:
-        conn = pool.getconn()
         yield conn
     except Exception as e:
-        if conn:
+        if not conn.closed:
             conn.rollback()
         raise e
     finally:
-        if conn:
-            pool.putconn(conn)
+        _checkin(pool, conn)
+
+def get_pool_stats():
+    """Checkout, wait and health-check counters plus current pool occupancy"""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats.update({
+        "available": DB_POOL_MAX - stats["in_use"],
+        "min": DB_POOL_MIN,
+        "max": DB_POOL_MAX,
+    })
+    stats["wait_seconds_avg"] = round(stats["wait_seconds_total"] / stats["waits"], 4) if stats["waits"] else 0.0
+    return stats
 
 def close_connection_pool():
     """Close the connection pool (call this on application shutdown)"""
@@ -58,14 +154,68 @@ def close_connection_pool():
     if _pool:
         _pool.closeall()
         _pool = None
+        _last_used.clear()
         print("Connection pool closed")
 
+_async_pool = None
+
+async def get_async_connection_pool():
+    """psycopg 3 AsyncConnectionPool (dict rows) for async routes, opened on first use"""
+    global _async_pool
+    if _async_pool is None:
+        from psycopg.rows import dict_row
+        from psycopg_pool import AsyncConnectionPool
+        
+        pool = AsyncConnectionPool(
+            conninfo="",
+            min_size=DB_POOL_MIN,
+            max_size=DB_POOL_MAX,
+            timeout=DB_POOL_TIMEOUT,
+            max_idle=DB_POOL_HEALTH_CHECK_INTERVAL * 10,
+            check=AsyncConnectionPool.check_connection,
+            kwargs={"host": host, "port": port, "dbname": database, "user": user, "password": password,
+                    "row_factory": dict_row},
+            open=False,
+        )
+        await pool.open()
+        _async_pool = pool
+        print("Async connection pool created successfully")
+    return _async_pool
+
+@asynccontextmanager
+async def get_async_db_connection():
+    """Async context manager for connections from the psycopg 3 pool (commits on success)"""
+    from psycopg_pool import PoolTimeout
+    
+    pool = await get_async_connection_pool()
+    try:
+        conn = await pool.getconn()
+    except PoolTimeout as e:
+        raise PoolTimeoutError(f"No database connection available within {DB_POOL_TIMEOUT}s (async pool max {DB_POOL_MAX})") from e
+    try:
+        yield conn
+        await conn.commit()
+    except BaseException:
+        if not conn.closed:
+            await conn.rollback()
+        raise
+    finally:
+        await pool.putconn(conn)
+
+async def close_async_connection_pool():
+    global _async_pool
+    if _async_pool is not None:
+        await _async_pool.close()
+        _async_pool = None
+        print("Async connection pool closed")
+
 # Legacy function for backward compatibility (deprecated)
 def get_db_connection_legacy():
     """Legacy function - use get_db_connection() context manager instead"""
     try:
         conn = connect(
-            host="localhost", 
+            host=host, 
+            port=port, 
             database=database, 
             user=user, 
             password=password, 
@@ -1,6 +1,15 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from backend.app.routers import users, chat, pdf_celery as pdf
-from backend.database_connection import get_connection_pool, close_connection_pool
+from backend.database_connection import (
+    get_connection_pool, close_connection_pool, get_async_connection_pool, close_async_connection_pool,
+    PoolTimeoutError, DB_ASYNC_POOL
+)
+from backend.app.utils.executors import shutdown_executors
+from backend.app.services.llm_registry import LLMRegistry
+from backend.app.services.cache_invalidation import InvalidationBus
+from backend.app.services.chat_write_behind import ChatWriteBehind
+from backend.redis_cache import async_cache
 from fastapi.middleware.cors import CORSMiddleware
 
 app = FastAPI()
@@ -17,11 +26,26 @@ app.add_middleware(
 async def startup_event():
     """Initialize database connection pool on startup"""
     get_connection_pool()
+    if DB_ASYNC_POOL:
+        await get_async_connection_pool()
+    InvalidationBus.start()
+    ChatWriteBehind.start()
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Close database connection pool on shutdown"""
+    InvalidationBus.stop()
+    ChatWriteBehind.stop()
+    shutdown_executors()
+    await LLMRegistry.aclose()
+    await async_cache.aclose()
     close_connection_pool()
+    await close_async_connection_pool()
+
+@app.exception_handler(PoolTimeoutError)
+async def pool_timeout_handler(request: Request, exc: PoolTimeoutError):
+    """Database saturated: ask clients to retry instead of failing with a 500"""
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
 
 app.include_router(users.router)
 app.include_router(chat.router)
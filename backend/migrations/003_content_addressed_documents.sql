@@ -0,0 +1,31 @@
+-- Migration: Content-addressed document storage with reference counting
+-- Description: Uploads and vector stores are keyed by content hash + embedding model
+-- so that identical documents are extracted and embedded only once
+
+CREATE TABLE IF NOT EXISTS shared_documents (
+    id SERIAL PRIMARY KEY,
+    content_hash VARCHAR(64) NOT NULL,
+    embedding_model VARCHAR(100) NOT NULL,
+    language VARCHAR(10) NOT NULL DEFAULT 'english',
+    file_path TEXT NOT NULL,
+    vector_store_path TEXT NOT NULL,
+    ref_count INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    last_used_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT uq_shared_documents_hash_model UNIQUE (content_hash, embedding_model)
+);
+
+-- Garbage collection scans for unreferenced documents
+CREATE INDEX IF NOT EXISTS idx_shared_documents_ref_count ON shared_documents(ref_count);
+
+-- Link user vector stores to the shared document they point at (NULL for legacy per-user stores)
+ALTER TABLE user_vector_stores
+ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64);
+
+CREATE INDEX IF NOT EXISTS idx_user_vector_stores_content_hash
+ON user_vector_stores(content_hash);
+
+COMMENT ON TABLE shared_documents IS 'Content-addressed PDFs and vector stores shared between users';
+COMMENT ON COLUMN shared_documents.content_hash IS 'SHA-256 of the uploaded PDF bytes';
+COMMENT ON COLUMN shared_documents.ref_count IS 'Number of active user vector stores linked to this document';
+COMMENT ON COLUMN user_vector_stores.content_hash IS 'Shared document this vector store links to';
@@ -0,0 +1,35 @@
+-- Migration: Multi-document incremental user vector stores
+-- Description: Each user gets one FAISS index per embedding model that documents are
+-- appended to / deleted from, instead of a single wipe-and-rebuild index per upload
+
+-- Generation of the per-user index (bumped on every append/delete, NULL for legacy single-document stores)
+ALTER TABLE user_vector_stores
+ADD COLUMN IF NOT EXISTS generation INTEGER;
+
+ALTER TABLE user_vector_stores
+ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP;
+
+-- One incremental index per user and embedding model
+CREATE UNIQUE INDEX IF NOT EXISTS uq_user_vector_stores_user_model
+ON user_vector_stores(user_id, embedding_model)
+WHERE generation IS NOT NULL;
+
+-- Documents contained in a user's index and the FAISS docstore ids of their vectors
+CREATE TABLE IF NOT EXISTS user_documents (
+    id SERIAL PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    content_hash VARCHAR(64) NOT NULL,
+    filename VARCHAR(255),
+    language VARCHAR(10) NOT NULL DEFAULT 'english',
+    embedding_model VARCHAR(100) NOT NULL,
+    vector_ids TEXT[] NOT NULL,
+    chunk_count INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT uq_user_documents_user_hash_model UNIQUE (user_id, content_hash, embedding_model)
+);
+
+CREATE INDEX IF NOT EXISTS idx_user_documents_user_id ON user_documents(user_id);
+
+COMMENT ON TABLE user_documents IS 'Documents appended to a user''s incremental vector store';
+COMMENT ON COLUMN user_documents.vector_ids IS 'Docstore ids of the document''s vectors in the user index';
+COMMENT ON COLUMN user_vector_stores.generation IS 'Incremented on every change to the user index';
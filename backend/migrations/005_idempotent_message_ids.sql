@@ -0,0 +1,11 @@
+-- Migration: Idempotent chat message ids
+-- Description: Turns persisted through the write-behind queue carry client-side message ids
+-- so a redelivered turn is written at most once
+
+ALTER TABLE messages
+ADD COLUMN IF NOT EXISTS message_id VARCHAR(64);
+
+-- NULL for messages written before this migration (or synchronously without an id)
+CREATE UNIQUE INDEX IF NOT EXISTS uq_messages_message_id
+ON messages(message_id)
+WHERE message_id IS NOT NULL;
@@ -0,0 +1,9 @@
+-- Migration: Keyset pagination for chat lists and chat history
+-- Description: Composite indexes matching the (updated_at, chat_id) and (created_at, id)
+-- page orders, so each page is an index range scan instead of a sort of the whole set
+
+CREATE INDEX IF NOT EXISTS idx_chats_user_updated_chat
+ON chats(user_id, updated_at DESC, chat_id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_messages_chat_created_id
+ON messages(chat_id, created_at DESC, id DESC);
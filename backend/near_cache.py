@@ -0,0 +1,138 @@
+"""
+In-process near-cache in front of Redis for hot, frequently polled keys
+
+Holds the encoded bytes of keys in configured namespaces, each capped by a per-namespace
+TTL. Coherence comes from the cache invalidation channel: every process that writes or
+deletes such a key publishes it, and listening processes drop their copy. Entries are only
+served while this process's listener is connected (set_active); any connect or disconnect
+clears the cache, since invalidations may have been missed in between.
+"""
+
+import fnmatch
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+
+def _parse_namespace_ttls(spec: str) -> Dict[str, float]:
+    """"active_tasks=5,chat_pdf=300" -> {"active_tasks": 5.0, "chat_pdf": 300.0}"""
+    ttls = {}
+    for item in spec.split(","):
+        namespace, _, ttl = item.strip().partition("=")
+        if namespace and ttl:
+            ttls[namespace] = float(ttl)
+    return ttls
+
+
+NEAR_CACHE_ENABLED = os.getenv("REDIS_NEAR_CACHE", "false").lower() in ("1", "true", "yes")
+NEAR_CACHE_MAX_ENTRIES = int(os.getenv("REDIS_NEAR_CACHE_MAX_ENTRIES", "10000"))
+# Namespaces (first key segment) served from the near-cache and their TTL caps in seconds
+NEAR_CACHE_NAMESPACES = _parse_namespace_ttls(
+    os.getenv("REDIS_NEAR_CACHE_NAMESPACES", "active_tasks=5,chat_pdf=300,chat_general=300")
+)
+
+
+class NearCache:
+    """Thread-safe entry-bounded LRU of encoded values with per-namespace TTL caps"""
+
+    def __init__(self, max_entries: int = None, namespace_ttls: Dict[str, float] = None,
+                 enabled: bool = None, clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries if max_entries is not None else NEAR_CACHE_MAX_ENTRIES
+        self.namespace_ttls = namespace_ttls if namespace_ttls is not None else NEAR_CACHE_NAMESPACES
+        self.enabled = NEAR_CACHE_ENABLED if enabled is None else enabled
+        self._clock = clock
+        self._entries: "OrderedDict[str, Tuple[bytes, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._active = False
+        # Bumped on every invalidation; a fill started before one is discarded
+        self._epoch = 0
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._invalidations = 0
+
+    @staticmethod
+    def namespace(key: str) -> str:
+        return key.split(":", 1)[0]
+
+    def handles(self, key: str) -> bool:
+        """Whether writes to this key must be broadcast (configured namespace)"""
+        return self.enabled and self.namespace(key) in self.namespace_ttls
+
+    @property
+    def active(self) -> bool:
+        return self._active
+
+    def set_active(self, active: bool) -> None:
+        """Serve entries only while invalidations are being received"""
+        with self._lock:
+            self._active = bool(active) and self.enabled
+            self._entries.clear()
+            self._epoch += 1
+
+    def get(self, key: str) -> Tuple[Optional[bytes], Optional[int]]:
+        """(cached bytes, None) on a hit; (None, fill token) on a miss; (None, None) if not cached here"""
+        if not self._active or not self.handles(key):
+            return None, None
+        with self._lock:
+            stats = self._stats.setdefault(self.namespace(key), {"hits": 0, "misses": 0})
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > self._clock():
+                self._entries.move_to_end(key)
+                stats["hits"] += 1
+                return entry[0], None
+            if entry is not None:
+                del self._entries[key]
+            stats["misses"] += 1
+            return None, self._epoch
+
+    def put(self, key: str, data: bytes, token: Optional[int] = None, expire: Optional[float] = None) -> None:
+        """Cache bytes read (with the token from get) or just written (expire = Redis TTL)"""
+        if not self._active or not self.handles(key) or data is None:
+            return
+        ttl = self.namespace_ttls[self.namespace(key)]
+        if expire is not None:
+            ttl = min(ttl, expire)
+        with self._lock:
+            if token is not None and token != self._epoch:
+                return
+            self._entries[key] = (data, self._clock() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, keys: Iterable[str] = (), patterns: Iterable[str] = ()) -> int:
+        """Drop keys and glob patterns, returns how many entries were removed"""
+        patterns = list(patterns)
+        with self._lock:
+            self._epoch += 1
+            self._invalidations += 1
+            removed = 0
+            for key in keys:
+                if self._entries.pop(key, None) is not None:
+                    removed += 1
+            if patterns:
+                for key in [k for k in self._entries if any(fnmatch.fnmatchcase(k, p) for p in patterns)]:
+                    del self._entries[key]
+                    removed += 1
+            return removed
+
+    def stats(self) -> Dict:
+        with self._lock:
+            namespaces = {}
+            for namespace, counts in self._stats.items():
+                lookups = counts["hits"] + counts["misses"]
+                namespaces[namespace] = {**counts, "hit_rate": round(counts["hits"] / lookups, 4) if lookups else 0.0}
+            return {
+                "enabled": self.enabled,
+                "active": self._active,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "invalidations": self._invalidations,
+                "ttl_caps": dict(self.namespace_ttls),
+                "namespaces": namespaces,
+            }
+
+
+# Shared by the sync and async caches of this process
+near_cache = NearCache()
@@ -1,32 +1,193 @@
 import redis
-import pickle
+import redis.asyncio as redis_asyncio
 import json
 import os
-from typing import Any, Optional, Dict, List
+import re
+import socket
+import uuid
+from typing import Any, Optional, Dict, List, Iterable, Iterator
 from loguru import logger
 from datetime import timedelta
 
-class RedisCache:
-    """Redis cache manager for the application"""
+from . import cache_codec
+from .near_cache import near_cache
+
+# Cache database (DB 0 is Celery's) and the connection pool shared by every operation in a process
+REDIS_CACHE_URL = os.getenv("REDIS_CACHE_URL", os.getenv("REDIS_URL", "redis://localhost:6379/1"))
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", "5"))
+REDIS_SOCKET_CONNECT_TIMEOUT = float(os.getenv("REDIS_SOCKET_CONNECT_TIMEOUT", "2"))
+REDIS_HEALTH_CHECK_INTERVAL = int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", "30"))
+
+# SCAN page size and UNLINK batch size for pattern operations (never KEYS on the shared instance)
+SCAN_COUNT = int(os.getenv("REDIS_SCAN_COUNT", "500"))
+UNLINK_BATCH_SIZE = int(os.getenv("REDIS_UNLINK_BATCH_SIZE", "500"))
+# Track each user's keys in a Redis set at write time so per-user clears are O(user's keys)
+USER_KEY_INDEX = os.getenv("REDIS_USER_KEY_INDEX", "true").lower() in ("1", "true", "yes")
+USER_KEY_INDEX_TTL = int(os.getenv("REDIS_USER_KEY_INDEX_TTL", str(7 * 24 * 3600)))
+
+# Hash of raw vs stored value bytes per key namespace, updated in the same pipeline as each write
+CODEC_STATS = os.getenv("REDIS_CODEC_STATS", "true").lower() in ("1", "true", "yes")
+CODEC_STATS_KEY = "cache_codec_stats"
+
+# Pub/sub channel for cross-process invalidation (see app.services.cache_invalidation) and the
+# id that lets this process skip its own messages
+INVALIDATION_CHANNEL = "cache_invalidation"
+PROCESS_ORIGIN = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+# "<namespace>:user:<id>:..." - the user segment of a key or of a pattern with a literal id
+_USER_SEGMENT = re.compile(r"(?:^|:)user:(\d+)(?::|$)")
+
+def _pool_options() -> Dict:
+    return {
+        "max_connections": REDIS_MAX_CONNECTIONS,
+        "socket_timeout": REDIS_SOCKET_TIMEOUT,
+        "socket_connect_timeout": REDIS_SOCKET_CONNECT_TIMEOUT,
+        "health_check_interval": REDIS_HEALTH_CHECK_INTERVAL,
+        "retry_on_timeout": True,
+    }
+
+class _CacheKeyspace:
+    """Key naming, value encoding and user key index shared by the sync and async caches"""
+    
+    @staticmethod
+    def _decode(value: bytes, as_json: bool) -> Any:
+        """Decode a stored value; as_json picks how pre-codec (headerless) entries are read"""
+        return cache_codec.decode(value, legacy="json" if as_json else "pickle")
     
-    def __init__(self):
-        self.redis_client = redis.Redis.from_url(
-            os.getenv("REDIS_CACHE_URL", os.getenv("REDIS_URL", "redis://localhost:6379/1")),  # Use DB 1 for cache (DB 0 for Celery)
-            decode_responses=False  # Keep as bytes for pickle
-        )
-        
     def _prefix_key(self, key: str) -> str:
         """Add application prefix to all keys to prevent collisions with other applications"""
         app_prefix = os.getenv("REDIS_KEY_PREFIX", "social_api")
         return f"{app_prefix}:{key}"
         
+    def _user_index_key(self, user_id) -> str:
+        return self._prefix_key(f"keyindex:user:{user_id}")
+    
+    def _user_of(self, key: str) -> Optional[str]:
+        """User id owning a (non-prefixed) key or pattern, if it is user-scoped"""
+        match = _USER_SEGMENT.search(key)
+        return match.group(1) if match else None
+    
+    def _track(self, pipe, key: str, expire: int) -> None:
+        """Add a key written in this pipeline to its user's key index"""
+        user_id = self._user_of(key) if USER_KEY_INDEX else None
+        if user_id is not None:
+            index_key = self._user_index_key(user_id)
+            pipe.sadd(index_key, self._prefix_key(key))
+            pipe.expire(index_key, max(expire, USER_KEY_INDEX_TTL))
+    
+    def _count_bytes(self, pipe, key: str, raw_size: int, stored_size: int) -> None:
+        if CODEC_STATS:
+            namespace = key.split(":", 1)[0]
+            stats_key = self._prefix_key(CODEC_STATS_KEY)
+            pipe.hincrby(stats_key, f"{namespace}:raw_bytes", raw_size)
+            pipe.hincrby(stats_key, f"{namespace}:stored_bytes", stored_size)
+    
+    def _queue_set(self, pipe, key: str, value: Any, expire: int) -> None:
+        """Queue an encoded SETEX plus key index, codec stats and near-cache bookkeeping"""
+        data, raw_size = cache_codec.encode(value)
+        pipe.setex(self._prefix_key(key), expire, data)
+        self._track(pipe, key, expire)
+        self._count_bytes(pipe, key, raw_size, len(data))
+        self._queue_invalidate(pipe, keys=[key])
+    
+    def _queue_unlink(self, pipe, keys: List[str]) -> None:
+        """Queue UNLINK of (non-prefixed) keys plus their removal from the user key indexes"""
+        pipe.unlink(*[self._prefix_key(key) for key in keys])
+        for key in keys:
+            user_id = self._user_of(key) if USER_KEY_INDEX else None
+            if user_id is not None:
+                pipe.srem(self._user_index_key(user_id), self._prefix_key(key))
+        self._queue_invalidate(pipe, keys=keys)
+    
+    def _queue_invalidate(self, pipe, keys: Iterable[str] = (), patterns: Iterable[str] = ()) -> None:
+        """Drop near-cached keys/patterns here and queue the broadcast to other processes"""
+        keys = [key for key in keys if near_cache.handles(key)]
+        patterns = [pattern for pattern in patterns
+                    if near_cache.enabled and (near_cache.handles(pattern) or "*" in near_cache.namespace(pattern))]
+        if not keys and not patterns:
+            return
+        near_cache.invalidate(keys, patterns)
+        message = {"kind": "cache_keys", "origin": PROCESS_ORIGIN, "keys": keys, "patterns": patterns}
+        pipe.publish(self._prefix_key(INVALIDATION_CHANNEL), json.dumps(message))
+    
+    @staticmethod
+    def _near_lookup(keys: List[str]):
+        """Split keys into near-cache hits {key: bytes} and misses with their fill tokens"""
+        found, tokens = {}, {}
+        for key in keys:
+            data, token = near_cache.get(key)
+            if data is not None:
+                found[key] = data
+            else:
+                tokens[key] = token
+        return found, tokens
+    
+    @staticmethod
+    def _near_fill(tokens: Dict[str, Optional[int]], values: List[Optional[bytes]]) -> None:
+        for (key, token), data in zip(tokens.items(), values):
+            if token is not None and data:
+                near_cache.put(key, data, token)
+
+class RedisCache(_CacheKeyspace):
+    """Redis cache manager for the application"""
+    
+    def __init__(self):
+        self.pool = redis.ConnectionPool.from_url(REDIS_CACHE_URL, **_pool_options())
+        self.redis_client = redis.Redis(connection_pool=self.pool)  # bytes responses (cache_codec)
+    
+    def _read(self, key: str) -> Optional[bytes]:
+        """Stored bytes of a key, from the near-cache when possible"""
+        found, tokens = self._near_lookup([key])
+        if found:
+            return found[key]
+        data = self.redis_client.get(self._prefix_key(key))
+        self._near_fill(tokens, [data])
+        return data
+    
+    def _read_many(self, keys: List[str]) -> Dict[str, Optional[bytes]]:
+        found, tokens = self._near_lookup(keys)
+        if tokens:
+            values = self.redis_client.mget([self._prefix_key(key) for key in tokens])
+            self._near_fill(tokens, values)
+            found.update(zip(tokens, values))
+        return found
+    
+    def _broadcast_invalidation(self, keys: Iterable[str] = (), patterns: Iterable[str] = ()) -> None:
+        pipe = self.redis_client.pipeline(transaction=False)
+        self._queue_invalidate(pipe, keys, patterns)
+        if len(pipe):
+            pipe.execute()
+    
+    def _write(self, key: str, value: Any, expire: int) -> bool:
+        """Encoded SETEX plus bookkeeping in one round trip"""
+        pipe = self.redis_client.pipeline(transaction=False)
+        self._queue_set(pipe, key, value, expire)
+        return bool(pipe.execute()[0])
+    
+    def scan_keys(self, prefixed_pattern: str) -> Iterator[bytes]:
+        """Incrementally iterate keys matching an already-prefixed pattern (SCAN, non-blocking)"""
+        return self.redis_client.scan_iter(match=prefixed_pattern, count=SCAN_COUNT)
+    
+    def unlink_keys(self, keys: Iterable) -> int:
+        """UNLINK keys in batches (memory is reclaimed off the main Redis thread)"""
+        removed = 0
+        batch = []
+        for key in keys:
+            batch.append(key)
+            if len(batch) >= UNLINK_BATCH_SIZE:
+                removed += self.redis_client.unlink(*batch)
+                batch = []
+        if batch:
+            removed += self.redis_client.unlink(*batch)
+        return removed
+    
     def get(self, key: str) -> Optional[Any]:
         """Get value from cache"""
         try:
-            prefixed_key = self._prefix_key(key)
-            value = self.redis_client.get(prefixed_key)
+            value = self._read(key)
             if value:
-                return pickle.loads(value)
+                return self._decode(value, as_json=False)
             return None
         except Exception as e:
             logger.error(f"Error getting from cache: {e}")
@@ -35,9 +196,7 @@ class RedisCache:
     def set(self, key: str, value: Any, expire: int = 3600) -> bool:
         """Set value in cache with expiration (default 1 hour)"""
         try:
-            prefixed_key = self._prefix_key(key)
-            pickled_value = pickle.dumps(value)
-            return self.redis_client.setex(prefixed_key, expire, pickled_value)
+            return self._write(key, value, expire)
         except Exception as e:
             logger.error(f"Error setting cache: {e}")
             return False
@@ -45,8 +204,9 @@ class RedisCache:
     def delete(self, key: str) -> bool:
         """Delete key from cache"""
         try:
-            prefixed_key = self._prefix_key(key)
-            return bool(self.redis_client.delete(prefixed_key))
+            pipe = self.redis_client.pipeline(transaction=False)
+            self._queue_unlink(pipe, [key])
+            return bool(pipe.execute()[0])
         except Exception as e:
             logger.error(f"Error deleting from cache: {e}")
             return False
@@ -63,10 +223,9 @@ class RedisCache:
     def get_json(self, key: str) -> Optional[Dict]:
         """Get JSON value from cache"""
         try:
-            prefixed_key = self._prefix_key(key)
-            value = self.redis_client.get(prefixed_key)
+            value = self._read(key)
             if value:
-                return json.loads(value.decode('utf-8'))
+                return self._decode(value, as_json=True)
             return None
         except Exception as e:
             logger.error(f"Error getting JSON from cache: {e}")
@@ -75,21 +234,200 @@ class RedisCache:
     def set_json(self, key: str, value: Dict, expire: int = 3600) -> bool:
         """Set JSON value in cache"""
         try:
-            prefixed_key = self._prefix_key(key)
-            json_value = json.dumps(value)
-            return self.redis_client.setex(prefixed_key, expire, json_value)
+            return self._write(key, value, expire)
         except Exception as e:
             logger.error(f"Error setting JSON cache: {e}")
             return False
     
+    def get_many(self, keys: List[str], as_json: bool = False) -> Dict[str, Any]:
+        """Values of several keys in one MGET round trip (missing keys are omitted; as_json as in _decode)"""
+        if not keys:
+            return {}
+        try:
+            values = self._read_many(keys)
+            return {key: self._decode(value, as_json) for key, value in values.items() if value}
+        except Exception as e:
+            logger.error(f"Error getting many from cache: {e}")
+            return {}
+    
+    def set_many(self, mapping: Dict[str, Any], expire: int = 3600) -> bool:
+        """Set several values with the same expiration in one pipelined round trip"""
+        if not mapping:
+            return True
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for key, value in mapping.items():
+                self._queue_set(pipe, key, value, expire)
+            pipe.execute()
+            return True
+        except Exception as e:
+            logger.error(f"Error setting many in cache: {e}")
+            return False
+    
+    def delete_many(self, keys: List[str]) -> int:
+        """Delete several keys in one round trip, returns how many existed"""
+        if not keys:
+            return 0
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            self._queue_unlink(pipe, list(keys))
+            return pipe.execute()[0]
+        except Exception as e:
+            logger.error(f"Error deleting many from cache: {e}")
+            return 0
+    
+    def push_json_capped(self, key: str, value: Dict, max_length: int, expire: int = 3600) -> bool:
+        """Prepend a JSON value to a list, keeping only the newest max_length items"""
+        try:
+            prefixed_key = self._prefix_key(key)
+            data, raw_size = cache_codec.encode(value)
+            pipe = self.redis_client.pipeline()
+            pipe.lpush(prefixed_key, data)
+            pipe.ltrim(prefixed_key, 0, max_length - 1)
+            pipe.expire(prefixed_key, expire)
+            self._track(pipe, key, expire)
+            self._count_bytes(pipe, key, raw_size, len(data))
+            pipe.execute()
+            return True
+        except Exception as e:
+            logger.error(f"Error pushing JSON list item: {e}")
+            return False
+    
+    def get_json_list(self, key: str) -> List[Dict]:
+        """All JSON values of a list, newest first"""
+        try:
+            values = self.redis_client.lrange(self._prefix_key(key), 0, -1)
+            return [self._decode(value, as_json=True) for value in values]
+        except Exception as e:
+            logger.error(f"Error getting JSON list: {e}")
+            return []
+    
+    def incr_counter(self, key: str, field: str, amount: int = 1) -> int:
+        """Increment a counter field of a hash (stats shared by all processes)"""
+        try:
+            return self.redis_client.hincrby(self._prefix_key(key), field, amount)
+        except Exception as e:
+            logger.debug(f"Error incrementing counter {key}.{field}: {e}")
+            return 0
+    
+    def get_counters(self, key: str) -> Dict[str, int]:
+        """All counter fields of a hash"""
+        try:
+            values = self.redis_client.hgetall(self._prefix_key(key))
+            return {k.decode('utf-8'): int(v) for k, v in values.items()}
+        except Exception as e:
+            logger.error(f"Error getting counters {key}: {e}")
+            return {}
+    
+    def hset_json(self, key: str, field: str, value: Dict, expire: int = 3600) -> bool:
+        """Set a JSON value in a hash field (the hash expires expire seconds after the last write)"""
+        try:
+            prefixed_key = self._prefix_key(key)
+            pipe = self.redis_client.pipeline()
+            pipe.hset(prefixed_key, field, json.dumps(value, default=str))
+            pipe.expire(prefixed_key, expire)
+            self._track(pipe, key, expire)
+            pipe.execute()
+            return True
+        except Exception as e:
+            logger.error(f"Error setting hash field {key}.{field}: {e}")
+            return False
+    
+    def hget_json_all(self, key: str) -> Dict[str, Dict]:
+        """All JSON values of a hash by field"""
+        try:
+            values = self.redis_client.hgetall(self._prefix_key(key))
+            return {k.decode('utf-8'): json.loads(v.decode('utf-8')) for k, v in values.items()}
+        except Exception as e:
+            logger.error(f"Error getting hash {key}: {e}")
+            return {}
+    
+    def hdel(self, key: str, *fields: str) -> int:
+        try:
+            return self.redis_client.hdel(self._prefix_key(key), *fields) if fields else 0
+        except Exception as e:
+            logger.error(f"Error deleting hash fields of {key}: {e}")
+            return 0
+    
+    # Streams (work queues). Unlike the cache methods these raise on Redis errors, so
+    # producers can fall back and consumers can back off.
+    
+    def stream_add(self, stream: str, message: Dict) -> str:
+        """Append a JSON message to a stream, returns its entry id"""
+        entry_id = self.redis_client.xadd(self._prefix_key(stream), {"data": json.dumps(message, default=str)})
+        return entry_id.decode('utf-8')
+    
+    def stream_create_group(self, stream: str, group: str) -> None:
+        """Create a consumer group (and the stream) if it does not exist yet"""
+        try:
+            self.redis_client.xgroup_create(self._prefix_key(stream), group, id="0", mkstream=True)
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+    
+    def hkeys(self, key: str) -> set:
+        """Field names of a hash"""
+        return {field.decode('utf-8') for field in self.redis_client.hkeys(self._prefix_key(key))}
+    
+    @staticmethod
+    def _stream_entries(entries) -> List[tuple]:
+        return [(entry_id.decode('utf-8'), json.loads(fields[b"data"].decode('utf-8')))
+                for entry_id, fields in entries if fields]
+    
+    def stream_read_group(self, stream: str, group: str, consumer: str, count: int, block_ms: int) -> List[tuple]:
+        """New (entry id, message) pairs for this consumer, blocking up to block_ms"""
+        response = self.redis_client.xreadgroup(group, consumer, {self._prefix_key(stream): ">"},
+                                                count=count, block=block_ms)
+        return self._stream_entries(response[0][1]) if response else []
+    
+    def stream_claim_stale(self, stream: str, group: str, consumer: str, min_idle_ms: int, count: int) -> List[tuple]:
+        """Take over entries another consumer read but never acknowledged (crashed mid-batch)"""
+        response = self.redis_client.xautoclaim(self._prefix_key(stream), group, consumer,
+                                                min_idle_time=min_idle_ms, start_id="0-0", count=count)
+        return self._stream_entries(response[1])
+    
+    def stream_ack(self, stream: str, group: str, entry_ids: List[str]) -> None:
+        """Acknowledge processed entries and remove them from the stream"""
+        if not entry_ids:
+            return
+        prefixed_stream = self._prefix_key(stream)
+        pipe = self.redis_client.pipeline()
+        pipe.xack(prefixed_stream, group, *entry_ids)
+        pipe.xdel(prefixed_stream, *entry_ids)
+        pipe.execute()
+    
+    def get_codec_stats(self) -> Dict[str, Dict]:
+        """Raw vs stored bytes written per key namespace, and how much the codec saved"""
+        try:
+            counters = self.get_counters(CODEC_STATS_KEY)
+            stats = {}
+            for field, value in counters.items():
+                namespace, _, metric = field.rpartition(":")
+                stats.setdefault(namespace, {"raw_bytes": 0, "stored_bytes": 0})[metric] = value
+            for entry in stats.values():
+                entry["saved_bytes"] = entry["raw_bytes"] - entry["stored_bytes"]
+                entry["ratio"] = round(entry["stored_bytes"] / entry["raw_bytes"], 4) if entry["raw_bytes"] else 1.0
+            return stats
+        except Exception as e:
+            logger.error(f"Error getting codec stats: {e}")
+            return {}
+    
     def clear_pattern(self, pattern: str) -> int:
-        """Clear all keys matching pattern"""
+        """Clear all keys matching pattern (user-scoped patterns use the user's key index)"""
         try:
             prefixed_pattern = self._prefix_key(pattern)
-            keys = self.redis_client.keys(prefixed_pattern)
-            if keys:
-                return self.redis_client.delete(*keys)
-            return 0
+            self._broadcast_invalidation(patterns=[pattern])
+            user_id = self._user_of(pattern) if USER_KEY_INDEX else None
+            if user_id is None:
+                return self.unlink_keys(self.scan_keys(prefixed_pattern))
+            
+            index_key = self._user_index_key(user_id)
+            keys = list(self.redis_client.sscan_iter(index_key, match=prefixed_pattern, count=SCAN_COUNT))
+            if not keys:
+                return 0
+            removed = self.unlink_keys(keys)
+            self.redis_client.srem(index_key, *keys)
+            return removed
         except Exception as e:
             logger.error(f"Error clearing pattern {pattern}: {e}")
             return 0
@@ -97,20 +435,44 @@ class RedisCache:
     def get_user_keys(self, user_id: int) -> List[str]:
         """Get all keys for a specific user"""
         try:
-            user_pattern = self._prefix_key(f"*:user:{user_id}:*")
-            keys = self.redis_client.keys(user_pattern)
-            return [k.decode('utf-8') for k in keys] if keys else []
+            if not USER_KEY_INDEX:
+                keys = self.scan_keys(self._prefix_key(f"*:user:{user_id}:*"))
+                return [k.decode('utf-8') for k in keys]
+            
+            index_key = self._user_index_key(user_id)
+            members = list(self.redis_client.sscan_iter(index_key, count=SCAN_COUNT))
+            if not members:
+                return []
+            # Drop index entries whose keys have since expired
+            pipe = self.redis_client.pipeline(transaction=False)
+            for member in members:
+                pipe.exists(member)
+            alive = pipe.execute()
+            expired = [member for member, exists in zip(members, alive) if not exists]
+            if expired:
+                self.redis_client.srem(index_key, *expired)
+            return [member.decode('utf-8') for member, exists in zip(members, alive) if exists]
         except Exception as e:
             logger.error(f"Error getting user keys: {e}")
             return []
     
-    def clear_user_data(self, user_id: int) -> int:
-        """Clear all data for a specific user (for GDPR/privacy)"""
+    def clear_user_data(self, user_id: int, full_scan: bool = False) -> int:
+        """
+        Clear all data for a specific user (for GDPR/privacy)
+        
+        With the key index this touches only the user's own keys; full_scan additionally
+        SCANs the keyspace for keys written before the index was enabled.
+        """
         try:
-            user_keys = self.get_user_keys(user_id)
-            if user_keys:
-                return self.redis_client.delete(*user_keys)
-            return 0
+            removed = 0
+            self._broadcast_invalidation(patterns=[f"*:user:{user_id}:*"])
+            if USER_KEY_INDEX:
+                index_key = self._user_index_key(user_id)
+                removed += self.unlink_keys(self.redis_client.sscan_iter(index_key, count=SCAN_COUNT))
+                self.redis_client.unlink(index_key)
+            if full_scan or not USER_KEY_INDEX:
+                removed += self.unlink_keys(self.scan_keys(self._prefix_key(f"*:user:{user_id}:*")))
+            return removed
         except Exception as e:
             logger.error(f"Error clearing user data: {e}")
             return 0
@@ -119,18 +481,38 @@ class RedisCache:
         """Get cache statistics"""
         try:
             info = self.redis_client.info('memory')
-            # Get all keys with our application prefix
-            all_keys = self.redis_client.keys(self._prefix_key("*"))
+            # Count our keys with SCAN so a large keyspace never blocks the server
+            total_keys = sum(1 for _ in self.scan_keys(self._prefix_key("*")))
             
             return {
                 'used_memory': info.get('used_memory_human', 'N/A'),
-                'total_keys': len(all_keys),
+                'total_keys': total_keys,
+                'codec': self.get_codec_stats(),
+                'near_cache': near_cache.stats(),
                 'connected': True
             }
         except Exception as e:
             logger.error(f"Error getting cache info: {e}")
             return {'connected': False, 'error': str(e)}
             
+    def lock(self, name: str, timeout: int = 600, blocking_timeout: Optional[float] = None):
+        """Distributed lock shared by the API and Celery processes (use as a context manager)"""
+        return self.redis_client.lock(self._prefix_key(f"lock:{name}"), timeout=timeout, blocking_timeout=blocking_timeout)
+            
+    def publish(self, channel: str, message: Dict) -> int:
+        """Publish a JSON message on an application-prefixed pub/sub channel"""
+        try:
+            return self.redis_client.publish(self._prefix_key(channel), json.dumps(message, default=str))
+        except Exception as e:
+            logger.error(f"Error publishing to {channel}: {e}")
+            return 0
+    
+    def pubsub(self, *channels: str):
+        """PubSub subscribed to application-prefixed channels (subscribe confirmations are skipped)"""
+        pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(*[self._prefix_key(channel) for channel in channels])
+        return pubsub
+            
     def health_check(self) -> bool:
         """Check if Redis is reachable and working"""
         try:
@@ -139,5 +521,107 @@ class RedisCache:
             logger.error(f"Redis health check failed: {e}")
             return False
 
-# Global cache instance
+class AsyncRedisCache(_CacheKeyspace):
+    """asyncio variant of RedisCache for async routes (same keys, encodings and key index)"""
+    
+    def __init__(self):
+        self.pool = redis_asyncio.ConnectionPool.from_url(REDIS_CACHE_URL, **_pool_options())
+        self.redis_client = redis_asyncio.Redis(connection_pool=self.pool)
+    
+    async def _read_many(self, keys: List[str]) -> Dict[str, Optional[bytes]]:
+        found, tokens = self._near_lookup(keys)
+        if tokens:
+            values = await self.redis_client.mget([self._prefix_key(key) for key in tokens])
+            self._near_fill(tokens, values)
+            found.update(zip(tokens, values))
+        return found
+    
+    async def get(self, key: str, as_json: bool = False) -> Optional[Any]:
+        try:
+            value = (await self._read_many([key])).get(key)
+            return self._decode(value, as_json) if value else None
+        except Exception as e:
+            logger.error(f"Error getting from cache: {e}")
+            return None
+    
+    async def set(self, key: str, value: Any, expire: int = 3600) -> bool:
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            self._queue_set(pipe, key, value, expire)
+            return bool((await pipe.execute())[0])
+        except Exception as e:
+            logger.error(f"Error setting cache: {e}")
+            return False
+    
+    async def get_json(self, key: str) -> Optional[Dict]:
+        return await self.get(key, as_json=True)
+    
+    async def set_json(self, key: str, value: Dict, expire: int = 3600) -> bool:
+        return await self.set(key, value, expire)
+    
+    async def delete(self, key: str) -> bool:
+        return bool(await self.delete_many([key]))
+    
+    async def exists(self, key: str) -> bool:
+        try:
+            return bool(await self.redis_client.exists(self._prefix_key(key)))
+        except Exception as e:
+            logger.error(f"Error checking cache existence: {e}")
+            return False
+    
+    async def get_many(self, keys: List[str], as_json: bool = False) -> Dict[str, Any]:
+        if not keys:
+            return {}
+        try:
+            values = await self._read_many(keys)
+            return {key: self._decode(value, as_json) for key, value in values.items() if value}
+        except Exception as e:
+            logger.error(f"Error getting many from cache: {e}")
+            return {}
+    
+    async def set_many(self, mapping: Dict[str, Any], expire: int = 3600) -> bool:
+        if not mapping:
+            return True
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for key, value in mapping.items():
+                self._queue_set(pipe, key, value, expire)
+            await pipe.execute()
+            return True
+        except Exception as e:
+            logger.error(f"Error setting many in cache: {e}")
+            return False
+    
+    async def delete_many(self, keys: List[str]) -> int:
+        if not keys:
+            return 0
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            self._queue_unlink(pipe, list(keys))
+            return (await pipe.execute())[0]
+        except Exception as e:
+            logger.error(f"Error deleting many from cache: {e}")
+            return 0
+    
+    async def incr_counter(self, key: str, field: str, amount: int = 1) -> int:
+        try:
+            return await self.redis_client.hincrby(self._prefix_key(key), field, amount)
+        except Exception as e:
+            logger.debug(f"Error incrementing counter {key}.{field}: {e}")
+            return 0
+    
+    async def health_check(self) -> bool:
+        try:
+            return await self.redis_client.ping()
+        except Exception as e:
+            logger.error(f"Redis health check failed: {e}")
+            return False
+    
+    async def aclose(self) -> None:
+        """Close the pool's connections (application shutdown)"""
+        await self.redis_client.aclose()
+        await self.pool.aclose()
+
+# Global cache instances
 cache = RedisCache()
+async_cache = AsyncRedisCache()
@@ -1,15 +1,18 @@
 from celery import current_task
 from .celery_app import celery_app
 from .app.services.rag_service import DocumentProcessor
-from .app.services.dual_embedding_manager import DualEmbeddingManager
+from .app.services.dual_embedding_manager import DualEmbeddingManager, EMBEDDING_BATCH_SIZE
 from .app.services.task_service import TaskService
+from .app.services.document_store import DocumentStore
+from .app.services.user_vector_index import UserVectorIndex
+from .app.services.rag_handler import clear_user_cache
 from .database_connection import get_db_connection
 from .vector_store_db import save_vector_store_path
 from loguru import logger
 import os
 
 @celery_app.task(bind=True)
-def process_pdf_task(self, user_id: int, file_path: str, filename: str):
+def process_pdf_task(self, user_id: int, file_path: str, filename: str, content_hash: str = None):
     """Enhanced Celery task with language support and improved caching"""
     task_id = self.request.id
     
@@ -30,43 +33,41 @@ def process_pdf_task(self, user_id: int, file_path: str, filename: str):
         
         processor = DocumentProcessor()
         
-        # Update progress - Loading PDF with language detection
-        logger.info("Loading and extracting text from PDF with language detection...")
+        # Update progress - Streaming extract -> split -> embed
+        logger.info("Streaming PDF text through language detection, splitting and embedding...")
         self.update_state(state='PROCESSING', meta={'message': 'Loading and extracting text from PDF...'})
         TaskService.update_task_status(task_id, 'processing', 'Loading and extracting text from PDF...')
         
-        # Enhanced PDF processing with language detection
         # Extract filename from file_path if not provided
         if not filename:
             filename = os.path.basename(file_path)
         
-        page_texts, language = processor.process_pdf(file_path, filename)
-        total_chars = sum(len(page['text']) for page in page_texts)
-        logger.info(f"PDF text extracted successfully - {total_chars} characters from {len(page_texts)} pages, Language: {language}")
+        def report_progress(message):
+            self.update_state(state='PROCESSING', meta={'message': message})
+            TaskService.update_task_status(task_id, 'processing', message)
         
-        # Update progress - Language-aware text splitting
-        logger.info(f"Splitting {language} text into chunks...")
-        self.update_state(state='PROCESSING', meta={'message': f'Splitting {language} text into chunks...'})
-        TaskService.update_task_status(task_id, 'processing', f'Splitting {language} text into chunks...')
-        chunks_with_metadata = processor.split_text_with_metadata(page_texts, language)
-        logger.info(f"Text split into {len(chunks_with_metadata)} chunks for {language} processing")
-        
-        # Update progress - Creating language-specific embeddings
-        logger.info(f"Creating {language} embeddings...")
-        self.update_state(state='PROCESSING', meta={'message': f'Creating {language} embeddings...'})
-        TaskService.update_task_status(task_id, 'processing', f'Creating {language} embeddings...')
-        vector_store = processor.create_vector_store_with_metadata(chunks_with_metadata, language)
-        logger.info(f"Vector store created with {vector_store.index.ntotal} vectors using {language} embeddings")
+        # Pages flow into the language-aware splitter and chunks are embedded in bounded batches
+        vector_store, language, ingest_stats = processor.stream_vector_store(
+            file_path, filename, progress_callback=report_progress
+        )
+        logger.info(f"Vector store created with {vector_store.index.ntotal} vectors using {language} embeddings "
+                    f"({ingest_stats['pages']} pages, {ingest_stats['chunks']} chunks, {ingest_stats['batches']} batches)")
+
+        # Get embedding model name for saving
+        embedding_model = DualEmbeddingManager.MODELS[language]  # Use class attribute
 
-        vector_store_dir = os.path.join(processor.vector_store_dir, f"user_{user_id}")
-        os.makedirs(vector_store_dir, exist_ok=True)
+        # Content-addressed uploads get a shared vector store, legacy calls keep the per-user one
+        if content_hash:
+            vector_store_path = DocumentStore.get_vector_store_path(content_hash, embedding_model)
+        else:
+            vector_store_path = os.path.join(processor.vector_store_dir, f"user_{user_id}", "current_pdf")
+        os.makedirs(os.path.dirname(vector_store_path), exist_ok=True)
         
         # Update progress - Saving vector store
         logger.info(f"Saving {language} vector store...")
         self.update_state(state='PROCESSING', meta={'message': 'Saving vector store...'})
         TaskService.update_task_status(task_id, 'processing', 'Saving vector store...')
         
-        vector_store_path = os.path.join(vector_store_dir, "current_pdf")
         vector_store.save_local(vector_store_path, index_name="index")
         
         if not os.path.exists(os.path.join(vector_store_path, "index.faiss")):
@@ -79,18 +80,35 @@ def process_pdf_task(self, user_id: int, file_path: str, filename: str):
         self.update_state(state='PROCESSING', meta={'message': 'Finalizing...'})
         TaskService.update_task_status(task_id, 'processing', 'Finalizing...')
 
-        # Get embedding model name for saving
-        embedding_model = DualEmbeddingManager.MODELS[language]  # Use class attribute
-
-        with get_db_connection() as conn:
-            save_vector_store_path(conn, user_id, vector_store_path, language, embedding_model)
+        index_info = {}
+        if content_hash:
+            # Register the shared document and append its vectors to the user's incremental index
+            shared_document = {
+                'content_hash': content_hash,
+                'embedding_model': embedding_model,
+                'language': language,
+                'file_path': DocumentStore.get_upload_path(content_hash),
+                'vector_store_path': vector_store_path
+            }
+            index_info = UserVectorIndex.add_document(
+                user_id, shared_document, filename, source_store=vector_store, register=True
+            )
+            # Referenced now, so the content-addressed copy is safe from garbage collection
+            DocumentStore.adopt_upload(file_path, content_hash)
+        else:
+            with get_db_connection() as conn:
+                save_vector_store_path(conn, user_id, vector_store_path, language, embedding_model)
+        # Evicts the previous index in this and every API process
+        clear_user_cache(user_id, index_info.get('generation'))
 
         # Mark task as completed
         TaskService.update_task_status(task_id, 'completed', f'{language.title()} PDF processed successfully')
 
         logger.info(f"{language.title()} PDF processing completed successfully for user {user_id}")
-        logger.info(f"Final stats: {vector_store.index.ntotal} vectors, {len(chunks_with_metadata)} chunks, Language: {language}")
+        logger.info(f"Final stats: {vector_store.index.ntotal} vectors, {ingest_stats['chunks']} chunks, Language: {language}")
         logger.info(f"Embedding model used: {embedding_model}")
+        logger.info(f"Embedding cache: {ingest_stats['cache_hits']} hits, {ingest_stats['cache_misses']} misses")
+        logger.info(f"Embedding throughput: {ingest_stats['chunks_per_second']} chunks/s (batch size {EMBEDDING_BATCH_SIZE})")
 
         return {
             'status': 'completed',
@@ -98,7 +116,19 @@ def process_pdf_task(self, user_id: int, file_path: str, filename: str):
             'vector_count': vector_store.index.ntotal,
             'language': language,
             'embedding_model': embedding_model,
-            'chunks_count': len(chunks_with_metadata)
+            'chunks_count': ingest_stats['chunks'],
+            'document_id': index_info.get('document_id'),
+            'generation': index_info.get('generation'),
+            'embedding_cache': {
+                'hits': ingest_stats['cache_hits'],
+                'misses': ingest_stats['cache_misses']
+            },
+            'embedding_throughput': {
+                'encoded_chunks': ingest_stats['encoded_chunks'],
+                'encode_seconds': round(ingest_stats['encode_seconds'], 3),
+                'chunks_per_second': ingest_stats['chunks_per_second'],
+                'batch_size': EMBEDDING_BATCH_SIZE
+            }
         }
         
     except Exception as e:
@@ -112,6 +142,13 @@ def process_pdf_task(self, user_id: int, file_path: str, filename: str):
         except Exception as db_error:
             logger.error(f"Failed to update task status: {db_error}")
         
+        # Drop this task's staged upload (never the shared content-addressed file)
+        if content_hash:
+            try:
+                DocumentStore.discard_upload(file_path)
+            except Exception as cleanup_error:
+                logger.warning(f"Failed to discard upload: {cleanup_error}")
+        
         # Update Celery state with proper format
         self.update_state(
             state='FAILURE',
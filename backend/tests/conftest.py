@@ -2,4 +2,16 @@ import pytest
 
 @pytest.fixture(scope='session')
 def pdf_file_path():
-    return 'D:\\FastAPI\\social_media_api\\backend\\uploads\\user_17\\20250909212431_kv_resume_iter_2 (1).pdf'
\ No newline at end of file
+    return 'D:\\FastAPI\\social_media_api\\backend\\uploads\\user_17\\20250909212431_kv_resume_iter_2 (1).pdf'
+
+class FakeClock:
+    """Monotonic clock stand-in: tests advance time by setting now"""
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def fake_clock():
+    return FakeClock()
@@ -0,0 +1,64 @@
+"""
+Concurrent /chat load test - checks throughput scales with in-flight requests
+
+Usage: python -m backend.tests.load_chat --token <JWT> [--url http://localhost:8000] [--requests 40]
+       [--concurrency 1 5 10 20] [--has-pdf]
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+async def _run_level(client: httpx.AsyncClient, url: str, token: str, total: int, concurrency: int, has_pdf: bool):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def one(i: int):
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            # Unique queries so the response cache doesn't short-circuit the pipeline
+            response = await client.post(
+                f"{url}/chat",
+                json={"query": f"Summarise the main point in one sentence ({time.time()}-{i})", "has_pdf": has_pdf},
+                headers={"Authorization": f"Bearer {token}"},
+            )
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    elapsed = time.perf_counter() - started
+    return {
+        "concurrency": concurrency,
+        "throughput_rps": total / elapsed,
+        "p50_s": statistics.median(latencies),
+        "max_s": max(latencies),
+        "errors": errors,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--token", required=True)
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 5, 10, 20])
+    parser.add_argument("--has-pdf", action="store_true")
+    args = parser.parse_args()
+
+    async with httpx.AsyncClient(timeout=120) as client:
+        for concurrency in args.concurrency:
+            result = await _run_level(client, args.url, args.token, args.requests, concurrency, args.has_pdf)
+            print(f"concurrency={result['concurrency']:>3}  {result['throughput_rps']:6.2f} req/s  "
+                  f"p50={result['p50_s']:.2f}s  max={result['max_s']:.2f}s  errors={result['errors']}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
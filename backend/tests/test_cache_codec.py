@@ -0,0 +1,24 @@
+import json
+import pickle
+
+from backend import cache_codec
+
+def test_codec_round_trip_compresses_large_values():
+    answer = {"response": "The refund policy allows returns within 30 days. " * 100,
+              "sources": [{"page": page, "file": "policy.pdf"} for page in range(20)]}
+    data, raw_size = cache_codec.encode(answer)
+
+    assert data[0] == cache_codec.FORMAT_VERSION
+    assert data[2] != cache_codec.COMPRESSION_NONE
+    assert len(data) < raw_size
+    assert cache_codec.decode(data) == answer
+
+def test_codec_keeps_small_values_uncompressed():
+    data, raw_size = cache_codec.encode({"status": "queued"})
+    assert data[2] == cache_codec.COMPRESSION_NONE
+    assert len(data) == raw_size + 3
+    assert cache_codec.decode(data) == {"status": "queued"}
+
+def test_codec_decodes_legacy_entries():
+    assert cache_codec.decode(json.dumps({"a": 1}).encode("utf-8")) == {"a": 1}
+    assert cache_codec.decode(pickle.dumps({"a": 1}), legacy="pickle") == {"a": 1}
@@ -0,0 +1,24 @@
+from celery.concurrency import get_implementation
+from celery.signals import worker_init
+
+from backend import celery_app
+from backend.app.services.dual_embedding_manager import DualEmbeddingManager
+
+class FakeWorker:
+    def __init__(self, pool_cls):
+        self.pool_cls = pool_cls
+
+def fire_worker_init(monkeypatch, pool):
+    preloaded = []
+    monkeypatch.setattr(celery_app, "WARM_WORKERS", True)
+    monkeypatch.setattr(DualEmbeddingManager, "preload_models", staticmethod(lambda *args, **kwargs: preloaded.append(True)))
+    # Celery resolves --pool to its class before sending worker_init
+    worker_init.send(sender=FakeWorker(get_implementation(pool)))
+    return preloaded
+
+def test_worker_init_preloads_models_for_solo_and_threads_pools(monkeypatch):
+    assert fire_worker_init(monkeypatch, "solo") == [True]
+    assert fire_worker_init(monkeypatch, "threads") == [True]
+
+def test_worker_init_leaves_prefork_preload_to_child_processes(monkeypatch):
+    assert fire_worker_init(monkeypatch, "prefork") == []
@@ -0,0 +1,82 @@
+from datetime import datetime, timezone
+
+from backend.app.services import chat_write_behind
+from backend.app.services.chat_write_behind import ChatWriteBehind
+
+ASKED = "2026-01-01 10:00:00+00:00"
+ANSWERED = "2026-01-01 10:00:07+00:00"
+
+def queued_turn(turn_id, chat_id="chat-1", user_id=1):
+    return {"turn_id": turn_id, "user_id": user_id, "chat_id": chat_id, "query": f"question {turn_id}",
+            "response": f"answer {turn_id}", "source": "rag", "asked_at": ASKED, "answered_at": ANSWERED}
+
+class FakeCache:
+    def __init__(self, pending):
+        self.pending = pending
+        self.deleted = []
+        self.acked = []
+
+    def hkeys(self, key):
+        return set(self.pending)
+
+    def hdel(self, key, *fields):
+        self.deleted.extend(fields)
+        return len(fields)
+
+    def stream_ack(self, stream, group, entry_ids):
+        self.acked.extend(entry_ids)
+
+def test_merge_pending_messages_uses_answer_timestamp_and_skips_stored_turns():
+    stored = [{"role": "user", "content": "question a", "message_id": "a:user"},
+              {"role": "assistant", "content": "answer a", "message_id": "a:assistant"}]
+    pending = [chat_write_behind._parse_turn(queued_turn("a")), chat_write_behind._parse_turn(queued_turn("b"))]
+
+    merged = ChatWriteBehind.merge_pending_messages(stored, pending)
+
+    assert [message["message_id"] for message in merged] == ["a:user", "a:assistant", "b:user", "b:assistant"]
+    assert merged[2]["created_at"] == datetime(2026, 1, 1, 10, 0, tzinfo=timezone.utc)
+    assert merged[3]["created_at"] == datetime(2026, 1, 1, 10, 0, 7, tzinfo=timezone.utc)
+    assert merged[3]["source"] == "rag"
+
+def test_flush_saves_only_pending_turns_and_acks_every_entry(monkeypatch):
+    fake = FakeCache(pending={"a"})
+    saved_batches = []
+    monkeypatch.setattr(chat_write_behind, "cache", fake)
+    monkeypatch.setattr(chat_write_behind.ChatDBService, "save_turns",
+                        lambda turns: saved_batches.append(turns) or len(turns))
+
+    # "b" is no longer pending: already stored by an earlier delivery or its chat was deleted
+    assert ChatWriteBehind.flush([("1-0", queued_turn("a")), ("2-0", queued_turn("b"))]) == 1
+
+    assert [turn["turn_id"] for turn in saved_batches[0]] == ["a"]
+    assert saved_batches[0][0]["answered_at"] == datetime(2026, 1, 1, 10, 0, 7, tzinfo=timezone.utc)
+    assert fake.deleted == ["a"]
+    assert fake.acked == ["1-0", "2-0"]
+
+def stored_chat(chat_id, hour, message_count=4):
+    return {"chat_id": chat_id, "title": chat_id, "created_at": datetime(2026, 1, 1, tzinfo=timezone.utc),
+            "updated_at": datetime(2026, 1, 1, hour, tzinfo=timezone.utc), "message_count": message_count}
+
+def test_merge_pending_chats_updates_page_chats_in_place_and_adds_only_unstored_chats():
+    page = [stored_chat("recent", 9), stored_chat("older", 8)]
+    pending = [chat_write_behind._parse_turn(queued_turn("a", chat_id="older")),
+               chat_write_behind._parse_turn({**queued_turn("b", chat_id="new"), "asked_at": "2026-01-01 09:30:00+00:00",
+                                              "answered_at": "2026-01-01 09:30:05+00:00"}),
+               chat_write_behind._parse_turn(queued_turn("c", chat_id="sunk"))]
+
+    merged = ChatWriteBehind.merge_pending_chats(page, pending, {"recent", "older", "sunk"}, limit=3)
+
+    # "sunk" is stored on a later page and stays there instead of appearing as a new chat
+    assert [chat["chat_id"] for chat in merged] == ["older", "new", "recent"]
+    assert merged[0]["message_count"] == 6
+    assert merged[0]["updated_at"] == datetime(2026, 1, 1, 10, 0, 7, tzinfo=timezone.utc)
+    assert merged[1]["message_count"] == 2 and merged[1]["title"] == "question b"
+
+def test_merge_pending_chats_never_exceeds_limit_or_drops_stored_chats():
+    page = [stored_chat("stored", 9)]
+    pending = [chat_write_behind._parse_turn(queued_turn(turn_id, chat_id=turn_id)) for turn_id in "abc"]
+
+    merged = ChatWriteBehind.merge_pending_chats(page, pending, {"stored"}, limit=2)
+
+    assert len(merged) == 2
+    assert "stored" in [chat["chat_id"] for chat in merged]
@@ -0,0 +1,70 @@
+import os
+from contextlib import contextmanager
+
+import pytest
+
+from backend.app.services import document_store
+from backend.app.services.document_store import DocumentStore
+
+@pytest.fixture
+def store_dirs(tmp_path, monkeypatch):
+    monkeypatch.setattr(DocumentStore, "UPLOADS_DIR", str(tmp_path / "uploads"))
+    monkeypatch.setattr(DocumentStore, "STAGING_DIR", str(tmp_path / "uploads" / "staging"))
+    monkeypatch.setattr(DocumentStore, "VECTOR_STORES_DIR", str(tmp_path / "vector_stores"))
+    os.makedirs(DocumentStore.UPLOADS_DIR)
+    return tmp_path
+
+def fake_database(monkeypatch, unreferenced, referenced_hashes):
+    @contextmanager
+    def connection():
+        yield None
+
+    monkeypatch.setattr(document_store, "get_db_connection", connection)
+    monkeypatch.setattr(document_store, "pop_unreferenced_documents", lambda conn: unreferenced)
+    monkeypatch.setattr(document_store, "is_content_hash_referenced",
+                        lambda conn, content_hash: content_hash in referenced_hashes)
+
+def write_file(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(b"%PDF")
+    return path
+
+def test_collect_garbage_keeps_uploads_staged_for_queued_tasks(store_dirs, monkeypatch):
+    incoming = write_file(str(store_dirs / "user_2" / "upload.pdf"))
+    staged = DocumentStore.store_upload(incoming, "a" * 64)
+    write_file(DocumentStore.get_upload_path("a" * 64))
+    store_path = DocumentStore.get_vector_store_path("a" * 64, "BAAI/bge-small-en-v1.5")
+    write_file(os.path.join(store_path, "index.faiss"))
+    fake_database(monkeypatch, [{"content_hash": "a" * 64, "vector_store_path": store_path}], set())
+
+    assert DocumentStore.collect_garbage() == 1
+    assert not os.path.exists(DocumentStore.get_upload_path("a" * 64))
+    assert not os.path.exists(os.path.join(DocumentStore.VECTOR_STORES_DIR, "a" * 64))
+    assert os.path.exists(staged)
+
+    assert DocumentStore.adopt_upload(staged, "a" * 64) == DocumentStore.get_upload_path("a" * 64)
+    assert os.path.exists(DocumentStore.get_upload_path("a" * 64))
+    assert not os.path.exists(staged)
+
+def test_collect_garbage_keeps_upload_referenced_by_another_model(store_dirs, monkeypatch):
+    upload = write_file(DocumentStore.get_upload_path("b" * 64))
+    english = DocumentStore.get_vector_store_path("b" * 64, "english-model")
+    tamil = DocumentStore.get_vector_store_path("b" * 64, "tamil-model")
+    write_file(os.path.join(english, "index.faiss"))
+    write_file(os.path.join(tamil, "index.faiss"))
+    fake_database(monkeypatch, [{"content_hash": "b" * 64, "vector_store_path": english}], {"b" * 64})
+
+    assert DocumentStore.collect_garbage() == 1
+    assert os.path.exists(upload)
+    assert not os.path.exists(english)
+    assert os.path.exists(tamil)
+
+def test_discard_upload_only_removes_the_task_staged_copy(store_dirs):
+    shared = write_file(DocumentStore.get_upload_path("c" * 64))
+    staged = DocumentStore.store_upload(write_file(str(store_dirs / "user_3" / "upload.pdf")), "c" * 64)
+
+    DocumentStore.discard_upload(shared)
+    DocumentStore.discard_upload(staged)
+    assert os.path.exists(shared)
+    assert not os.path.exists(staged)
@@ -0,0 +1,19 @@
+import pytest
+from backend.app.services.embedding_cache import EmbeddingCache
+
+@pytest.fixture
+def embedding_cache(tmp_path):
+    return EmbeddingCache(str(tmp_path / "embedding_cache.sqlite3"))
+
+def test_embedding_cache_roundtrip(embedding_cache):
+    text_hash = EmbeddingCache.text_hash("refund policy")
+    embedding_cache.put_many("model-a", [(text_hash, [0.25, -0.5, 1.0])])
+
+    assert embedding_cache.get_many("model-a", [text_hash]) == {text_hash: [0.25, -0.5, 1.0]}
+
+def test_embedding_cache_is_keyed_by_model(embedding_cache):
+    text_hash = EmbeddingCache.text_hash("refund policy")
+    embedding_cache.put_many("model-a", [(text_hash, [1.0, 0.0])])
+
+    assert embedding_cache.get_many("model-b", [text_hash]) == {}
+    assert embedding_cache.get_stats() == {"model-a": 1}
@@ -0,0 +1,31 @@
+import asyncio
+import io
+import os
+
+from fastapi import UploadFile
+
+from backend.app.utils import file_utils
+
+class SlowUpload(UploadFile):
+    """Yields to the event loop on every chunk, like a request body arriving over the network"""
+    async def read(self, size: int = -1) -> bytes:
+        await asyncio.sleep(0)
+        return self.file.read(size)
+
+def test_concurrent_uploads_of_one_user_get_separate_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(file_utils, "UPLOAD_DIR", str(tmp_path))
+    monkeypatch.setattr(file_utils, "UPLOAD_CHUNK_SIZE", 4)
+
+    async def upload_both():
+        return await asyncio.gather(*(
+            file_utils.save_pdf_file_streamed(SlowUpload(io.BytesIO(body), filename="report.pdf"), 7)
+            for body in (b"%PDF first document", b"%PDF second document")
+        ))
+
+    (first_path, first_hash, _), (second_path, second_hash, _) = asyncio.run(upload_both())
+
+    assert first_path != second_path and first_hash != second_hash
+    with open(first_path, "rb") as first, open(second_path, "rb") as second:
+        assert first.read() == b"%PDF first document"
+        assert second.read() == b"%PDF second document"
+    assert sorted(os.listdir(tmp_path / "user_7")) == sorted([os.path.basename(first_path), os.path.basename(second_path)])
@@ -0,0 +1,34 @@
+from backend.near_cache import NearCache
+
+def make_cache(clock=lambda: 0.0):
+    near = NearCache(max_entries=10, namespace_ttls={"active_tasks": 5}, enabled=True, clock=clock)
+    near.set_active(True)
+    return near
+
+def test_near_cache_serves_until_invalidated_or_expired(fake_clock):
+    near = make_cache(fake_clock)
+    data, token = near.get("active_tasks:user:1")
+    assert data is None
+    near.put("active_tasks:user:1", b"tasks", token)
+
+    assert near.get("active_tasks:user:1")[0] == b"tasks"
+    fake_clock.now = 6
+    assert near.get("active_tasks:user:1")[0] is None
+
+    near.put("active_tasks:user:1", b"tasks", near.get("active_tasks:user:1")[1])
+    near.invalidate(patterns=["*:user:1:*", "active_tasks:user:1"])
+    assert near.get("active_tasks:user:1")[0] is None
+    assert near.stats()["namespaces"]["active_tasks"]["hits"] == 1
+
+def test_near_cache_discards_fill_raced_by_invalidation():
+    near = make_cache()
+    _, token = near.get("active_tasks:user:1")
+    near.invalidate(["active_tasks:user:1"])
+    near.put("active_tasks:user:1", b"stale", token)
+    assert near.get("active_tasks:user:1")[0] is None
+
+def test_near_cache_only_serves_configured_namespaces_while_active():
+    near = make_cache()
+    assert near.get("chat_pdf:user:1:query:x") == (None, None)
+    near.set_active(False)
+    assert near.get("active_tasks:user:1") == (None, None)
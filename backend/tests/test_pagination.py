@@ -0,0 +1,26 @@
+from datetime import datetime, timezone
+
+import pytest
+from backend.app.utils.pagination import (
+    encode_cursor, decode_cursor, split_page, clamp_page_size, InvalidCursorError
+)
+
+def test_cursor_round_trip_keeps_microseconds_and_timezone():
+    updated_at = datetime(2026, 3, 1, 12, 30, 15, 123456, tzinfo=timezone.utc)
+    assert decode_cursor(encode_cursor(updated_at, "chat-42")) == (updated_at, "chat-42")
+
+def test_split_page_returns_cursor_of_last_row_only_when_more_rows_exist():
+    rows = [{"created_at": datetime(2026, 1, 1, tzinfo=timezone.utc), "id": i} for i in range(3, 0, -1)]
+    page, next_cursor = split_page(rows, 2, ("created_at", "id"))
+    assert [row["id"] for row in page] == [3, 2]
+    assert decode_cursor(next_cursor)[1] == 2
+    assert split_page(rows, 3, ("created_at", "id")) == (rows, None)
+    assert split_page(rows, None, ("created_at", "id")) == (rows, None)
+
+def test_invalid_cursor_and_page_size_bounds():
+    with pytest.raises(InvalidCursorError):
+        decode_cursor("not-a-cursor")
+    assert clamp_page_size(None, 50, 200) is None
+    assert clamp_page_size(None, 50, 200, cursor="next") == 50
+    assert clamp_page_size(1000, 50, 200) == 200
+    assert clamp_page_size(0, 50, 200) == 1
@@ -0,0 +1,27 @@
+import os
+import time
+
+from backend.app.services import user_vector_index
+from backend.app.services.user_vector_index import UserVectorIndex
+
+def make_generation(generation, age):
+    path = UserVectorIndex._generation_path(4, "BAAI/bge-small-en-v1.5", generation)
+    os.makedirs(path)
+    stamp = time.time() - age
+    os.utime(path, (stamp, stamp))
+    return path
+
+def test_collect_old_generations_keeps_current_and_recently_retired(tmp_path, monkeypatch):
+    monkeypatch.setattr(user_vector_index, "VECTOR_STORE_DIR", str(tmp_path))
+    monkeypatch.setattr(user_vector_index, "USER_INDEX_GENERATION_GRACE_SECONDS", 60)
+    expired = make_generation(1, age=600)
+    superseded = make_generation(2, age=600)
+    current = make_generation(3, age=600)
+
+    # A reader may still be loading generation 2, which was only just switched away from
+    UserVectorIndex._retire_generation(superseded)
+    assert UserVectorIndex.collect_old_generations(4, "BAAI/bge-small-en-v1.5", current) == 1
+
+    assert not os.path.exists(expired)
+    assert os.path.exists(superseded)
+    assert os.path.exists(current)
@@ -0,0 +1,27 @@
+from backend.app.services.vector_store_lru import VectorStoreLRU
+
+def test_lru_evicts_least_recently_used_over_budget():
+    evicted = []
+    lru = VectorStoreLRU(max_bytes=100, idle_ttl=0, on_evict=lambda key, value, reason: evicted.append((key, reason)))
+    lru.put(1, "store-1", size=40)
+    lru.put(2, "store-2", size=40)
+    lru.get(1)
+    lru.put(3, "store-3", size=40)
+
+    assert lru.keys() == [1, 3]
+    assert evicted == [(2, "size")]
+    assert lru.stats()["bytes"] == 80
+
+def test_lru_expires_idle_entries(fake_clock):
+    lru = VectorStoreLRU(max_bytes=100, idle_ttl=60, clock=fake_clock)
+    lru.put(1, "store-1", size=10, generation=3)
+    assert lru.get_metadata(1) == {"generation": 3}
+
+    fake_clock.now = 61
+    assert lru.get(1) is None
+    assert lru.stats()["evictions_ttl"] == 1
+
+def test_lru_rejects_entries_larger_than_budget():
+    lru = VectorStoreLRU(max_bytes=100, idle_ttl=0)
+    assert lru.put(1, "huge", size=101) is False
+    assert len(lru) == 0
@@ -1,5 +1,5 @@
 import psycopg2
-from typing import Optional
+from typing import List, Optional
 
 def save_vector_store_path(conn, user_id: int, vector_store_path: str, language: str = 'english', embedding_model: str = None):
     """Save vector store path with language and embedding model information"""
@@ -42,10 +42,10 @@ def get_user_vector_store_info(conn, user_id: int) -> Optional[dict]:
     cursor = conn.cursor()
     try:
         cursor.execute("""
-            SELECT vector_store_path, language, embedding_model, created_at
+            SELECT vector_store_path, language, embedding_model, created_at, generation
             FROM user_vector_stores 
             WHERE user_id = %s AND is_active = TRUE 
-            ORDER BY created_at DESC 
+            ORDER BY updated_at DESC NULLS LAST, created_at DESC 
             LIMIT 1
         """, (user_id,))
         
@@ -57,14 +57,16 @@ def get_user_vector_store_info(conn, user_id: int) -> Optional[dict]:
                     'path': row['vector_store_path'],
                     'language': row['language'] or 'english',  # Default to english for legacy records
                     'embedding_model': row['embedding_model'] or 'BAAI/bge-small-en-v1.5',  # Default for legacy
-                    'created_at': row['created_at']
+                    'created_at': row['created_at'],
+                    'generation': row['generation'] or 0  # Legacy single-document stores
                 }
             else:
                 info = {
                     'path': row[0],
                     'language': row[1] or 'english',  # Default to english for legacy records
                     'embedding_model': row[2] or 'BAAI/bge-small-en-v1.5',  # Default for legacy
-                    'created_at': row[3]
+                    'created_at': row[3],
+                    'generation': row[4] or 0  # Legacy single-document stores
                 }
             print(f"Found {info['language']} vector store for user {user_id}: {info['path']}")
             return info
@@ -108,4 +110,278 @@ def get_user_language_stats(conn, user_id: int) -> dict:
         print(f"Error getting language stats: {e}")
         return {'total_documents': 0, 'languages': {}}
     finally:
-        cursor.close()
\ No newline at end of file
+        cursor.close()
+
+def find_shared_document(conn, content_hash: str, embedding_models: List[str]) -> Optional[dict]:
+    """Find an already processed document by content hash for any of the given embedding models"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT id, content_hash, embedding_model, language, file_path, vector_store_path
+            FROM shared_documents
+            WHERE content_hash = %s AND embedding_model = ANY(%s)
+            ORDER BY created_at DESC
+            LIMIT 1
+        """, (content_hash, list(embedding_models)))
+        
+        row = cursor.fetchone()
+        return dict(row) if row else None
+        
+    except Exception as e:
+        print(f"Error finding shared document: {e}")
+        return None
+    finally:
+        cursor.close()
+
+def register_shared_document(conn, content_hash: str, embedding_model: str, language: str,
+                             file_path: str, vector_store_path: str) -> dict:
+    """
+    Register a processed document (does not commit - append it to a user index in the same
+    transaction so that it is never visible with a zero reference count)
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            INSERT INTO shared_documents (content_hash, embedding_model, language, file_path, vector_store_path)
+            VALUES (%s, %s, %s, %s, %s)
+            ON CONFLICT (content_hash, embedding_model)
+            DO UPDATE SET last_used_at = CURRENT_TIMESTAMP
+            RETURNING id, content_hash, embedding_model, language, file_path, vector_store_path
+        """, (content_hash, embedding_model, language, file_path, vector_store_path))
+        return dict(cursor.fetchone())
+    finally:
+        cursor.close()
+
+def _decrement_shared_document(cursor, content_hash: str, embedding_model: str):
+    """Drop one reference on a shared document"""
+    cursor.execute("""
+        UPDATE shared_documents SET ref_count = GREATEST(ref_count - 1, 0)
+        WHERE content_hash = %s AND embedding_model = %s
+    """, (content_hash, embedding_model))
+
+def _release_legacy_vector_stores(cursor, user_id: int):
+    """Deactivate a user's single-document stores (pre incremental indexes) and drop their references"""
+    cursor.execute("""
+        UPDATE user_vector_stores SET is_active = FALSE
+        WHERE user_id = %s AND is_active = TRUE AND generation IS NULL
+        RETURNING content_hash, embedding_model
+    """, (user_id,))
+    
+    for row in cursor.fetchall():
+        if row['content_hash']:
+            _decrement_shared_document(cursor, row['content_hash'], row['embedding_model'])
+
+def get_user_index(conn, user_id: int, embedding_model: str) -> Optional[dict]:
+    """Get a user's incremental index for an embedding model"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT id, vector_store_path, language, embedding_model, generation, is_active
+            FROM user_vector_stores
+            WHERE user_id = %s AND embedding_model = %s AND generation IS NOT NULL
+        """, (user_id, embedding_model))
+        row = cursor.fetchone()
+        return dict(row) if row else None
+    finally:
+        cursor.close()
+
+def get_user_document(conn, user_id: int, content_hash: str = None, embedding_model: str = None,
+                      document_id: int = None) -> Optional[dict]:
+    """Get a document in a user's index by id, or by content hash and embedding model"""
+    cursor = conn.cursor()
+    try:
+        if document_id is not None:
+            cursor.execute("""
+                SELECT id, content_hash, filename, language, embedding_model, vector_ids, chunk_count, created_at
+                FROM user_documents
+                WHERE user_id = %s AND id = %s
+            """, (user_id, document_id))
+        else:
+            cursor.execute("""
+                SELECT id, content_hash, filename, language, embedding_model, vector_ids, chunk_count, created_at
+                FROM user_documents
+                WHERE user_id = %s AND content_hash = %s AND embedding_model = %s
+            """, (user_id, content_hash, embedding_model))
+        row = cursor.fetchone()
+        return dict(row) if row else None
+    finally:
+        cursor.close()
+
+def list_user_documents(conn, user_id: int) -> List[dict]:
+    """List the documents in a user's indexes, newest first"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT id, content_hash, filename, language, embedding_model, chunk_count, created_at
+            FROM user_documents
+            WHERE user_id = %s
+            ORDER BY created_at DESC
+        """, (user_id,))
+        return [dict(row) for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+def _activate_user_index(cursor, user_id: int, embedding_model: str):
+    """Make one of the user's indexes the one used for chat"""
+    cursor.execute("""
+        UPDATE user_vector_stores
+        SET is_active = (embedding_model = %s AND generation IS NOT NULL), updated_at = CURRENT_TIMESTAMP
+        WHERE user_id = %s AND (is_active = TRUE OR (embedding_model = %s AND generation IS NOT NULL))
+    """, (embedding_model, user_id, embedding_model))
+
+def activate_user_index(conn, user_id: int, embedding_model: str):
+    """Switch chat to an existing user index (e.g. when re-uploading a document the user already has)"""
+    cursor = conn.cursor()
+    try:
+        _release_legacy_vector_stores(cursor, user_id)
+        _activate_user_index(cursor, user_id, embedding_model)
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        print(f"Error activating user index: {e}")
+        raise e
+    finally:
+        cursor.close()
+
+def save_user_index_document(conn, user_id: int, document: dict, filename: str,
+                             vector_store_path: str, generation: int, vector_ids: List[str]) -> int:
+    """
+    Record a document appended to a user's index in one transaction:
+    index row (new path/generation), document -> vector id mapping and the shared document reference
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            UPDATE shared_documents SET ref_count = ref_count + 1, last_used_at = CURRENT_TIMESTAMP
+            WHERE id = %s
+            RETURNING id
+        """, (document['id'],))
+        if cursor.fetchone() is None:
+            raise LookupError(f"Shared document {document['content_hash']} was garbage-collected")
+        
+        _release_legacy_vector_stores(cursor, user_id)
+        
+        cursor.execute("""
+            INSERT INTO user_vector_stores (user_id, vector_store_path, language, embedding_model, generation, is_active)
+            VALUES (%s, %s, %s, %s, %s, TRUE)
+            ON CONFLICT (user_id, embedding_model) WHERE generation IS NOT NULL
+            DO UPDATE SET vector_store_path = EXCLUDED.vector_store_path,
+                          generation = EXCLUDED.generation,
+                          updated_at = CURRENT_TIMESTAMP
+        """, (user_id, vector_store_path, document['language'], document['embedding_model'], generation))
+        _activate_user_index(cursor, user_id, document['embedding_model'])
+        
+        cursor.execute("""
+            INSERT INTO user_documents (user_id, content_hash, filename, language, embedding_model, vector_ids, chunk_count)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+            RETURNING id
+        """, (user_id, document['content_hash'], filename, document['language'],
+              document['embedding_model'], vector_ids, len(vector_ids)))
+        document_id = cursor.fetchone()['id']
+        
+        conn.commit()
+        print(f"Appended {document['language']} document {document['content_hash'][:12]} to user {user_id} index "
+              f"(generation {generation})")
+        return document_id
+        
+    except Exception as e:
+        conn.rollback()
+        print(f"Error saving user index document: {e}")
+        raise e
+    finally:
+        cursor.close()
+
+def remove_user_index_document(conn, user_id: int, document: dict,
+                               vector_store_path: Optional[str], generation: int):
+    """
+    Remove a document from a user's index and drop its shared document reference
+    vector_store_path=None means the index is now empty and is removed
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute("DELETE FROM user_documents WHERE id = %s AND user_id = %s", (document['id'], user_id))
+        _decrement_shared_document(cursor, document['content_hash'], document['embedding_model'])
+        
+        if vector_store_path is None:
+            cursor.execute("""
+                DELETE FROM user_vector_stores
+                WHERE user_id = %s AND embedding_model = %s AND generation IS NOT NULL
+                RETURNING is_active
+            """, (user_id, document['embedding_model']))
+            removed = cursor.fetchone()
+            if removed and removed['is_active']:
+                # Fall back to the user's most recently updated remaining index
+                cursor.execute("""
+                    UPDATE user_vector_stores SET is_active = TRUE
+                    WHERE id = (
+                        SELECT id FROM user_vector_stores
+                        WHERE user_id = %s AND generation IS NOT NULL
+                        ORDER BY updated_at DESC
+                        LIMIT 1
+                    )
+                """, (user_id,))
+        else:
+            cursor.execute("""
+                UPDATE user_vector_stores
+                SET vector_store_path = %s, generation = %s, updated_at = CURRENT_TIMESTAMP
+                WHERE user_id = %s AND embedding_model = %s AND generation IS NOT NULL
+            """, (vector_store_path, generation, user_id, document['embedding_model']))
+        
+        conn.commit()
+        
+    except Exception as e:
+        conn.rollback()
+        print(f"Error removing user index document: {e}")
+        raise e
+    finally:
+        cursor.close()
+
+def release_user_vector_stores(conn, user_id: int):
+    """Remove all of a user's vector stores and documents, releasing their shared document references"""
+    cursor = conn.cursor()
+    try:
+        _release_legacy_vector_stores(cursor, user_id)
+        
+        cursor.execute("""
+            DELETE FROM user_documents WHERE user_id = %s
+            RETURNING content_hash, embedding_model
+        """, (user_id,))
+        for row in cursor.fetchall():
+            _decrement_shared_document(cursor, row['content_hash'], row['embedding_model'])
+        
+        cursor.execute("DELETE FROM user_vector_stores WHERE user_id = %s AND generation IS NOT NULL", (user_id,))
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        print(f"Error releasing vector stores for user {user_id}: {e}")
+        raise e
+    finally:
+        cursor.close()
+
+def pop_unreferenced_documents(conn) -> List[dict]:
+    """Delete shared documents nobody references any more and return them for file cleanup"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            DELETE FROM shared_documents
+            WHERE ref_count <= 0
+            RETURNING content_hash, embedding_model, file_path, vector_store_path
+        """)
+        rows = [dict(row) for row in cursor.fetchall()]
+        conn.commit()
+        return rows
+    except Exception as e:
+        conn.rollback()
+        print(f"Error collecting unreferenced documents: {e}")
+        return []
+    finally:
+        cursor.close()
+
+def is_content_hash_referenced(conn, content_hash: str) -> bool:
+    """Check whether any shared document still uses an uploaded file"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT 1 FROM shared_documents WHERE content_hash = %s LIMIT 1", (content_hash,))
+        return cursor.fetchone() is not None
+    finally:
+        cursor.close()
@@ -25,12 +25,14 @@ if __name__ == "__main__":
     # Get configuration
     log_level = os.getenv("CELERY_LOG_LEVEL", "info").lower()
     redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+    pool = os.getenv("CELERY_POOL", "solo")  # prefork on Linux for warm children with a memory ceiling
+    concurrency = os.getenv("CELERY_CONCURRENCY")
     
     logger.info("🚀 Starting Celery Worker for PDF Processing")
     logger.info(f"📊 Log Level: {log_level.upper()}")
     logger.info(f"🔗 Redis URL: {redis_url}")
     logger.info("🔧 Worker Configuration:")
-    logger.info("   • Pool: solo (Windows compatible)")
+    logger.info(f"   • Pool: {pool}" + (" (Windows compatible)" if pool == "solo" else ""))
     logger.info("   • Queue: pdf_processing")
     logger.info("   • Gossip: disabled")
     logger.info("   • Mingle: disabled")
@@ -39,15 +41,18 @@ if __name__ == "__main__":
     
     try:
         # Start the worker with pool=solo for Windows compatibility
-        celery_app.worker_main([
+        argv = [
             "worker",
             "--loglevel=" + log_level,
-            "--pool=solo",  # Use solo pool for Windows
+            "--pool=" + pool,  # solo for Windows
             "--queues=pdf_processing",
             "--without-gossip",  # Disable gossip for better Windows compatibility
             "--without-mingle",  # Disable mingle for better Windows compatibility
             "--without-heartbeat"  # Disable heartbeat for better Windows compatibility
-        ])
+        ]
+        if concurrency:
+            argv.append("--concurrency=" + concurrency)
+        celery_app.worker_main(argv)
     except KeyboardInterrupt:
         logger.warning("🛑 Received interrupt signal, shutting down...")
     except Exception as e: